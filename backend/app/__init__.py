@@ -42,16 +42,72 @@ def create_app(config_name=None):
     from backend.app.api.projects import projects_bp
     from backend.app.api.files import files_bp
     from backend.app.api.audit import audit_bp
+    from backend.app.api.search import search_bp
+    from backend.app.api.events import events_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(projects_bp, url_prefix='/api/projects')
     app.register_blueprint(files_bp, url_prefix='/api/files')
     app.register_blueprint(audit_bp, url_prefix='/api/audit')
+    app.register_blueprint(search_bp, url_prefix='/api/search')
+    app.register_blueprint(events_bp, url_prefix='/api/events')
     
     # Register main routes
     from backend.app.api.main import main_bp
     app.register_blueprint(main_bp)
     
+    # Content-addressed version storage
+    from backend.app.services.blob_store import blob_store
+    blob_store.init_app(app)
+    
+    # Columnar cell snapshots of stored workbooks
+    from backend.app.services.cell_snapshot import snapshot_store
+    snapshot_store.init_app(app)
+    
+    # Full-text search index
+    from backend.app.services.search_index import search_index
+    search_index.init_app(app)
+    
+    # Resumable chunked uploads
+    from backend.app.services.upload_sessions import upload_sessions
+    upload_sessions.init_app(app)
+    
+    # Checkout leases
+    from backend.app.services.checkout_locks import checkout_locks
+    checkout_locks.init_app(app)
+    
+    # Validation result cache
+    from backend.app.services.validation_cache import validation_cache
+    validation_cache.init_app(app)
+    
+    # Response cache for project and file reads
+    from backend.app.services.response_cache import response_cache
+    response_cache.init_app(app)
+    
+    # Change event fan-out for event streams
+    from backend.app.services.event_hub import event_hub
+    event_hub.init_app(app)
+    
+    # Many-file uploads into one project
+    from backend.app.services.bulk_upload import bulk_uploader
+    bulk_uploader.init_app(app)
+    
+    # Audit event writer (transactional and write-behind)
+    from backend.app.services.audit_sink import audit_sink
+    audit_sink.init_app(app)
+    
+    # Audit table partitioning and cold archive
+    from backend.app.services.audit_archive import audit_archive
+    audit_archive.init_app(app)
+    
+    # Background validation worker pool
+    from backend.app.services.validation_queue import validation_queue
+    validation_queue.init_app(app)
+    
+    # Periodic housekeeping thread
+    from backend.app.services.maintenance import maintenance
+    maintenance.init_app(app)
+    
     # User loader for Flask-Login
     from backend.app.models.user import User
     
@@ -1,133 +1,291 @@
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_login import login_required, current_user
 from backend.app import db
 from backend.app.models.audit_log import AuditLog
 from backend.app.models.user import User
 from backend.app.models.file import File
+from backend.app.services.audit_archive import audit_archive
+from backend.app.utils.pagination import encode_cursor, decode_cursor
 from datetime import datetime
 import csv
 import io
+import itertools
+import json
+import zlib
 
 audit_bp = Blueprint('audit', __name__)
 
+# Largest page get_audit_logs will return
+MAX_PAGE_SIZE = 1000
+
+# Rows fetched from the database, and rendered, per export chunk
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson')
+}
+
+
+def _arg_values(name, convert=str):
+    """
+    Collect a multi-value query parameter
+
+    Accepts both repeated parameters (?action=a&action=b) and
+    comma-separated values (?action=a,b).
+    """
+    values = []
+    for raw in request.args.getlist(name):
+        for value in raw.split(','):
+            value = value.strip()
+            if value:
+                values.append(convert(value))
+    return values
+
+
+FILTER_COLUMNS = (
+    ('user_id', AuditLog.user_id, int),
+    ('file_id', AuditLog.file_id, int),
+    ('project_id', AuditLog.project_id, int),
+    ('action', AuditLog.action, str)
+)
+
+
+def _parse_filters():
+    """
+    Parse the request's filter parameters
+
+    Returns:
+        Dict of value lists per filter column plus 'start_date'/'end_date'
+
+    Raises:
+        ValueError: If a parameter cannot be parsed
+    """
+    filters = {name: _arg_values(name, convert) for name, _column, convert in FILTER_COLUMNS}
+    
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    filters['start_date'] = datetime.fromisoformat(start_date) if start_date else None
+    filters['end_date'] = datetime.fromisoformat(end_date) if end_date else None
+    
+    return filters
+
+
+def _filter_conditions(filters):
+    """Turn parsed filters into SQL conditions"""
+    conditions = []
+    
+    for name, column, _convert in FILTER_COLUMNS:
+        values = filters[name]
+        if len(values) == 1:
+            conditions.append(column == values[0])
+        elif values:
+            conditions.append(column.in_(values))
+    
+    if filters['start_date']:
+        conditions.append(AuditLog.timestamp >= filters['start_date'])
+    if filters['end_date']:
+        conditions.append(AuditLog.timestamp <= filters['end_date'])
+    
+    return conditions
+
+
+def _audit_filters():
+    """
+    Build filter conditions from the request's query parameters
+
+    Raises:
+        ValueError: If a parameter cannot be parsed
+    """
+    return _filter_conditions(_parse_filters())
+
+
+def _enriched_query(conditions):
+    """Audit rows with their username and filename, newest first"""
+    return (
+        db.session.query(AuditLog, User.username, File.filename)
+        .outerjoin(User, User.id == AuditLog.user_id)
+        .outerjoin(File, File.id == AuditLog.file_id)
+        .filter(*conditions)
+        .order_by(AuditLog.timestamp.desc(), AuditLog.id.desc())
+    )
+
 
 @audit_bp.route('', methods=['GET'])
 @login_required
 def get_audit_logs():
-    """Get audit logs with optional filters"""
+    """
+    Get audit logs with optional filters
+
+    Pages are keyset-paginated on (timestamp, id): pass the returned
+    next_cursor as ?cursor= to fetch the next, older page.
+    """
     if not current_user.can_approve():
         return jsonify({'error': 'Insufficient permissions'}), 403
     
-    user_id = request.args.get('user_id', type=int)
-    file_id = request.args.get('file_id', type=int)
-    project_id = request.args.get('project_id', type=int)
-    action = request.args.get('action')
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    limit = request.args.get('limit', 100, type=int)
-    
-    query = AuditLog.query
-    
-    if user_id:
-        query = query.filter_by(user_id=user_id)
-    if file_id:
-        query = query.filter_by(file_id=file_id)
-    if project_id:
-        query = query.filter_by(project_id=project_id)
-    if action:
-        query = query.filter_by(action=action)
-    if start_date:
-        start = datetime.fromisoformat(start_date)
-        query = query.filter(AuditLog.timestamp >= start)
-    if end_date:
-        end = datetime.fromisoformat(end_date)
-        query = query.filter(AuditLog.timestamp <= end)
-    
-    query = query.order_by(AuditLog.timestamp.desc())
-    logs = query.limit(limit).all()
+    limit = min(max(request.args.get('limit', 100, type=int), 1), MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor')
+    
+    try:
+        conditions = _audit_filters()
+        if cursor:
+            timestamp, log_id = decode_cursor(cursor, 2)
+            timestamp = datetime.fromisoformat(timestamp)
+            conditions.append(db.or_(
+                AuditLog.timestamp < timestamp,
+                db.and_(AuditLog.timestamp == timestamp, AuditLog.id < int(log_id))
+            ))
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': f'Invalid filter: {e}'}), 400
+    
+    rows = _enriched_query(conditions).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
     
     enriched_logs = []
-    for log in logs:
+    for log, username, filename in rows:
         log_dict = log.to_dict()
         
-        if log.user:
-            log_dict['username'] = log.user.username
-        
-        if log.file_id:
-            file_obj = File.query.get(log.file_id)
-            if file_obj:
-                log_dict['filename'] = file_obj.filename
+        if username is not None:
+            log_dict['username'] = username
+        if filename is not None:
+            log_dict['filename'] = filename
         
         enriched_logs.append(log_dict)
     
+    next_cursor = None
+    if has_more:
+        last = rows[-1][0]
+        next_cursor = encode_cursor(last.timestamp, last.id)
+    
     return jsonify({
         'logs': enriched_logs,
-        'count': len(enriched_logs)
+        'count': len(enriched_logs),
+        'next_cursor': next_cursor
     }), 200
 
 
+def _export_chunks(rows, export_format):
+    """Render export rows as CSV or NDJSON, one text chunk per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    if export_format == 'csv':
+        writer.writerow(['Timestamp', 'User', 'Action', 'File', 'Project', 'Details', 'IP Address'])
+    
+    for count, (log_id, user_id, file_id, project_id, action, details, timestamp, ip_address,
+                username, filename) in enumerate(rows, start=1):
+        if export_format == 'csv':
+            writer.writerow([
+                timestamp.isoformat() if timestamp else '',
+                username or 'Unknown',
+                action,
+                filename or '',
+                project_id or '',
+                str(details),
+                ip_address or ''
+            ])
+        else:
+            buffer.write(json.dumps({
+                'id': log_id,
+                'user_id': user_id,
+                'username': username,
+                'file_id': file_id,
+                'filename': filename,
+                'project_id': project_id,
+                'action': action,
+                'details': details,
+                'timestamp': timestamp.isoformat() if timestamp else None,
+                'ip_address': ip_address
+            }, default=str))
+            buffer.write('\n')
+        
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    yield buffer.getvalue()
+
+
+def _archived_rows(filters):
+    """Archived records in the same shape as the exported database rows"""
+    for record in audit_archive.iter_rows(filters):
+        yield (
+            record['id'], record['user_id'], record['file_id'], record['project_id'],
+            record['action'], record['details'], record['timestamp'], record['ip_address'],
+            record['username'], record['filename']
+        )
+
+
+def _gzip_chunks(chunks):
+    """Compress a stream of text chunks into a single gzip member"""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
 @audit_bp.route('/export', methods=['GET'])
 @login_required
 def export_audit_logs():
-    """Export audit logs as CSV"""
+    """
+    Export audit logs as CSV or NDJSON
+
+    Rows are read through a server-side cursor in batches of
+    EXPORT_BATCH_SIZE and streamed to the client as they are rendered, so
+    memory use does not depend on the number of rows exported.
+
+    Query parameters:
+        format: 'csv' (default) or 'ndjson'
+        gzip: Set to 1 to gzip the response
+        include_archived: Set to 1 to append matching rows from the cold
+            archive after the database rows
+    """
     if not current_user.can_approve():
         return jsonify({'error': 'Insufficient permissions'}), 403
     
-    user_id = request.args.get('user_id', type=int)
-    file_id = request.args.get('file_id', type=int)
-    project_id = request.args.get('project_id', type=int)
-    action = request.args.get('action')
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unsupported export format: {export_format}'}), 400
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    include_archived = request.args.get('include_archived', '').lower() in ('1', 'true', 'yes')
+    
+    try:
+        filters = _parse_filters()
+        conditions = _filter_conditions(filters)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid filter: {e}'}), 400
+    
+    rows = (
+        db.session.query(
+            AuditLog.id, AuditLog.user_id, AuditLog.file_id, AuditLog.project_id,
+            AuditLog.action, AuditLog.details, AuditLog.timestamp, AuditLog.ip_address,
+            User.username, File.filename
+        )
+        .outerjoin(User, User.id == AuditLog.user_id)
+        .outerjoin(File, File.id == AuditLog.file_id)
+        .filter(*conditions)
+        .order_by(AuditLog.timestamp.desc(), AuditLog.id.desc())
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    
+    if include_archived:
+        # Archived months are all older than what is left in the database
+        rows = itertools.chain(rows, _archived_rows(filters))
+    
+    chunks = _export_chunks(rows, export_format)
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    if compress:
+        chunks = _gzip_chunks(chunks)
+        mimetype, extension = 'application/gzip', f'{extension}.gz'
     
-    query = AuditLog.query
-    
-    if user_id:
-        query = query.filter_by(user_id=user_id)
-    if file_id:
-        query = query.filter_by(file_id=file_id)
-    if project_id:
-        query = query.filter_by(project_id=project_id)
-    if action:
-        query = query.filter_by(action=action)
-    if start_date:
-        start = datetime.fromisoformat(start_date)
-        query = query.filter(AuditLog.timestamp >= start)
-    if end_date:
-        end = datetime.fromisoformat(end_date)
-        query = query.filter(AuditLog.timestamp <= end)
-    
-    logs = query.order_by(AuditLog.timestamp.desc()).all()
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    writer.writerow(['Timestamp', 'User', 'Action', 'File', 'Project', 'Details', 'IP Address'])
-    
-    for log in logs:
-        user = User.query.get(log.user_id)
-        username = user.username if user else 'Unknown'
-        
-        filename = ''
-        if log.file_id:
-            file_obj = File.query.get(log.file_id)
-            filename = file_obj.filename if file_obj else ''
-        
-        writer.writerow([
-            log.timestamp.isoformat() if log.timestamp else '',
-            username,
-            log.action,
-            filename,
-            log.project_id or '',
-            str(log.details),
-            log.ip_address or ''
-        ])
-    
-    output.seek(0)
     timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
     
     return Response(
-        output.getvalue(),
-        mimetype='text/csv',
-        headers={'Content-Disposition': f'attachment; filename=audit_log_{timestamp}.csv'}
-    )
\ No newline at end of file
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=audit_log_{timestamp}.{extension}'}
+    )
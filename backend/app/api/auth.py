@@ -2,7 +2,7 @@ from flask import Blueprint, request, jsonify, render_template, redirect, url_fo
 from flask_login import login_user, logout_user, login_required, current_user
 from backend.app import db
 from backend.app.models.user import User
-from backend.app.models.audit_log import AuditLog
+from backend.app.services.audit_sink import audit_sink
 from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__)
@@ -33,9 +33,9 @@ def register():
     user.set_password(password)
     
     db.session.add(user)
-    db.session.commit()
+    db.session.flush()
     
-    AuditLog.log_action(
+    audit_sink.log(
         user_id=user.id,
         action='user_registered',
         details={'username': username, 'email': email},
@@ -74,12 +74,11 @@ def login():
     
     login_user(user, remember=remember)
     
-    AuditLog.log_action(
+    audit_sink.log_buffered(
         user_id=user.id,
         action='user_login',
         ip_address=request.remote_addr
     )
-    db.session.commit()
     
     return jsonify({
         'message': 'Login successful',
@@ -93,12 +92,11 @@ def logout():
     """User logout"""
     user_id = current_user.id
     
-    AuditLog.log_action(
+    audit_sink.log_buffered(
         user_id=user_id,
         action='user_logout',
         ip_address=request.remote_addr
     )
-    db.session.commit()
     
     logout_user()
     
@@ -0,0 +1,45 @@
+from flask import Blueprint, request, jsonify, Response
+from flask_login import login_required
+from backend.app.models.file import File
+from backend.app.models.project import Project
+from backend.app.services.event_hub import event_hub
+
+events_bp = Blueprint('events', __name__)
+
+
+@events_bp.route('', methods=['GET'])
+@login_required
+def stream_events():
+    """
+    Stream file and project change events as server-sent events
+    
+    Query parameters:
+        project_id: Only events for files of this project
+        file_id: Only events for this file
+    
+    Event types: file_checked_out, file_checked_in, version_created and
+    validation_finished. Each carries project_id, file_id and the file's
+    state as of delivery under 'file'. A 'resync' event asks the client to
+    reload instead.
+    """
+    project_id = request.args.get('project_id', type=int)
+    file_id = request.args.get('file_id', type=int)
+    
+    if file_id is not None:
+        File.query.get_or_404(file_id)
+    elif project_id is not None:
+        Project.query.get_or_404(project_id)
+    
+    subscriber = event_hub.subscribe(project_id=project_id, file_id=file_id)
+    if subscriber is None:
+        response = jsonify({'error': 'Too many event streams, retry later'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    
+    # Not wrapped in stream_with_context: the request context, and its
+    # database session, are released before the stream starts
+    response = Response(event_hub.stream(subscriber), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
\ No newline at end of file
@@ -1,23 +1,143 @@
-from flask import Blueprint, request, jsonify, send_file, current_app
+from flask import Blueprint, request, jsonify, send_file, current_app, abort
 from flask_login import login_required, current_user
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
 from werkzeug.utils import secure_filename
 from backend.app import db
 from backend.app.models.file import File
 from backend.app.models.version import Version
 from backend.app.models.project import Project
-from backend.app.models.audit_log import AuditLog
-from backend.app.services.excel_validator import ExcelValidator
+from backend.app.models.blob import Blob
+from backend.app.services.audit_sink import audit_sink
+from backend.app.services.blob_store import blob_store, BlobTooLargeError
+from backend.app.services.bulk_upload import bulk_uploader, BulkUploadError
+from backend.app.services.cell_snapshot import snapshot_store
+from backend.app.services.checkout_locks import checkout_locks
+from backend.app.services.diff_cache import diff_versions
+from backend.app.services.event_hub import event_hub
+from backend.app.services.response_cache import response_cache, file_tags
+from backend.app.services.search_index import search_index
+from backend.app.services.validation_cache import validation_cache
+from backend.app.services.validation_plan import get_project_plan
+from backend.app.services.validation_queue import validation_queue, apply_validation_result
+from backend.app.services.upload_sessions import upload_sessions, UploadOffsetError, UploadIncompleteError
+from backend.app.utils.serializers import serialize_files
+from collections import Counter
+import mimetypes
 import os
-from datetime import datetime
 
 files_bp = Blueprint('files', __name__)
 
+# Largest block of cells a preview returns
+PREVIEW_MAX_ROWS = 500
+PREVIEW_MAX_COLS = 100
+
+# Files per bulk checkout, renew or checkin request
+MAX_BULK_FILES = 500
+
+
+def _download_mimetype(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
 
 
+def _validation_status(version):
+    """Summarize the validation state of a version"""
+    finished = version.validation_status in ('passed', 'failed')
+    return {
+        'version_id': version.id,
+        'status': version.validation_status,
+        'passed': version.validation_status == 'passed' if finished else None,
+        'errors': version.validation_errors or [],
+        'attempts': version.validation_attempts,
+        'validated_at': version.validated_at.isoformat() if version.validated_at else None
+    }
+
+
+def _commit_upload(project, file_obj, filename, commit_message, spooled):
+    """
+    Turn spooled content into a new version of a file
+
+    Shared by direct and resumable uploads. Content identical to the
+    current version only checks the file back in.
+    """
+    current_version = file_obj.current_version
+    if current_version and current_version.content_hash == spooled.sha256:
+        # Byte-identical to the current version: nothing to store or validate
+        blob_store.discard(spooled)
+        file_obj.checkin()
+        
+        audit_sink.log(
+            user_id=current_user.id,
+            action='file_upload_unchanged',
+            file_id=file_obj.id,
+            project_id=project.id,
+            details={'filename': filename, 'version': current_version.version_number},
+            ip_address=request.remote_addr
+        )
+        response_cache.invalidate(*file_tags(file_obj))
+        event_hub.publish_file('file_checked_in', file_obj)
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'File is unchanged; no new version created',
+            'file': file_obj.to_dict(include_versions=True),
+            'validation': _validation_status(current_version)
+        }), 200
+    
+    blob = blob_store.store(spooled)
+    next_version = file_obj.allocate_version_number()
+    
+    version = Version(
+        file_id=file_obj.id,
+        version_number=next_version,
+        blob_id=blob.id,
+        file_size=blob.size,
+        commit_message=commit_message,
+        uploaded_by=current_user.id
+    )
+    
+    db.session.add(version)
+    db.session.flush()
+    
+    # Content already validated against these rules needs no new validation run
+    cached_result = validation_cache.get(blob.sha256, get_project_plan(project))
+    if cached_result is not None:
+        apply_validation_result(version, cached_result)
+        search_index.index_file(file_obj)
+    
+    audit_sink.log(
+        user_id=current_user.id,
+        action='file_uploaded',
+        file_id=file_obj.id,
+        project_id=project.id,
+        details={'filename': filename, 'version': next_version, 'cached_validation': cached_result is not None},
+        ip_address=request.remote_addr
+    )
+    # A first version is a new file, which changes the project list's file counts
+    response_cache.invalidate(*file_tags(file_obj), *(['projects'] if next_version == 1 else []))
+    event_hub.publish_file(
+        'version_created', file_obj,
+        version_number=next_version,
+        validation_status=version.validation_status
+    )
+    db.session.commit()
+    
+    if cached_result is None:
+        # Validation runs on the background worker pool once the version is committed
+        validation_queue.enqueue(version.id)
+        db.session.expire_all()
+    
+    return jsonify({
+        'message': 'File uploaded successfully',
+        'file': file_obj.to_dict(include_versions=True),
+        'validation': _validation_status(version)
+    }), 202 if version.validation_status in ('pending', 'running') else 201
+
+
 @files_bp.route('/upload', methods=['POST'])
 @login_required
 def upload_file():
@@ -48,87 +168,339 @@ def upload_file():
     
     if file_id:
         file_obj = File.query.get_or_404(file_id)
-        if file_obj.checked_out_by != current_user.id:
+        if not checkout_locks.renew([file_obj.id], current_user.id):
             return jsonify({'error': 'File must be checked out by you'}), 403
     else:
         file_obj = File(project_id=project_id, filename=filename)
         db.session.add(file_obj)
         db.session.flush()
     
-    next_version = len(file_obj.versions) + 1
-    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-    stored_filename = f"{file_obj.id}_v{next_version}_{timestamp}_{filename}"
-    file_path = os.path.join(current_app.config['STORAGE_PATH'], stored_filename)
+    try:
+        spooled = blob_store.spool(uploaded_file.stream, max_size=current_app.config['MAX_FILE_SIZE'])
+    except BlobTooLargeError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 413
     
-    uploaded_file.save(file_path)
-    file_size = os.path.getsize(file_path)
+    return _commit_upload(project, file_obj, filename, commit_message, spooled)
+
+
+@files_bp.route('/bulk-upload', methods=['POST'])
+@login_required
+def bulk_upload_files():
+    """
+    Create many files in a project from one request
+
+    Form fields: project_id, commit_message, and either any number of
+    'files' parts or one 'archive' part holding a zip of workbooks. A file
+    that cannot be stored fails without affecting the others, and names
+    already taken in the project are added again as with single uploads;
+    the response lists the outcome of every file in order.
+    """
+    if not current_user.can_edit():
+        return jsonify({'error': 'Insufficient permissions'}), 403
     
-    version = Version(
-        file_id=file_obj.id,
-        version_number=next_version,
-        file_path=file_path,
-        file_size=file_size,
-        commit_message=commit_message,
-        uploaded_by=current_user.id
-    )
+    project_id = request.form.get('project_id')
+    commit_message = request.form.get('commit_message')
     
-    db.session.add(version)
-    db.session.flush()
+    if not project_id or not commit_message:
+        return jsonify({'error': 'Missing required fields'}), 400
     
-    validator = ExcelValidator()
-    validation_result = validator.validate(file_path, project.validation_rules)
+    uploaded_files = [f for f in request.files.getlist('files') if f.filename]
+    archive = request.files.get('archive')
     
-    version.validation_status = 'passed' if validation_result['passed'] else 'failed'
-    version.validation_errors = validation_result['errors']
-    version.validated_at = datetime.utcnow()
+    if not uploaded_files and (archive is None or not archive.filename):
+        return jsonify({'error': 'No files provided'}), 400
     
-    if validation_result['passed']:
-        file_obj.current_version_id = version.id
-        if file_obj.is_checked_out:
-            file_obj.checkin()
+    project = Project.query.get_or_404(project_id)
     
-    db.session.commit()
+    try:
+        if uploaded_files:
+            entries = [(f.filename, lambda f=f: f.stream) for f in uploaded_files]
+            results = bulk_uploader.upload(
+                project, entries, commit_message, current_user.id, request.remote_addr
+            )
+        else:
+            results = bulk_uploader.upload_archive(
+                project, archive.stream, commit_message, current_user.id, request.remote_addr
+            )
+    except BulkUploadError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    
+    # Validation may have finished in the meantime, on another session
+    db.session.expire_all()
+    version_ids = [r['version_id'] for r in results if r['status'] == 'created']
+    statuses = dict(
+        db.session.query(Version.id, Version.validation_status).filter(Version.id.in_(version_ids))
+    ) if version_ids else {}
+    for result in results:
+        if result['status'] == 'created':
+            result['validation_status'] = statuses.get(result['version_id'])
+    
+    summary = Counter(result['status'] for result in results)
+    if not summary['created']:
+        return jsonify({'error': 'No files were created', 'files': results, 'summary': summary}), 400
+    
+    finished = all(statuses.get(v) in ('passed', 'failed') for v in version_ids)
+    return jsonify({
+        'message': f"{summary['created']} of {len(results)} files uploaded",
+        'files': results,
+        'summary': summary
+    }), 201 if finished else 202
+
+
+@files_bp.route('/uploads', methods=['POST'])
+@login_required
+def create_upload_session():
+    """
+    Start a resumable upload
+
+    The content is then sent with PUT /uploads/<upload_id>?offset=N, in as
+    many chunks as the client likes, and turned into a version with
+    POST /uploads/<upload_id>/complete.
+    """
+    if not current_user.can_edit():
+        return jsonify({'error': 'Insufficient permissions'}), 403
+    
+    data = request.get_json() or {}
+    
+    project_id = data.get('project_id')
+    commit_message = data.get('commit_message')
+    file_id = data.get('file_id')
+    filename = data.get('filename')
+    size = data.get('size')
     
-    AuditLog.log_action(
+    if not project_id or not commit_message or not filename:
+        return jsonify({'error': 'Missing required fields'}), 400
+    
+    if not allowed_file(filename):
+        return jsonify({'error': 'Invalid file type'}), 400
+    
+    if size is not None:
+        if not isinstance(size, int) or size < 0:
+            return jsonify({'error': 'Size must be a non-negative integer'}), 400
+        if size > current_app.config['MAX_FILE_SIZE']:
+            return jsonify({'error': f"File exceeds maximum size of {current_app.config['MAX_FILE_SIZE']} bytes"}), 413
+    
+    project = Project.query.get_or_404(project_id)
+    
+    if file_id:
+        file_obj = File.query.get_or_404(file_id)
+        if file_obj.project_id != project.id:
+            return jsonify({'error': 'File does not belong to this project'}), 400
+        if not checkout_locks.renew([file_obj.id], current_user.id):
+            return jsonify({'error': 'File must be checked out by you'}), 403
+    
+    session = upload_sessions.create(
         user_id=current_user.id,
-        action='file_uploaded',
-        file_id=file_obj.id,
-        project_id=project_id,
-        details={'filename': filename, 'version': next_version},
-        ip_address=request.remote_addr
+        project_id=project.id,
+        filename=secure_filename(filename),
+        commit_message=commit_message,
+        file_id=file_id,
+        expected_size=size
     )
     db.session.commit()
     
-    return jsonify({
-        'message': 'File uploaded successfully',
-        'file': file_obj.to_dict(include_versions=True),
-        'validation': validation_result
-    }), 201
+    return jsonify({'upload': session.to_dict()}), 201
+
+
+@files_bp.route('/uploads/<upload_id>', methods=['GET'])
+@login_required
+def get_upload_session(upload_id):
+    """Get the offset a resumable upload should continue from"""
+    session = upload_sessions.get(upload_id, current_user.id)
+    if session is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    return jsonify({'upload': session.to_dict()}), 200
+
+
+@files_bp.route('/uploads/<upload_id>', methods=['PUT'])
+@login_required
+def upload_chunk(upload_id):
+    """Append the request body to a resumable upload at ?offset="""
+    session = upload_sessions.get(upload_id, current_user.id)
+    if session is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'error': 'Missing offset'}), 400
+    
+    try:
+        upload_sessions.write_chunk(session, offset, request.stream)
+    except UploadOffsetError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), 'offset': e.expected}), 409
+    except BlobTooLargeError as e:
+        db.session.commit()
+        return jsonify({'error': str(e)}), 413
+    except Exception:
+        # Keep whatever arrived before the client went away
+        db.session.commit()
+        raise
+    db.session.commit()
+    
+    return jsonify({'upload': session.to_dict()}), 200
+
+
+@files_bp.route('/uploads/<upload_id>/complete', methods=['POST'])
+@login_required
+def complete_upload(upload_id):
+    """Verify a resumable upload and create a version from it"""
+    session = upload_sessions.get(upload_id, current_user.id)
+    if session is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    project = Project.query.get_or_404(session.project_id)
+    
+    if session.file_id:
+        file_obj = File.query.get_or_404(session.file_id)
+        if not checkout_locks.renew([file_obj.id], current_user.id):
+            return jsonify({'error': 'File must be checked out by you'}), 403
+    
+    try:
+        spooled = upload_sessions.complete(session, sha256=data.get('sha256'))
+    except UploadIncompleteError as e:
+        return jsonify({'error': str(e), 'offset': session.received}), 409
+    
+    if not session.file_id:
+        file_obj = File(project_id=project.id, filename=session.filename)
+        db.session.add(file_obj)
+        db.session.flush()
+    
+    return _commit_upload(project, file_obj, session.filename, session.commit_message, spooled)
+
+
+@files_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+def abort_upload(upload_id):
+    """Cancel a resumable upload and discard its data"""
+    session = upload_sessions.get(upload_id, current_user.id)
+    if session is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    upload_sessions.abort(session)
+    db.session.commit()
+    
+    return jsonify({'message': 'Upload cancelled'}), 200
 
 
 @files_bp.route('/<int:file_id>/download', methods=['GET'])
 @login_required
 def download_file(file_id):
-    """Download current version of a file"""
-    file_obj = File.query.get_or_404(file_id)
+    """
+    Download current version of a file
+
+    The ETag is the SHA-256 of the content, so If-None-Match revalidation
+    answers 304 without touching storage. Range requests are honored. With
+    DOWNLOAD_OFFLOAD set, whole-file blobs are handed to the front-end
+    server to transfer; chunked blobs are always streamed from here.
+    """
+    row = (
+        db.session.query(File, Version, Blob)
+        .outerjoin(Version, Version.id == File.current_version_id)
+        .outerjoin(Blob, Blob.id == Version.blob_id)
+        .filter(File.id == file_id)
+        .first()
+    )
+    if row is None:
+        abort(404)
+    file_obj, version, blob = row
     
-    if not file_obj.current_version:
+    if not version:
         return jsonify({'error': 'No version available'}), 404
     
-    AuditLog.log_action(
-        user_id=current_user.id,
-        action='file_downloaded',
-        file_id=file_id,
-        details={'version': file_obj.current_version.version_number},
-        ip_address=request.remote_addr
-    )
-    db.session.commit()
+    if request.if_none_match.contains_weak(blob.sha256):
+        response = current_app.response_class(status=304)
+        response.set_etag(blob.sha256)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    
+    # Resumed or segmented downloads are audited once, on their first range
+    if request.range is None or request.range.ranges[0][0] == 0:
+        audit_sink.log_buffered(
+            user_id=current_user.id,
+            action='file_downloaded',
+            file_id=file_id,
+            details={'version': version.version_number},
+            ip_address=request.remote_addr
+        )
+    
+    offload = current_app.config['DOWNLOAD_OFFLOAD']
+    offloaded = bool(offload) and not blob.is_chunked
+    if offloaded:
+        response = current_app.response_class(mimetype=_download_mimetype(file_obj.filename))
+        response.headers.set('Content-Disposition', 'attachment', filename=file_obj.filename)
+        if offload == 'x-accel-redirect':
+            relative = os.path.relpath(blob.storage_path, current_app.config['STORAGE_PATH'])
+            response.headers['X-Accel-Redirect'] = current_app.config['DOWNLOAD_ACCEL_PREFIX'] + relative.replace(os.sep, '/')
+        else:
+            response.headers['X-Sendfile'] = blob.storage_path
+    else:
+        # Chunked blobs are reassembled on the fly as the response streams
+        response = send_file(
+            blob_store.open(blob),
+            as_attachment=True,
+            download_name=file_obj.filename,
+            conditional=False
+        )
+        response.content_length = blob.size
+    
+    response.set_etag(blob.sha256)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    if offloaded:
+        # The front-end server handles Range itself
+        return response
+    
+    response.accept_ranges = 'bytes'
+    try:
+        return response.make_conditional(request, accept_ranges=True, complete_length=blob.size)
+    except RequestedRangeNotSatisfiable:
+        response.close()
+        raise
+
+
+def _checkout_changed(action, files):
+    """Audit, invalidate and announce checkout changes made by the current user; the caller commits"""
+    audit_sink.log_many([
+        {
+            'user_id': current_user.id,
+            'action': action,
+            'file_id': file_obj.id,
+            'project_id': file_obj.project_id,
+            'ip_address': request.remote_addr
+        }
+        for file_obj in files
+    ])
+    for file_obj in files:
+        response_cache.invalidate(*file_tags(file_obj))
+        if action != 'checkout_renewed':
+            event_hub.publish_file(action, file_obj)
+
+
+def _bulk_file_ids():
+    """Read and check the file_ids list of a bulk request; returns (file_ids, error response)"""
+    data = request.get_json(silent=True) or {}
+    file_ids = data.get('file_ids')
     
-    return send_file(
-        file_obj.current_version.file_path,
-        as_attachment=True,
-        download_name=file_obj.filename
-    )
+    if not isinstance(file_ids, list) or not file_ids or not all(isinstance(i, int) for i in file_ids):
+        return None, (jsonify({'error': 'file_ids must be a non-empty list of file ids'}), 400)
+    if len(file_ids) > MAX_BULK_FILES:
+        return None, (jsonify({'error': f'At most {MAX_BULK_FILES} files per request'}), 400)
+    
+    return list(dict.fromkeys(file_ids)), None
+
+
+def _bulk_response(file_ids, files):
+    changed = {file_obj.id for file_obj in files}
+    return jsonify({
+        'files': serialize_files(files),
+        'failed': [file_id for file_id in file_ids if file_id not in changed]
+    }), 200
 
 
 @files_bp.route('/<int:file_id>/checkout', methods=['POST'])
@@ -138,26 +510,37 @@ def checkout_file(file_id):
     if not current_user.can_edit():
         return jsonify({'error': 'Insufficient permissions'}), 403
     
-    file_obj = File.query.get_or_404(file_id)
-    
-    success, message = file_obj.checkout(current_user.id)
+    File.query.get_or_404(file_id)
     
-    if not success:
-        return jsonify({'error': message}), 400
+    files = checkout_locks.acquire([file_id], current_user.id)
+    if not files:
+        return jsonify({'error': 'File is already checked out'}), 400
     
+    _checkout_changed('file_checked_out', files)
     db.session.commit()
     
-    AuditLog.log_action(
-        user_id=current_user.id,
-        action='file_checked_out',
-        file_id=file_id,
-        ip_address=request.remote_addr
-    )
+    return jsonify({
+        'message': 'File checked out successfully',
+        'file': files[0].to_dict()
+    }), 200
+
+
+@files_bp.route('/<int:file_id>/checkout/renew', methods=['POST'])
+@login_required
+def renew_checkout(file_id):
+    """Extend the lease of a checkout held by the current user"""
+    File.query.get_or_404(file_id)
+    
+    files = checkout_locks.renew([file_id], current_user.id)
+    if not files:
+        return jsonify({'error': 'File is not checked out by you'}), 403
+    
+    _checkout_changed('checkout_renewed', files)
     db.session.commit()
     
     return jsonify({
-        'message': message,
-        'file': file_obj.to_dict()
+        'message': 'Checkout renewed',
+        'file': files[0].to_dict()
     }), 200
 
 
@@ -165,35 +548,82 @@ def checkout_file(file_id):
 @login_required
 def checkin_file(file_id):
     """Check in a file"""
-    file_obj = File.query.get_or_404(file_id)
+    File.query.get_or_404(file_id)
     
-    if file_obj.checked_out_by != current_user.id:
+    files = checkout_locks.release([file_id], current_user.id)
+    if not files:
         return jsonify({'error': 'File is not checked out by you'}), 403
     
-    file_obj.checkin()
-    db.session.commit()
-    
-    AuditLog.log_action(
-        user_id=current_user.id,
-        action='file_checked_in',
-        file_id=file_id,
-        ip_address=request.remote_addr
-    )
+    _checkout_changed('file_checked_in', files)
     db.session.commit()
     
     return jsonify({
         'message': 'File checked in successfully',
-        'file': file_obj.to_dict()
+        'file': files[0].to_dict()
     }), 200
 
 
+@files_bp.route('/checkout', methods=['POST'])
+@login_required
+def bulk_checkout():
+    """
+    Check out many files at once
+
+    JSON body: {"file_ids": [...]}. Files that are checked out by someone
+    else, or do not exist, are listed under 'failed'.
+    """
+    if not current_user.can_edit():
+        return jsonify({'error': 'Insufficient permissions'}), 403
+    
+    file_ids, error = _bulk_file_ids()
+    if error:
+        return error
+    
+    files = checkout_locks.acquire(file_ids, current_user.id)
+    _checkout_changed('file_checked_out', files)
+    db.session.commit()
+    
+    return _bulk_response(file_ids, files)
+
+
+@files_bp.route('/checkout/renew', methods=['POST'])
+@login_required
+def bulk_renew_checkout():
+    """Extend the leases of many checkouts held by the current user"""
+    file_ids, error = _bulk_file_ids()
+    if error:
+        return error
+    
+    files = checkout_locks.renew(file_ids, current_user.id)
+    _checkout_changed('checkout_renewed', files)
+    db.session.commit()
+    
+    return _bulk_response(file_ids, files)
+
+
+@files_bp.route('/checkin', methods=['POST'])
+@login_required
+def bulk_checkin():
+    """Check in many files held by the current user at once"""
+    file_ids, error = _bulk_file_ids()
+    if error:
+        return error
+    
+    files = checkout_locks.release(file_ids, current_user.id)
+    _checkout_changed('file_checked_in', files)
+    db.session.commit()
+    
+    return _bulk_response(file_ids, files)
+
+
 @files_bp.route('/<int:file_id>', methods=['GET'])
 @login_required
+@response_cache.cached('file:{file_id}', per_user=True)
 def get_file(file_id):
     """Get file details with versions"""
     file_obj = File.query.get_or_404(file_id)
     file_dict = file_obj.to_dict(include_versions=True)
-    file_dict['is_checked_out_by_me'] = file_obj.checked_out_by == current_user.id
+    file_dict['is_checked_out_by_me'] = file_obj.is_checked_out and file_obj.checked_out_by == current_user.id
     return jsonify({'file': file_dict}), 200
 
 
@@ -212,5 +642,139 @@ def get_file_versions(file_id):
     file_obj = File.query.get_or_404(file_id)
     
     return jsonify({
-        'versions': [v.to_dict() for v in sorted(file_obj.versions, key=lambda x: x.version_number, reverse=True)]
-    }), 200
\ No newline at end of file
+        'versions': [v.to_dict() for v in file_obj.versions_newest_first()]
+    }), 200
+
+
+@files_bp.route('/<int:file_id>/versions/<int:version_id>/validation', methods=['GET'])
+@login_required
+def get_validation_status(file_id, version_id):
+    """Poll the validation status of an uploaded version"""
+    version = Version.query.filter_by(id=version_id, file_id=file_id).first_or_404()
+    
+    return jsonify({
+        'validation': _validation_status(version),
+        'is_current': version.file.current_version_id == version.id
+    }), 200
+
+
+@files_bp.route('/<int:file_id>/diff', methods=['GET'])
+@login_required
+def diff_file_versions(file_id):
+    """
+    Cell-level diff between two versions of a file
+
+    Query parameters:
+        from: Old version number (default: the one before 'to')
+        to: New version number (default: the latest version)
+    """
+    File.query.get_or_404(file_id)
+    
+    to_number = request.args.get('to', type=int)
+    from_number = request.args.get('from', type=int)
+    
+    if to_number is None:
+        to_number = db.session.query(db.func.max(Version.version_number)).filter_by(file_id=file_id).scalar()
+        if to_number is None:
+            return jsonify({'error': 'No version available'}), 404
+    if from_number is None:
+        from_number = to_number - 1
+    
+    versions = {
+        v.version_number: v for v in
+        Version.query.filter(Version.file_id == file_id, Version.version_number.in_([from_number, to_number]))
+    }
+    if from_number not in versions or to_number not in versions:
+        return jsonify({'error': 'Version not found'}), 404
+    
+    old_version = versions[from_number]
+    new_version = versions[to_number]
+    
+    try:
+        diff, cached = diff_versions(old_version, new_version)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to diff versions: {str(e)}'}), 422
+    db.session.commit()
+    
+    return jsonify({
+        'from_version': old_version.to_dict(),
+        'to_version': new_version.to_dict(),
+        'cached': cached,
+        'diff': diff
+    }), 200
+
+
+@files_bp.route('/<int:file_id>/preview', methods=['GET'])
+@login_required
+def preview_file(file_id):
+    """
+    Cell values of a block of a sheet, read from the version's snapshot
+
+    Query parameters:
+        version: Version number (default: the current version)
+        sheet: Sheet name (default: the first sheet)
+        start: First row (default: 1)
+        rows: Number of rows (default: 50)
+        cols: Number of columns (default: 26)
+    """
+    file_obj = File.query.get_or_404(file_id)
+    
+    version_number = request.args.get('version', type=int)
+    if version_number is None:
+        version = file_obj.current_version
+    else:
+        version = Version.query.filter_by(file_id=file_id, version_number=version_number).first()
+    if not version:
+        return jsonify({'error': 'Version not found'}), 404
+    
+    start = max(request.args.get('start', 1, type=int), 1)
+    row_count = min(max(request.args.get('rows', 50, type=int), 1), PREVIEW_MAX_ROWS)
+    col_count = min(max(request.args.get('cols', 26, type=int), 1), PREVIEW_MAX_COLS)
+    
+    try:
+        snapshot = snapshot_store.ensure(version.blob)
+    except Exception as e:
+        return jsonify({'error': f'Failed to read workbook: {str(e)}'}), 422
+    if snapshot is None:
+        return jsonify({'error': 'Previews are not enabled'}), 404
+    
+    sheet_name = request.args.get('sheet') or snapshot.sheetnames[0]
+    if sheet_name not in snapshot:
+        return jsonify({'error': 'Sheet not found'}), 404
+    sheet = snapshot[sheet_name]
+    
+    rows = [
+        list(row) + [None] * (col_count - len(row))
+        for row in sheet.iter_rows(min_row=start, max_row=start + row_count - 1, max_col=col_count)
+    ]
+    
+    return jsonify({
+        'version': version.version_number,
+        'sheets': snapshot.sheetnames,
+        'sheet': sheet_name,
+        'max_row': sheet.max_row,
+        'max_col': sheet.max_col,
+        'start': start,
+        'rows': rows
+    }), 200
+
+
+@files_bp.route('/validation-cache/stats', methods=['GET'])
+@login_required
+def get_validation_cache_stats():
+    """Get validation cache hit/miss statistics"""
+    if not current_user.is_admin():
+        return jsonify({'error': 'Admin permissions required'}), 403
+    
+    return jsonify({'stats': validation_cache.stats()}), 200
+
+
+@files_bp.route('/response-cache/stats', methods=['GET'])
+@login_required
+def get_response_cache_stats():
+    """Get response cache hit/miss statistics for this worker"""
+    if not current_user.is_admin():
+        return jsonify({'error': 'Admin permissions required'}), 403
+    
+    return jsonify({'stats': response_cache.stats()}), 200
\ No newline at end of file
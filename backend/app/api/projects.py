@@ -2,19 +2,69 @@ from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from backend.app import db
 from backend.app.models.project import Project
-from backend.app.models.audit_log import AuditLog
+from backend.app.models.file import File
+from backend.app.services.audit_sink import audit_sink
+from backend.app.services.blob_store import blob_store
+from backend.app.services.response_cache import response_cache
+from backend.app.services.validation_plan import RuleError, compile_rules, invalidate_project_plan
+from backend.app.utils.pagination import keyset_page, parse_fields, parse_sort
+from backend.app.utils.serializers import FILE_FIELDS, PROJECT_FIELDS, serialize_files, serialize_project, serialize_projects
 
 projects_bp = Blueprint('projects', __name__)
 
+# Page sizes of the project and file listings
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Sortable fields and their columns; the id breaks ties
+PROJECT_SORTS = {
+    'name': Project.name,
+    'created_at': Project.created_at,
+    'updated_at': Project.updated_at,
+    'file_count': Project.file_count
+}
+FILE_SORTS = {
+    'id': File.id,
+    'filename': File.filename,
+    'created_at': File.created_at,
+    'updated_at': File.updated_at
+}
+
+
+def _page_args(sortable, default_sort, allowed_fields):
+    """Read ?limit=, ?sort= and ?fields= of a listing; raises ValueError on bad values"""
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    sort, descending = parse_sort(request.args.get('sort'), sortable, default_sort)
+    fields = parse_fields(request.args.get('fields'), allowed_fields)
+    return limit, sortable[sort], descending, fields
+
 
 @projects_bp.route('', methods=['GET'])
 @login_required
+@response_cache.cached('projects')
 def list_projects():
-    """List all projects"""
-    projects = Project.query.order_by(Project.updated_at.desc()).all()
+    """
+    List projects, one page at a time
+
+    Query parameters:
+        limit: Projects per page (default 50, at most 200)
+        sort: name, created_at, updated_at or file_count, prefixed with
+            '-' for descending order (default -updated_at)
+        fields: Comma-separated project fields to return (default all)
+        cursor: next_cursor of the previous page
+    """
+    try:
+        limit, sort_column, descending, fields = _page_args(PROJECT_SORTS, '-updated_at', PROJECT_FIELDS)
+        projects, next_cursor = keyset_page(
+            Project.query, sort_column, Project.id, descending, request.args.get('cursor'), limit
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
-        'projects': [p.to_dict() for p in projects]
+        'projects': serialize_projects(projects, fields=fields),
+        'count': len(projects),
+        'next_cursor': next_cursor
     }), 200
 
 
@@ -34,6 +84,11 @@ def create_project():
     if not name:
         return jsonify({'error': 'Project name is required'}), 400
     
+    try:
+        compile_rules(validation_rules)
+    except RuleError as e:
+        return jsonify({'error': f'Invalid validation rules: {e}'}), 400
+    
     project = Project(
         name=name,
         description=description,
@@ -42,15 +97,16 @@ def create_project():
     )
     
     db.session.add(project)
-    db.session.commit()
+    db.session.flush()
     
-    AuditLog.log_action(
+    audit_sink.log(
         user_id=current_user.id,
         action='project_created',
         project_id=project.id,
         details={'name': name},
         ip_address=request.remote_addr
     )
+    response_cache.invalidate('projects')
     db.session.commit()
     
     return jsonify({
@@ -61,12 +117,13 @@ def create_project():
 
 @projects_bp.route('/<int:project_id>', methods=['GET'])
 @login_required
+@response_cache.cached('project:{project_id}')
 def get_project(project_id):
     """Get a specific project"""
     project = Project.query.get_or_404(project_id)
     
     return jsonify({
-        'project': project.to_dict(include_files=True)
+        'project': serialize_project(project, include_files=True)
     }), 200
 
 
@@ -85,18 +142,22 @@ def update_project(project_id):
     if 'description' in data:
         project.description = data['description']
     if 'validation_rules' in data:
+        try:
+            compile_rules(data['validation_rules'])
+        except RuleError as e:
+            return jsonify({'error': f'Invalid validation rules: {e}'}), 400
         project.validation_rules = data['validation_rules']
     
-    db.session.commit()
-    
-    AuditLog.log_action(
+    audit_sink.log(
         user_id=current_user.id,
         action='project_updated',
         project_id=project.id,
         details={'updates': list(data.keys())},
         ip_address=request.remote_addr
     )
+    response_cache.invalidate('projects', f'project:{project.id}')
     db.session.commit()
+    invalidate_project_plan(project.id)
     
     return jsonify({
         'message': 'Project updated successfully',
@@ -114,7 +175,7 @@ def delete_project(project_id):
     project = Project.query.get_or_404(project_id)
     project_name = project.name
     
-    AuditLog.log_action(
+    audit_sink.log(
         user_id=current_user.id,
         action='project_deleted',
         project_id=project.id,
@@ -122,8 +183,15 @@ def delete_project(project_id):
         ip_address=request.remote_addr
     )
     
+    file_ids = [file_id for (file_id,) in db.session.query(File.id).filter_by(project_id=project_id)]
+    response_cache.invalidate('projects', f'project:{project_id}', *(f'file:{file_id}' for file_id in file_ids))
+    
     db.session.delete(project)
     db.session.commit()
+    invalidate_project_plan(project_id)
+    
+    # Drop stored content no other version refers to, outside the request
+    blob_store.collect_garbage_in_background()
     
     return jsonify({
         'message': 'Project deleted successfully'
@@ -132,10 +200,31 @@ def delete_project(project_id):
 
 @projects_bp.route('/<int:project_id>/files', methods=['GET'])
 @login_required
+@response_cache.cached('project:{project_id}')
 def list_project_files(project_id):
-    """List all files in a project"""
-    project = Project.query.get_or_404(project_id)
+    """
+    List the files of a project, one page at a time
+
+    Query parameters:
+        limit: Files per page (default 50, at most 200)
+        sort: id, filename, created_at or updated_at, prefixed with '-'
+            for descending order (default id)
+        fields: Comma-separated file fields to return (default all)
+        cursor: next_cursor of the previous page
+    """
+    Project.query.get_or_404(project_id)
+    
+    try:
+        limit, sort_column, descending, fields = _page_args(FILE_SORTS, 'id', FILE_FIELDS)
+        files, next_cursor = keyset_page(
+            File.query.filter_by(project_id=project_id), sort_column, File.id, descending,
+            request.args.get('cursor'), limit
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
-        'files': [f.to_dict() for f in project.files]
+        'files': serialize_files(files, fields=fields),
+        'count': len(files),
+        'next_cursor': next_cursor
     }), 200
\ No newline at end of file
@@ -0,0 +1,67 @@
+from flask import Blueprint, request, jsonify
+from flask_login import login_required
+from backend.app import db
+from backend.app.models.file import File
+from backend.app.models.project import Project
+from backend.app.services.search_index import search_index
+from backend.app.utils.serializers import serialize_files
+
+search_bp = Blueprint('search', __name__)
+
+# Largest page search will return
+MAX_PAGE_SIZE = 100
+
+
+@search_bp.route('', methods=['GET'])
+@login_required
+def search():
+    """
+    Ranked full-text search over files
+    
+    Query parameters:
+        q: Search text; every word must match, the last one as a prefix
+        project_id: Only search one project
+        page: Page number (default: 1)
+        per_page: Results per page (default: 20, max: 100)
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Query parameter q is required'}), 400
+    
+    project_id = request.args.get('project_id', type=int)
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), MAX_PAGE_SIZE)
+    
+    matches, has_more = search_index.search(
+        query,
+        project_id=project_id,
+        limit=per_page,
+        offset=(page - 1) * per_page
+    )
+    
+    files = {f.id: f for f in File.query.filter(File.id.in_([file_id for file_id, _, _ in matches]))}
+    ordered = [files[file_id] for file_id, _, _ in matches if file_id in files]
+    file_dicts = {f['id']: f for f in serialize_files(ordered)}
+    projects = dict(
+        db.session.query(Project.id, Project.name).filter(Project.id.in_({f.project_id for f in ordered}))
+    )
+    
+    results = []
+    for file_id, score, fields in matches:
+        if file_id not in files:
+            continue
+        file_project_id = files[file_id].project_id
+        results.append({
+            'file': file_dicts[file_id],
+            'project': {'id': file_project_id, 'name': projects.get(file_project_id)},
+            'score': round(score, 3),
+            'matched_fields': fields
+        })
+    
+    return jsonify({
+        'query': query,
+        'results': results,
+        'page': page,
+        'per_page': per_page,
+        'has_more': has_more
+    }), 200
\ No newline at end of file
@@ -3,5 +3,13 @@ from backend.app.models.project import Project
 from backend.app.models.file import File
 from backend.app.models.version import Version
 from backend.app.models.audit_log import AuditLog
+from backend.app.models.blob import Blob
+from backend.app.models.chunk import Chunk
+from backend.app.models.validation_cache import ValidationCacheEntry
+from backend.app.models.upload_session import UploadSession
+from backend.app.models.version_diff import VersionDiff
+from backend.app.models.search_term import SearchTerm
+from backend.app.models.cache_tag import CacheTag
+from backend.app.models.response_cache_entry import ResponseCacheEntry
 
-__all__ = ['User', 'Project', 'File', 'Version', 'AuditLog']
\ No newline at end of file
+__all__ = ['User', 'Project', 'File', 'Version', 'AuditLog', 'Blob', 'Chunk', 'ValidationCacheEntry', 'UploadSession', 'VersionDiff', 'SearchTerm', 'CacheTag', 'ResponseCacheEntry']
\ No newline at end of file
@@ -4,6 +4,15 @@ from datetime import datetime
 
 class AuditLog(db.Model):
     __tablename__ = 'audit_logs'
+    # One index per filter supported by the audit API, each ending in the
+    # (timestamp, id) keyset order so filtered pages are index range scans
+    __table_args__ = (
+        db.Index('ix_audit_logs_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_audit_logs_user_timestamp', 'user_id', 'timestamp', 'id'),
+        db.Index('ix_audit_logs_file_timestamp', 'file_id', 'timestamp', 'id'),
+        db.Index('ix_audit_logs_project_timestamp', 'project_id', 'timestamp', 'id'),
+        db.Index('ix_audit_logs_action_timestamp', 'action', 'timestamp', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -12,7 +21,7 @@ class AuditLog(db.Model):
     
     action = db.Column(db.String(100), nullable=False)
     details = db.Column(db.JSON, default={})
-    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     ip_address = db.Column(db.String(45))
     
     def to_dict(self):
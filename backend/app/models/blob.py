@@ -0,0 +1,39 @@
+from backend.app import db
+from datetime import datetime
+
+
+class Blob(db.Model):
+    __tablename__ = 'blobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    
+    # Either a single file on disk, or an ordered list of [sha256, size]
+    # chunk references that reassemble into the exact original bytes
+    storage_path = db.Column(db.String(500), nullable=True)
+    manifest = db.Column(db.JSON, nullable=True)
+    
+    # Number of versions referencing this blob, maintained by Version events
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    @property
+    def is_chunked(self):
+        """Check if the content is stored as deduplicated chunks"""
+        return self.manifest is not None
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'id': self.id,
+            'sha256': self.sha256,
+            'size': self.size,
+            'ref_count': self.ref_count,
+            'chunk_count': len(self.manifest) if self.is_chunked else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    def __repr__(self):
+        return f'<Blob {self.sha256[:12]}>'
@@ -0,0 +1,12 @@
+from backend.app import db
+
+
+class CacheTag(db.Model):
+    """Generation counter of a response cache tag, bumped when the tagged data changes"""
+    __tablename__ = 'response_cache_tags'
+    
+    tag = db.Column(db.String(100), primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<CacheTag {self.tag}@{self.generation}>'
\ No newline at end of file
@@ -0,0 +1,18 @@
+from backend.app import db
+from datetime import datetime
+
+
+class Chunk(db.Model):
+    __tablename__ = 'chunks'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    
+    # Number of times blob manifests reference this chunk
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Chunk {self.sha256[:12]}>'
@@ -0,0 +1,45 @@
+from backend.app import db
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+from collections import Counter, defaultdict
+
+
+def count_change(target, table, column, row_id, delta):
+    """
+    Record a change to a stored counter, applied when the flush ends
+
+    Mapper events call this for every inserted or deleted row, including
+    rows inserted in batches and rows deleted by cascade. The changes of a
+    flush are summed and written with one UPDATE per counter column, so a
+    flush of many rows costs the same as a flush of one.
+
+    Args:
+        target: Instance being inserted or deleted
+        table: Name of the table holding the counter
+        column: Name of the counter column
+        row_id: Primary key of the row holding the counter
+        delta: Amount to add
+    """
+    changes = object_session(target).info.setdefault('counter_changes', Counter())
+    changes[(table, column, row_id)] += delta
+
+
+@event.listens_for(db.session, 'after_flush')
+def _apply_counter_changes(session, flush_context):
+    changes = session.info.pop('counter_changes', None)
+    if not changes:
+        return
+
+    by_column = defaultdict(list)
+    for (table, column, row_id), delta in changes.items():
+        if delta:
+            by_column[(table, column)].append({'row_id': row_id, 'delta': delta})
+
+    connection = session.connection()
+    for (table_name, column), params in by_column.items():
+        table = db.metadata.tables[table_name]
+        values = {column: table.c[column] + db.bindparam('delta')}
+        if 'updated_at' in table.c:
+            # A changed count is not an edit of the row
+            values['updated_at'] = table.c.updated_at
+        connection.execute(table.update().where(table.c.id == db.bindparam('row_id')).values(values), params)
\ No newline at end of file
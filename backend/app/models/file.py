@@ -1,9 +1,22 @@
 from backend.app import db
+from backend.app.models.counters import count_change
 from datetime import datetime
 
 
+# Marks to_dict arguments the caller did not preload
+_UNSET = object()
+
+
 class File(db.Model):
     __tablename__ = 'files'
+    __table_args__ = (
+        # Lets the checkout sweeper find expired leases without a table scan
+        db.Index('ix_files_lease_expires_at', 'lease_expires_at'),
+        # Keyset indexes for each sort order of a project's file list
+        db.Index('ix_files_project_id_id', 'project_id', 'id'),
+        db.Index('ix_files_project_filename_id', 'project_id', 'filename', 'id'),
+        db.Index('ix_files_project_updated_at_id', 'project_id', 'updated_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
@@ -12,60 +25,108 @@ class File(db.Model):
     # Check-out management
     checked_out_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     checked_out_at = db.Column(db.DateTime, nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
     
     # Current version tracking
     current_version_id = db.Column(db.Integer, nullable=True)
     
+    # Counters kept up to date by allocate_version_number()
+    version_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    latest_version_number = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     versions = db.relationship('Version', backref='file', lazy=True, cascade='all, delete-orphan')
     checked_out_user = db.relationship('User', foreign_keys=[checked_out_by])
+    # Index postings are removed by the database's ON DELETE CASCADE
+    search_terms = db.relationship('SearchTerm', lazy='dynamic', cascade='all, delete-orphan', passive_deletes=True)
     
     @property
     def is_checked_out(self):
-        """Check if file is currently checked out"""
-        return self.checked_out_by is not None
+        """Check if file is currently checked out under a lease that has not expired"""
+        if self.checked_out_by is None:
+            return False
+        return self.lease_expires_at is None or self.lease_expires_at >= datetime.utcnow()
     
     @property
     def current_version(self):
         """Get the current version object"""
         if self.current_version_id:
             from backend.app.models.version import Version
-            return Version.query.get(self.current_version_id)
+            return db.session.get(Version, self.current_version_id)
         return None
     
-    def checkout(self, user_id):
-        """Check out the file to a user"""
-        if self.is_checked_out:
-            return False, "File is already checked out"
-        
-        self.checked_out_by = user_id
-        self.checked_out_at = datetime.utcnow()
-        return True, "File checked out successfully"
+    def versions_newest_first(self):
+        """Load the file's versions, newest first, with their blobs in one extra query"""
+        from backend.app.models.version import Version
+        return (
+            Version.query.options(db.selectinload(Version.blob))
+            .filter(Version.file_id == self.id)
+            .order_by(Version.version_number.desc())
+            .all()
+        )
+    
+    def allocate_version_number(self):
+        """
+        Reserve the next version number with one atomic increment
+
+        Concurrent uploads of the same file each get a distinct number,
+        backed by the unique (file_id, version_number) constraint, and the
+        cost does not grow with the number of versions. The file must be
+        flushed; the caller inserts the version and commits.
+        """
+        files = File.__table__
+        number = db.session.execute(
+            files.update()
+            .where(files.c.id == self.id)
+            .values(
+                latest_version_number=files.c.latest_version_number + 1,
+                version_count=files.c.version_count + 1
+            )
+            .returning(files.c.latest_version_number)
+        ).scalar_one()
+        db.session.expire(self, ['latest_version_number', 'version_count', 'updated_at'])
+        return number
     
     def checkin(self):
-        """Check in the file (release lock)"""
+        """
+        Check in the file (release lock)
+
+        Only for a holder already verified by the caller; checkouts taken
+        and released through the API go through services.checkout_locks.
+        """
         self.checked_out_by = None
         self.checked_out_at = None
+        self.lease_expires_at = None
     
-    def to_dict(self, include_versions=False):
-        """Convert to dictionary"""
+    def to_dict(self, include_versions=False, current_version=_UNSET, checked_out_username=_UNSET):
+        """
+        Convert to dictionary
+
+        Listing endpoints pass the current version and checked-out username
+        they loaded in bulk (see utils.serializers); anything not passed is
+        loaded from the relationships.
+        """
+        if current_version is _UNSET:
+            current_version = self.current_version
+
         # Determine status for UI display
         if self.is_checked_out:
             status = 'checked_out'
-        elif self.current_version and self.current_version.validation_status == 'passed':
+        elif current_version and current_version.validation_status == 'passed':
             status = 'available'
-        elif self.current_version and self.current_version.validation_status == 'failed':
+        elif current_version and current_version.validation_status == 'failed':
             status = 'validation_failed'
         else:
             status = 'pending'
 
         # Get username of who checked out
-        checked_out_username = None
-        if self.checked_out_user:
-            checked_out_username = self.checked_out_user.username
+        if checked_out_username is _UNSET:
+            checked_out_username = None
+            if self.checked_out_user:
+                checked_out_username = self.checked_out_user.username
 
         data = {
             'id': self.id,
@@ -74,21 +135,36 @@ class File(db.Model):
             'status': status,
             'is_checked_out': self.is_checked_out,
             'checked_out_by': checked_out_username,
+            'checked_out_by_id': self.checked_out_by,
             'checked_out_at': self.checked_out_at.isoformat() if self.checked_out_at else None,
+            'lease_expires_at': self.lease_expires_at.isoformat() if self.lease_expires_at else None,
             'current_version_id': self.current_version_id,
-            'current_version': len(self.versions),  # For display as "Version X"
-            'version_count': len(self.versions),
+            'current_version': self.version_count,  # For display as "Version X"
+            'version_count': self.version_count,
+            'latest_version_number': self.latest_version_number,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
         if include_versions:
-            data['versions'] = [v.to_dict() for v in sorted(self.versions, key=lambda x: x.version_number, reverse=True)]
+            data['versions'] = [v.to_dict() for v in self.versions_newest_first()]
 
-        if self.current_version:
-            data['current_version_data'] = self.current_version.to_dict()
+        if current_version:
+            data['current_version_data'] = current_version.to_dict()
 
         return data
     
     def __repr__(self):
-        return f'<File {self.filename}>'
\ No newline at end of file
+        return f'<File {self.filename}>'
+
+
+@db.event.listens_for(File, 'after_insert')
+def _increment_file_count(mapper, connection, target):
+    """Count the new file in its project"""
+    count_change(target, 'projects', 'file_count', target.project_id, 1)
+
+
+@db.event.listens_for(File, 'after_delete')
+def _decrement_file_count(mapper, connection, target):
+    """Stop counting the deleted file in its project"""
+    count_change(target, 'projects', 'file_count', target.project_id, -1)
\ No newline at end of file
@@ -4,6 +4,13 @@ from datetime import datetime
 
 class Project(db.Model):
     __tablename__ = 'projects'
+    # Keyset indexes for each sort order of the project list
+    __table_args__ = (
+        db.Index('ix_projects_updated_at_id', 'updated_at', 'id'),
+        db.Index('ix_projects_created_at_id', 'created_at', 'id'),
+        db.Index('ix_projects_name_id', 'name', 'id'),
+        db.Index('ix_projects_file_count_id', 'file_count', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False, index=True)
@@ -12,14 +19,23 @@ class Project(db.Model):
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
+    # Kept up to date by the File insert and delete listeners
+    file_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     # Validation rules stored as JSON
     validation_rules = db.Column(db.JSON, default={})
     
     # Relationships
     files = db.relationship('File', backref='project', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self, include_files=False):
-        """Convert to dictionary"""
+    def to_dict(self, include_files=False, files=None):
+        """
+        Convert to dictionary
+
+        Args:
+            include_files: Include the serialized files
+            files: Preloaded list of serialized file dicts
+        """
         data = {
             'id': self.id,
             'name': self.name,
@@ -27,11 +43,11 @@ class Project(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'created_by': self.created_by,
-            'file_count': len(self.files)
+            'file_count': self.file_count
         }
         
         if include_files:
-            data['files'] = [f.to_dict() for f in self.files]
+            data['files'] = files if files is not None else [f.to_dict() for f in self.files]
         
         return data
     
@@ -0,0 +1,19 @@
+from backend.app import db
+from datetime import datetime
+
+
+class ResponseCacheEntry(db.Model):
+    """Cached GET response body shared between worker processes"""
+    __tablename__ = 'response_cache_entries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # Hash of the request path and the generations of the response's tags
+    key = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    etag = db.Column(db.String(64), nullable=False)
+    body = db.Column(db.LargeBinary, nullable=False)
+    
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<ResponseCacheEntry {self.key[:12]}>'
\ No newline at end of file
@@ -0,0 +1,22 @@
+from backend.app import db
+
+
+class SearchTerm(db.Model):
+    """Posting in the inverted search index: a term found in one field of a file"""
+    __tablename__ = 'search_terms'
+    __table_args__ = (
+        # pattern_ops lets PostgreSQL serve prefix (LIKE 'abc%') lookups from the index
+        db.Index('ix_search_terms_term_file', 'term', 'file_id', postgresql_ops={'term': 'varchar_pattern_ops'}),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    term = db.Column(db.String(64), nullable=False)
+    file_id = db.Column(db.Integer, db.ForeignKey('files.id', ondelete='CASCADE'), nullable=False, index=True)
+    project_id = db.Column(db.Integer, nullable=False)
+    
+    # filename, commit_message, sheet, header or cell
+    field = db.Column(db.String(20), nullable=False)
+    weight = db.Column(db.Float, nullable=False)
+    
+    def __repr__(self):
+        return f'<SearchTerm {self.term} file={self.file_id} {self.field}>'
\ No newline at end of file
@@ -0,0 +1,40 @@
+from backend.app import db
+from datetime import datetime
+
+
+class UploadSession(db.Model):
+    __tablename__ = 'upload_sessions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
+    # Set when the upload is a new version of an existing file
+    file_id = db.Column(db.Integer, db.ForeignKey('files.id'), nullable=True)
+
+    filename = db.Column(db.String(255), nullable=False)
+    commit_message = db.Column(db.Text, nullable=False)
+
+    # Partial content lives in UPLOAD_PATH until the upload is completed
+    temp_path = db.Column(db.String(500), nullable=False)
+    expected_size = db.Column(db.BigInteger, nullable=True)
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'upload_id': self.token,
+            'project_id': self.project_id,
+            'file_id': self.file_id,
+            'filename': self.filename,
+            'expected_size': self.expected_size,
+            'offset': self.received,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def __repr__(self):
+        return f'<UploadSession {self.token[:8]} {self.filename}>'
\ No newline at end of file
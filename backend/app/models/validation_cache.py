@@ -0,0 +1,31 @@
+from backend.app import db
+from datetime import datetime
+
+
+class ValidationCacheEntry(db.Model):
+    __tablename__ = 'validation_cache'
+    __table_args__ = (
+        db.UniqueConstraint('content_hash', 'rules_hash', 'validator_version', name='uq_validation_cache_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    rules_hash = db.Column(db.String(64), nullable=False)
+    validator_version = db.Column(db.String(64), nullable=False)
+    
+    passed = db.Column(db.Boolean, nullable=False)
+    errors = db.Column(db.JSON, default=[])
+    
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    hit_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_result(self):
+        """Convert to the validator's result format"""
+        return {
+            'passed': self.passed,
+            'errors': self.errors or []
+        }
+    
+    def __repr__(self):
+        return f'<ValidationCacheEntry {self.content_hash[:12]}/{self.rules_hash[:12]}>'
@@ -1,16 +1,20 @@
 from backend.app import db
+from backend.app.models.counters import count_change
 from datetime import datetime
 
 
 class Version(db.Model):
     __tablename__ = 'versions'
+    __table_args__ = (
+        db.UniqueConstraint('file_id', 'version_number', name='uq_versions_file_version'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     file_id = db.Column(db.Integer, db.ForeignKey('files.id'), nullable=False)
     version_number = db.Column(db.Integer, nullable=False)
     
-    # File storage
-    file_path = db.Column(db.String(500), nullable=False)
+    # File storage (content-addressed, shared between identical uploads)
+    blob_id = db.Column(db.Integer, db.ForeignKey('blobs.id'), nullable=False, index=True)
     file_size = db.Column(db.Integer)
     
     # Metadata
@@ -22,6 +26,16 @@ class Version(db.Model):
     validation_status = db.Column(db.String(20), default='pending')
     validation_errors = db.Column(db.JSON, default=[])
     validated_at = db.Column(db.DateTime)
+    validation_attempts = db.Column(db.Integer, nullable=False, default=0)
+    validation_started_at = db.Column(db.DateTime)
+    
+    # Relationships
+    blob = db.relationship('Blob')
+    
+    @property
+    def content_hash(self):
+        """SHA-256 of the version content"""
+        return self.blob.sha256
     
     def to_dict(self):
         """Convert to dictionary"""
@@ -29,15 +43,28 @@ class Version(db.Model):
             'id': self.id,
             'file_id': self.file_id,
             'version_number': self.version_number,
-            'file_path': self.file_path,
             'file_size': self.file_size,
+            'content_hash': self.content_hash,
             'commit_message': self.commit_message,
             'uploaded_by': self.uploaded_by,
             'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None,
             'validation_status': self.validation_status,
             'validation_errors': self.validation_errors,
-            'validated_at': self.validated_at.isoformat() if self.validated_at else None
+            'validated_at': self.validated_at.isoformat() if self.validated_at else None,
+            'validation_attempts': self.validation_attempts
         }
     
     def __repr__(self):
-        return f'<Version {self.version_number} of File {self.file_id}>'
\ No newline at end of file
+        return f'<Version {self.version_number} of File {self.file_id}>'
+
+
+@db.event.listens_for(Version, 'after_insert')
+def _increment_blob_refs(mapper, connection, target):
+    """Count the new version as a reference to its blob"""
+    count_change(target, 'blobs', 'ref_count', target.blob_id, 1)
+
+
+@db.event.listens_for(Version, 'after_delete')
+def _decrement_blob_refs(mapper, connection, target):
+    """Release the deleted version's reference to its blob"""
+    count_change(target, 'blobs', 'ref_count', target.blob_id, -1)
\ No newline at end of file
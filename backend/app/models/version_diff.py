@@ -0,0 +1,23 @@
+from backend.app import db
+from datetime import datetime
+
+
+class VersionDiff(db.Model):
+    """Cached diff between two pieces of version content"""
+    __tablename__ = 'version_diffs'
+    __table_args__ = (
+        db.UniqueConstraint('old_hash', 'new_hash', 'differ_version', name='uq_version_diff_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # Keyed by content rather than version, so identical pairs share an entry
+    old_hash = db.Column(db.String(64), nullable=False)
+    new_hash = db.Column(db.String(64), nullable=False)
+    differ_version = db.Column(db.String(64), nullable=False)
+    
+    result = db.Column(db.JSON, nullable=False)
+    
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<VersionDiff {self.old_hash[:12]}..{self.new_hash[:12]}>'
\ No newline at end of file
@@ -1,3 +1,35 @@
+from backend.app.services.validation_plan import ValidationPlan, RuleError, compile_rules
 from backend.app.services.excel_validator import ExcelValidator
+from backend.app.services.workbook_diff import WorkbookDiff
+from backend.app.services.blob_store import BlobStore, blob_store
+from backend.app.services.cell_snapshot import SnapshotStore, snapshot_store
+from backend.app.services.search_index import SearchIndex, search_index
+from backend.app.services.upload_sessions import UploadSessions, upload_sessions
+from backend.app.services.checkout_locks import CheckoutLocks, checkout_locks
+from backend.app.services.response_cache import ResponseCache, response_cache
+from backend.app.services.event_hub import EventHub, event_hub
+from backend.app.services.bulk_upload import BulkUploader, bulk_uploader, BulkUploadError
+from backend.app.services.audit_sink import AuditSink, audit_sink
+from backend.app.services.audit_archive import AuditArchive, audit_archive
+from backend.app.services.validation_cache import ValidationCache, validation_cache
+from backend.app.services.validation_queue import ValidationQueue, validation_queue
+from backend.app.services.maintenance import Maintenance, maintenance
 
-__all__ = ['ExcelValidator']
\ No newline at end of file
+__all__ = [
+    'ValidationPlan', 'RuleError', 'compile_rules',
+    'ExcelValidator',
+    'WorkbookDiff',
+    'BlobStore', 'blob_store',
+    'SnapshotStore', 'snapshot_store',
+    'SearchIndex', 'search_index',
+    'UploadSessions', 'upload_sessions',
+    'CheckoutLocks', 'checkout_locks',
+    'ResponseCache', 'response_cache',
+    'EventHub', 'event_hub',
+    'BulkUploader', 'bulk_uploader', 'BulkUploadError',
+    'AuditSink', 'audit_sink',
+    'AuditArchive', 'audit_archive',
+    'ValidationCache', 'validation_cache',
+    'ValidationQueue', 'validation_queue',
+    'Maintenance', 'maintenance'
+]
\ No newline at end of file
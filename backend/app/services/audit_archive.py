@@ -0,0 +1,313 @@
+from backend.app import db
+from backend.app.models.audit_log import AuditLog
+from backend.app.models.user import User
+from backend.app.models.file import File
+from datetime import datetime, timedelta
+import gzip
+import json
+import os
+import re
+import tempfile
+
+
+ARCHIVE_NAME = re.compile(r'^audit_logs_(\d{4})_(\d{2})(?:\.(\d+))?\.ndjson\.gz$')
+
+ARCHIVE_FIELDS = (
+    'id', 'user_id', 'file_id', 'project_id', 'action',
+    'details', 'timestamp', 'ip_address', 'username', 'filename'
+)
+
+# Index replaced by ix_audit_logs_timestamp_id
+LEGACY_INDEXES = ('ix_audit_logs_timestamp',)
+
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1)
+
+
+def next_month(moment):
+    return datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"audit_logs_y{month.year:04d}m{month.month:02d}"
+
+
+def row_matches(record, filters):
+    """
+    Check an archived record against parsed audit filters
+
+    Args:
+        record: Archived audit record dict
+        filters: Dict with optional 'user_id', 'file_id', 'project_id' and
+            'action' value lists and 'start_date'/'end_date' datetimes
+    """
+    for key in ('user_id', 'file_id', 'project_id', 'action'):
+        values = filters.get(key)
+        if values and record[key] not in values:
+            return False
+
+    timestamp = record['timestamp']
+    if filters.get('start_date') and timestamp < filters['start_date']:
+        return False
+    if filters.get('end_date') and timestamp > filters['end_date']:
+        return False
+    return True
+
+
+class AuditArchive:
+    """
+    Indexing, monthly partitioning and cold archival of the audit table
+
+    Months older than AUDIT_RETENTION_DAYS are written to append-only gzip
+    NDJSON files under AUDIT_ARCHIVE_PATH, one or more per month, newest
+    row first, and removed from the database. Archived rows stay available
+    to the audit export through iter_rows().
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['audit_archive'] = self
+
+    @property
+    def archive_root(self):
+        return self.app.config['AUDIT_ARCHIVE_PATH']
+
+    @property
+    def is_postgres(self):
+        return db.engine.dialect.name == 'postgresql'
+
+    def ensure_indexes(self):
+        """Create the composite audit indexes on an existing table, as migration f3b8c1d27e46 does"""
+        with db.engine.begin() as connection:
+            for index in AuditLog.__table__.indexes:
+                index.create(bind=connection, checkfirst=True)
+            for name in LEGACY_INDEXES:
+                connection.execute(db.text(f'DROP INDEX IF EXISTS {name}'))
+
+    def is_partitioned(self):
+        if not self.is_postgres:
+            return False
+        return db.session.execute(db.text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = 'audit_logs')"
+        )).scalar()
+
+    def partition_table(self, months_ahead=None):
+        """
+        Convert audit_logs into a table range-partitioned by month (PostgreSQL)
+
+        The existing rows are copied into monthly partitions inside a single
+        transaction; the table is locked for the duration of the copy.
+
+        Returns:
+            False if the table is already partitioned or the database is not
+            PostgreSQL, True once converted
+        """
+        if not self.is_postgres or self.is_partitioned():
+            return False
+
+        with db.engine.begin() as connection:
+            execute = lambda sql: connection.execute(db.text(sql))
+
+            execute('LOCK TABLE audit_logs IN ACCESS EXCLUSIVE MODE')
+            sequence = connection.execute(db.text("SELECT pg_get_serial_sequence('audit_logs', 'id')")).scalar()
+            oldest = connection.execute(db.text('SELECT min("timestamp") FROM audit_logs')).scalar()
+
+            execute('ALTER TABLE audit_logs RENAME TO audit_logs_unpartitioned')
+            if sequence:
+                execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+            execute(
+                'CREATE TABLE audit_logs (LIKE audit_logs_unpartitioned INCLUDING DEFAULTS) '
+                'PARTITION BY RANGE ("timestamp")'
+            )
+            execute('CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT')
+            self._create_partitions(connection, oldest or datetime.utcnow(), months_ahead)
+
+            execute('INSERT INTO audit_logs SELECT * FROM audit_logs_unpartitioned')
+            execute('DROP TABLE audit_logs_unpartitioned')
+
+            # The partition key has to be part of the primary key
+            execute('ALTER TABLE audit_logs ADD PRIMARY KEY (id, "timestamp")')
+            execute('ALTER TABLE audit_logs ADD FOREIGN KEY (user_id) REFERENCES users (id)')
+            execute('ALTER TABLE audit_logs ADD FOREIGN KEY (file_id) REFERENCES files (id)')
+            execute('ALTER TABLE audit_logs ADD FOREIGN KEY (project_id) REFERENCES projects (id)')
+            if sequence:
+                execute(f'ALTER SEQUENCE {sequence} OWNED BY audit_logs.id')
+
+            for index in AuditLog.__table__.indexes:
+                index.create(bind=connection)
+        return True
+
+    def ensure_partitions(self, months_ahead=None):
+        """Create partitions for the current month and the months ahead of it"""
+        if not self.is_partitioned():
+            return []
+        with db.engine.begin() as connection:
+            return self._create_partitions(connection, datetime.utcnow(), months_ahead)
+
+    def _create_partitions(self, connection, start, months_ahead):
+        if months_ahead is None:
+            months_ahead = self.app.config['AUDIT_PARTITION_MONTHS_AHEAD']
+
+        last = month_start(datetime.utcnow())
+        for _ in range(months_ahead):
+            last = next_month(last)
+
+        created = []
+        month = month_start(start)
+        while month <= last:
+            name = partition_name(month)
+            connection.execute(db.text(
+                f'CREATE TABLE IF NOT EXISTS {name} PARTITION OF audit_logs '
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+            ))
+            created.append(name)
+            month = next_month(month)
+        return created
+
+    def archive(self, retention_days=None):
+        """
+        Move every whole month older than the retention period to the archive
+
+        Returns:
+            List of (month, row count, archive path) tuples
+        """
+        if retention_days is None:
+            retention_days = self.app.config['AUDIT_RETENTION_DAYS']
+        cutoff = month_start(datetime.utcnow() - timedelta(days=retention_days))
+
+        oldest = db.session.query(db.func.min(AuditLog.timestamp)).scalar()
+        db.session.commit()
+        if oldest is None:
+            return []
+
+        partitioned = self.is_partitioned()
+        archived = []
+        month = month_start(oldest)
+        while month < cutoff:
+            end = next_month(month)
+            count, path, max_id = self._write_month(month, end)
+            if count:
+                self._drop_month(month, end, max_id, partitioned)
+                archived.append((month, count, path))
+            month = end
+        return archived
+
+    def _write_month(self, start, end):
+        """Write one month of rows to a new archive file, newest first"""
+        columns = (
+            AuditLog.id, AuditLog.user_id, AuditLog.file_id, AuditLog.project_id, AuditLog.action,
+            AuditLog.details, AuditLog.timestamp, AuditLog.ip_address, User.username, File.filename
+        )
+        rows = (
+            db.session.query(*columns)
+            .outerjoin(User, User.id == AuditLog.user_id)
+            .outerjoin(File, File.id == AuditLog.file_id)
+            .filter(AuditLog.timestamp >= start, AuditLog.timestamp < end)
+            .order_by(AuditLog.timestamp.desc(), AuditLog.id.desc())
+            .execution_options(yield_per=1000)
+        )
+
+        os.makedirs(self.archive_root, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix='audit-', suffix='.part', dir=self.archive_root)
+        count = 0
+        max_id = 0
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as out:
+                for row in rows:
+                    record = dict(zip(ARCHIVE_FIELDS, row))
+                    record['timestamp'] = record['timestamp'].isoformat()
+                    out.write(json.dumps(record, default=str).encode('utf-8') + b'\n')
+                    count += 1
+                    max_id = max(max_id, record['id'])
+                out.flush()
+                raw.flush()
+                os.fsync(raw.fileno())
+        except Exception:
+            os.remove(temp_path)
+            raise
+        finally:
+            db.session.commit()
+
+        if not count:
+            os.remove(temp_path)
+            return 0, None, None
+
+        path = self._new_archive_path(start)
+        os.replace(temp_path, path)
+        return count, path, max_id
+
+    def _new_archive_path(self, month):
+        """Archives are never rewritten; a month archived twice gets a numbered part"""
+        base = f"audit_logs_{month.year:04d}_{month.month:02d}"
+        path = os.path.join(self.archive_root, f"{base}.ndjson.gz")
+        part = 1
+        while os.path.exists(path):
+            path = os.path.join(self.archive_root, f"{base}.{part}.ndjson.gz")
+            part += 1
+        return path
+
+    def _drop_month(self, start, end, max_id, partitioned):
+        """Remove archived rows from the database"""
+        name = partition_name(start)
+        if partitioned and db.session.execute(
+            db.text('SELECT to_regclass(:name) IS NOT NULL'), {'name': name}
+        ).scalar():
+            db.session.execute(db.text(f'ALTER TABLE audit_logs DETACH PARTITION {name}'))
+            db.session.execute(db.text(f'DROP TABLE {name}'))
+        else:
+            # Rows that arrived after the archive was written stay for the next run
+            db.session.execute(
+                db.delete(AuditLog).where(
+                    AuditLog.timestamp >= start,
+                    AuditLog.timestamp < end,
+                    AuditLog.id <= max_id
+                )
+            )
+        db.session.commit()
+
+    def archive_files(self):
+        """Archive files as ((year, month, part), path), newest month first"""
+        if not os.path.isdir(self.archive_root):
+            return []
+
+        files = []
+        for name in os.listdir(self.archive_root):
+            match = ARCHIVE_NAME.match(name)
+            if match:
+                year, month, part = match.groups()
+                files.append(((int(year), int(month), int(part or 0)), os.path.join(self.archive_root, name)))
+        files.sort(reverse=True)
+        return files
+
+    def iter_rows(self, filters):
+        """
+        Yield archived records matching the filters, newest month first
+
+        Whole files outside the requested date range are skipped unread.
+        """
+        start_date = filters.get('start_date')
+        end_date = filters.get('end_date')
+
+        for (year, month, _part), path in self.archive_files():
+            first = datetime(year, month, 1)
+            if start_date and next_month(first) <= start_date:
+                continue
+            if end_date and first > end_date:
+                continue
+
+            with gzip.open(path, 'rt', encoding='utf-8') as fh:
+                for line in fh:
+                    record = json.loads(line)
+                    record['timestamp'] = datetime.fromisoformat(record['timestamp'])
+                    if row_matches(record, filters):
+                        yield record
+
+
+audit_archive = AuditArchive()
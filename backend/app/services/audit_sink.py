@@ -0,0 +1,181 @@
+from backend.app import db
+from backend.app.models.audit_log import AuditLog
+from datetime import datetime
+import atexit
+import os
+import queue
+import threading
+import time
+
+
+# Queued by shutdown() to wake the flusher thread without waiting out its interval
+_STOP = object()
+
+
+class AuditSink:
+    """
+    Single entry point for writing audit events
+
+    Events that must agree with a business change are added to the
+    caller's session with log() and committed together with that change.
+    High-volume read events (downloads, logins) go through log_buffered():
+    they are queued in memory and bulk-inserted by a background thread
+    once AUDIT_FLUSH_BATCH events are waiting or AUDIT_FLUSH_INTERVAL
+    seconds have passed, and whatever is left is flushed at shutdown.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['audit_sink'] = self
+        if not self._registered:
+            atexit.register(self.shutdown)
+            self._registered = True
+
+    def log(self, user_id, action, file_id=None, project_id=None, details=None, ip_address=None):
+        """Add an event to the current session, to be committed with the caller's changes"""
+        return AuditLog.log_action(
+            user_id=user_id,
+            action=action,
+            file_id=file_id,
+            project_id=project_id,
+            details=details,
+            ip_address=ip_address
+        )
+
+    def log_many(self, events):
+        """
+        Add many events to the current session with one multi-row INSERT
+
+        Args:
+            events: Dictionaries with the keyword arguments of log()
+        """
+        if not events:
+            return
+        db.session.execute(db.insert(AuditLog), [
+            {
+                'user_id': event['user_id'],
+                'action': event['action'],
+                'file_id': event.get('file_id'),
+                'project_id': event.get('project_id'),
+                'details': event.get('details') or {},
+                'ip_address': event.get('ip_address')
+            }
+            for event in events
+        ])
+
+    def log_buffered(self, user_id, action, file_id=None, project_id=None, details=None, ip_address=None):
+        """
+        Record an event outside the caller's transaction
+
+        The event is timestamped now but written later in a batch. If the
+        buffer is full, or buffering is disabled, it is written immediately.
+        """
+        event = {
+            'user_id': user_id,
+            'action': action,
+            'file_id': file_id,
+            'project_id': project_id,
+            'details': details or {},
+            'ip_address': ip_address,
+            'timestamp': datetime.utcnow()
+        }
+
+        if not self.app.config['AUDIT_BUFFERED']:
+            self._write([event])
+            return
+
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # Slow the request down rather than drop the event
+            self._write([event])
+
+    def flush(self):
+        """Write every buffered event now"""
+        if self._queue is None:
+            return 0
+
+        events = []
+        while True:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is not _STOP:
+                events.append(event)
+        if events:
+            self._write(events)
+        return len(events)
+
+    def shutdown(self):
+        """Stop the flusher thread and write what is still buffered"""
+        self._stopping.set()
+        if self._thread is not None and self._pid == os.getpid():
+            try:
+                self._queue.put_nowait(_STOP)
+            except queue.Full:
+                pass
+            self._thread.join(timeout=self.app.config['AUDIT_FLUSH_INTERVAL'] + 5)
+        try:
+            self.flush()
+        except Exception:
+            self.app.logger.exception('Failed to flush buffered audit events at shutdown')
+
+    def _ensure_worker(self):
+        # Started lazily, and again after a fork or a shutdown(), so that
+        # each gunicorn worker has its own buffer and flusher thread
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._queue = queue.Queue(maxsize=self.app.config['AUDIT_BUFFER_SIZE'])
+                self._pid = os.getpid()
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='audit-sink', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        batch_size = self.app.config['AUDIT_FLUSH_BATCH']
+        interval = self.app.config['AUDIT_FLUSH_INTERVAL']
+        events_queue = self._queue
+
+        while not self._stopping.is_set():
+            batch = []
+            deadline = time.monotonic() + interval
+            while len(batch) < batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    event = events_queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if event is _STOP:
+                    break
+                batch.append(event)
+
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+            except Exception:
+                self.app.logger.exception('Failed to write %d buffered audit events', len(batch))
+
+    def _write(self, events):
+        """Bulk-insert events on a connection of their own"""
+        with self.app.app_context():
+            with db.engine.begin() as connection:
+                connection.execute(db.insert(AuditLog), events)
+
+
+audit_sink = AuditSink()
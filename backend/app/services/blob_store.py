@@ -0,0 +1,527 @@
+from backend.app import db
+from backend.app.models.blob import Blob
+from backend.app.models.chunk import Chunk
+from backend.app.services.maintenance import maintenance
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from collections import Counter
+import bisect
+import hashlib
+import io
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import uuid
+
+
+READ_SIZE = 1024 * 1024
+
+# Chunk size for content that is not a zip archive (e.g. legacy .xls)
+FALLBACK_CHUNK_SIZE = 4 * 1024 * 1024
+
+ZIP_EOCD_SIGNATURE = b'PK\x05\x06'
+ZIP_CENTRAL_SIGNATURE = b'PK\x01\x02'
+
+
+class BlobTooLargeError(Exception):
+    """Raised when an upload exceeds the configured maximum size"""
+
+
+class SpooledUpload:
+    """An upload written to UPLOAD_PATH along with its size and SHA-256"""
+
+    def __init__(self, temp_path, sha256, size):
+        self.temp_path = temp_path
+        self.sha256 = sha256
+        self.size = size
+
+
+def zip_member_boundaries(fh, size):
+    """
+    Find the byte offsets at which each zip member starts
+
+    An xlsx file is a zip of per-sheet XML parts. Cutting the file at every
+    local header, plus once at the central directory, gives chunks that
+    stay byte-identical between versions for every sheet that did not
+    change.
+
+    Returns:
+        Sorted list of cut offsets, or None if the file is not a plain zip
+    """
+    tail_size = min(size, 65536 + 22)
+    fh.seek(size - tail_size)
+    tail = fh.read(tail_size)
+
+    eocd = tail.rfind(ZIP_EOCD_SIGNATURE)
+    if eocd < 0 or len(tail) - eocd < 22:
+        return None
+
+    entries, cd_size, cd_offset = struct.unpack('<HII', tail[eocd + 10:eocd + 20])
+    if cd_offset == 0xFFFFFFFF or entries == 0xFFFF or cd_offset + cd_size > size:
+        # Zip64 archives are left to fixed-size chunking
+        return None
+
+    fh.seek(cd_offset)
+    directory = fh.read(cd_size)
+
+    offsets = set()
+    pos = 0
+    for _ in range(entries):
+        if directory[pos:pos + 4] != ZIP_CENTRAL_SIGNATURE:
+            return None
+        name_len, extra_len, comment_len = struct.unpack('<HHH', directory[pos + 28:pos + 34])
+        local_offset, = struct.unpack('<I', directory[pos + 42:pos + 46])
+        if local_offset >= cd_offset:
+            return None
+        offsets.add(local_offset)
+        pos += 46 + name_len + extra_len + comment_len
+
+    offsets.add(cd_offset)
+    offsets.discard(0)
+    return sorted(offsets)
+
+
+def split_chunks(fh, size):
+    """Yield (offset, length) spans that partition the file"""
+    boundaries = zip_member_boundaries(fh, size) if size else None
+    if boundaries is None:
+        boundaries = list(range(FALLBACK_CHUNK_SIZE, size, FALLBACK_CHUNK_SIZE))
+
+    start = 0
+    for end in boundaries + [size]:
+        if end > start:
+            yield start, end - start
+        start = end
+
+
+class ChunkedBlobReader(io.RawIOBase):
+    """Seekable reader that reassembles a chunked blob from its parts"""
+
+    def __init__(self, parts):
+        """
+        Args:
+            parts: Ordered list of (path, size) tuples
+        """
+        super().__init__()
+        self._parts = list(parts)
+        self._starts = []
+        offset = 0
+        for _path, part_size in self._parts:
+            self._starts.append(offset)
+            offset += part_size
+        self._size = offset
+        self._pos = 0
+        self._fh = None
+        self._fh_index = None
+
+    def __reduce__(self):
+        # Lets the reader be handed to validation worker processes
+        return (self.__class__, (self._parts,))
+
+    @property
+    def size(self):
+        return self._size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise ValueError('negative seek position')
+        self._pos = offset
+        return self._pos
+
+    def readinto(self, buffer):
+        if self._pos >= self._size or not len(buffer):
+            return 0
+
+        index = bisect.bisect_right(self._starts, self._pos) - 1
+        if index != self._fh_index:
+            if self._fh is not None:
+                self._fh.close()
+            self._fh = open(self._parts[index][0], 'rb')
+            self._fh_index = index
+
+        part_start = self._starts[index]
+        part_end = part_start + self._parts[index][1]
+        self._fh.seek(self._pos - part_start)
+        count = self._fh.readinto(memoryview(buffer)[:min(len(buffer), part_end - self._pos)])
+        self._pos += count
+        return count
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        super().close()
+
+
+class BlobStore:
+    """
+    Content-addressed storage for version content, keyed by SHA-256
+
+    Unreferenced content is deleted by collect_garbage(), outside of
+    requests: it runs as a maintenance task every BLOB_GC_INTERVAL seconds,
+    whichever way the references went away, and right after a project is
+    deleted. It never deletes a file that an upload is about to rely on:
+    store() locks a blob row it reuses, so the collector's conditional
+    DELETE waits for the upload to commit its reference; uploads touch
+    every chunk file they reuse; and a file is only deleted if it was last
+    written or touched more than BLOB_GC_GRACE_PERIOD seconds ago.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._collector = None
+        self._collector_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['blob_store'] = self
+        maintenance.register('blob-gc', 'BLOB_GC_INTERVAL', self.collect_garbage)
+        if not event.contains(db.session, 'after_commit', _keep_written_files):
+            event.listen(db.session, 'after_commit', _keep_written_files)
+            event.listen(db.session, 'after_transaction_end', _remove_written_files)
+
+    @property
+    def blob_root(self):
+        return os.path.join(self.app.config['STORAGE_PATH'], 'blobs')
+
+    @property
+    def chunk_root(self):
+        return os.path.join(self.app.config['STORAGE_PATH'], 'chunks')
+
+    @property
+    def snapshot_root(self):
+        return os.path.join(self.app.config['STORAGE_PATH'], 'snapshots')
+
+    def blob_path(self, sha256):
+        """Location of a whole-file blob on disk, sharded by hash prefix"""
+        return os.path.join(self.blob_root, sha256[:2], sha256[2:4], sha256)
+
+    def chunk_path(self, sha256):
+        """Location of a chunk on disk, sharded by hash prefix"""
+        return os.path.join(self.chunk_root, sha256[:2], sha256[2:4], sha256)
+
+    def snapshot_path(self, sha256):
+        """Directory holding the columnar cell snapshot of a blob"""
+        return os.path.join(self.snapshot_root, sha256[:2], sha256[2:4], sha256)
+
+    def spool(self, stream, max_size=None):
+        """
+        Write a stream to a temporary file, hashing it as it arrives
+
+        Args:
+            stream: Readable binary stream
+            max_size: Optional size limit in bytes
+
+        Returns:
+            SpooledUpload for the temporary file
+        """
+        fd, temp_path = tempfile.mkstemp(prefix='blob-', suffix='.part', dir=self.app.config['UPLOAD_PATH'])
+        digest = hashlib.sha256()
+        size = 0
+
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(READ_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise BlobTooLargeError(f"File exceeds maximum size of {max_size} bytes")
+                    digest.update(chunk)
+                    out.write(chunk)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+        return SpooledUpload(temp_path, digest.hexdigest(), size)
+
+    def discard(self, spooled):
+        """Remove a spooled upload that will not be stored"""
+        if os.path.exists(spooled.temp_path):
+            os.remove(spooled.temp_path)
+
+    def get(self, sha256):
+        """Look up a blob by content hash"""
+        return Blob.query.filter_by(sha256=sha256).first()
+
+    def store(self, spooled):
+        """
+        Promote a spooled upload into the store
+
+        If a blob with the same content already exists the temporary file is
+        dropped and the existing blob is returned, so identical content is
+        only ever written once. With STORAGE_CHUNKING enabled the content is
+        split into zip-member chunks shared with every other blob.
+        References are counted when a Version using the blob is inserted.
+
+        Files written here are removed again if the session's transaction
+        ends without committing, unless another upload has rewritten or
+        reused them since.
+        """
+        # Locked until the caller commits, so that garbage collection
+        # cannot delete a blob this upload is about to reference
+        blob = Blob.query.filter_by(sha256=spooled.sha256).with_for_update().first()
+        if blob is not None:
+            self.discard(spooled)
+            return blob
+
+        if self.app.config['STORAGE_CHUNKING']:
+            manifest = self._write_chunks(spooled)
+            path = None
+            self.discard(spooled)
+        else:
+            manifest = None
+            path = self.blob_path(spooled.sha256)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.move(spooled.temp_path, path)
+            self._track_written(path)
+
+        try:
+            with db.session.begin_nested():
+                blob = Blob(sha256=spooled.sha256, size=spooled.size, storage_path=path, manifest=manifest)
+                db.session.add(blob)
+                db.session.flush()
+                if manifest is not None:
+                    self._add_chunk_refs(manifest)
+        except IntegrityError:
+            # Another upload stored the same content concurrently
+            blob = self.get(spooled.sha256)
+
+        return blob
+
+    def source(self, blob):
+        """
+        Return something openpyxl can read the blob from
+
+        Whole-file blobs are returned as their path, chunked blobs as a
+        seekable ChunkedBlobReader.
+        """
+        if not blob.is_chunked:
+            return blob.storage_path
+        return ChunkedBlobReader([(self.chunk_path(sha256), size) for sha256, size in blob.manifest])
+
+    def open(self, blob):
+        """Open a blob for reading as a binary stream"""
+        source = self.source(blob)
+        if isinstance(source, str):
+            return open(source, 'rb')
+        return source
+
+    def collect_garbage(self):
+        """
+        Delete blobs and chunks that are no longer referenced
+
+        Returns:
+            Number of blobs deleted
+        """
+        cutoff = time.time() - self.app.config['BLOB_GC_GRACE_PERIOD']
+        orphans = db.session.query(Blob.id, Blob.sha256, Blob.storage_path, Blob.manifest).filter(Blob.ref_count <= 0).all()
+        removed = 0
+        for blob_id, sha256, storage_path, manifest in orphans:
+            trash = self._unlink_pending(storage_path, cutoff) if storage_path else None
+            if trash is None and storage_path and os.path.exists(storage_path):
+                continue
+
+            # Re-check the count in the DELETE in case the blob was reused meanwhile
+            deleted = db.session.execute(
+                db.delete(Blob).where(Blob.id == blob_id, Blob.ref_count <= 0)
+            ).rowcount
+            if deleted and manifest is not None:
+                self._release_chunk_refs(manifest)
+            db.session.commit()
+            self._finish_unlink(trash, storage_path, deleted)
+            if deleted:
+                shutil.rmtree(self.snapshot_path(sha256), ignore_errors=True)
+            removed += deleted
+
+        self._collect_chunks(cutoff)
+        return removed
+
+    def collect_garbage_in_background(self):
+        """Run collect_garbage() on a background thread, unless it is already running"""
+        with self._collector_lock:
+            if self._collector is not None and self._collector.is_alive():
+                return
+            self._collector = threading.Thread(target=self._collect_in_background, name='blob-gc', daemon=True)
+            self._collector.start()
+
+    def _collect_in_background(self):
+        with self.app.app_context():
+            try:
+                self.collect_garbage()
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception('Failed to collect unreferenced blobs')
+            finally:
+                db.session.remove()
+
+    def _unlink_pending(self, path, cutoff):
+        """
+        Move a content file aside if it is old enough to delete
+
+        The file is renamed before its age is checked. An upload that
+        reuses it touches it first, so the age check sees the new time and
+        the file is put back. An upload that finds it gone writes it again.
+
+        Returns:
+            Path the file was moved to, or None if it is gone or was used
+            since cutoff
+        """
+        trash = f'{path}.{uuid.uuid4().hex}.deleted'
+        try:
+            os.rename(path, trash)
+        except FileNotFoundError:
+            return None
+        if os.stat(trash).st_mtime >= cutoff:
+            os.replace(trash, path)
+            return None
+        return trash
+
+    def _finish_unlink(self, trash, path, deleted):
+        """Delete a file moved aside by _unlink_pending(), or put it back if its row was kept"""
+        if trash is None:
+            return
+        if deleted:
+            os.remove(trash)
+        else:
+            os.replace(trash, path)
+
+    def _write_chunks(self, spooled):
+        """Split a spooled upload into content-addressed chunk files"""
+        manifest = []
+        with open(spooled.temp_path, 'rb') as fh:
+            for offset, length in split_chunks(fh, spooled.size):
+                fh.seek(offset)
+                data = fh.read(length)
+                sha256 = hashlib.sha256(data).hexdigest()
+                manifest.append([sha256, length])
+
+                path = self.chunk_path(sha256)
+                try:
+                    # Marks the chunk as just used, see collect_garbage()
+                    os.utime(path)
+                    self._track_touched(path)
+                    continue
+                except FileNotFoundError:
+                    pass
+
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd, temp_path = tempfile.mkstemp(prefix='chunk-', suffix='.part', dir=os.path.dirname(path))
+                with os.fdopen(fd, 'wb') as out:
+                    out.write(data)
+                os.replace(temp_path, path)
+                self._track_written(path)
+        return manifest
+
+    def _track_written(self, path):
+        """Remember a file written for the session's current transaction"""
+        db.session.info.setdefault('written_blob_files', {})[path] = os.stat(path)
+
+    def _track_touched(self, path):
+        # Reusing a file this transaction wrote must not stop its removal on rollback
+        written = db.session.info.get('written_blob_files')
+        if written and path in written:
+            written[path] = os.stat(path)
+
+    def remove_written(self, path, written_stat):
+        """
+        Remove a file written for a transaction that did not commit
+
+        The file is kept if another upload replaced it (new inode) or reused
+        it (new mtime) since; it is set aside before that check, so an
+        upload racing with the removal finds it gone and writes it again.
+        """
+        trash = f'{path}.{uuid.uuid4().hex}.deleted'
+        try:
+            os.rename(path, trash)
+        except FileNotFoundError:
+            return
+        current = os.stat(trash)
+        if (current.st_ino, current.st_mtime_ns) != (written_stat.st_ino, written_stat.st_mtime_ns):
+            os.replace(trash, path)
+        else:
+            os.remove(trash)
+
+    def _add_chunk_refs(self, manifest):
+        """Record chunk rows for a manifest and count its references"""
+        counts = Counter(sha256 for sha256, _size in manifest)
+        sizes = {sha256: size for sha256, size in manifest}
+
+        existing = {
+            sha256 for (sha256,) in
+            db.session.query(Chunk.sha256).filter(Chunk.sha256.in_(list(counts)))
+        }
+        for sha256 in counts:
+            if sha256 not in existing:
+                try:
+                    with db.session.begin_nested():
+                        db.session.add(Chunk(sha256=sha256, size=sizes[sha256], ref_count=0))
+                except IntegrityError:
+                    pass
+
+        for sha256, count in counts.items():
+            db.session.execute(
+                db.update(Chunk).where(Chunk.sha256 == sha256).values(ref_count=Chunk.ref_count + count)
+            )
+
+    def _release_chunk_refs(self, manifest):
+        """Drop the references a deleted blob held on its chunks"""
+        for sha256, count in Counter(sha256 for sha256, _size in manifest).items():
+            db.session.execute(
+                db.update(Chunk).where(Chunk.sha256 == sha256).values(ref_count=Chunk.ref_count - count)
+            )
+
+    def _collect_chunks(self, cutoff):
+        """Delete chunk files that no blob references and nothing used since cutoff"""
+        orphans = db.session.query(Chunk.id, Chunk.sha256).filter(Chunk.ref_count <= 0).all()
+        for chunk_id, sha256 in orphans:
+            path = self.chunk_path(sha256)
+            trash = self._unlink_pending(path, cutoff)
+            if trash is None and os.path.exists(path):
+                continue
+
+            deleted = db.session.execute(
+                db.delete(Chunk).where(Chunk.id == chunk_id, Chunk.ref_count <= 0)
+            ).rowcount
+            db.session.commit()
+            self._finish_unlink(trash, path, deleted)
+
+
+def _keep_written_files(session):
+    """The files written for a transaction are referenced once it commits"""
+    if not session.in_nested_transaction():
+        session.info.pop('written_blob_files', None)
+
+
+def _remove_written_files(session, transaction):
+    """Remove the files written for a transaction that ended without committing"""
+    if transaction.parent is not None:
+        return
+    written = session.info.pop('written_blob_files', None)
+    for path, written_stat in (written or {}).items():
+        try:
+            blob_store.remove_written(path, written_stat)
+        except OSError:
+            blob_store.app.logger.warning('Could not remove %s after a rollback', path)
+
+
+blob_store = BlobStore()
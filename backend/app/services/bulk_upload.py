@@ -0,0 +1,194 @@
+from werkzeug.utils import secure_filename
+from backend.app import db
+from backend.app.models.file import File
+from backend.app.models.version import Version
+from backend.app.services.audit_sink import audit_sink
+from backend.app.services.blob_store import blob_store, BlobTooLargeError
+from backend.app.services.event_hub import event_hub
+from backend.app.services.response_cache import response_cache
+from backend.app.services.validation_queue import validation_queue
+import functools
+import posixpath
+import zipfile
+
+
+class BulkUploadError(Exception):
+    """A bulk upload cannot be processed at all"""
+
+
+class BulkUploader:
+    """
+    Creates many files in one project from a single request
+
+    Every entry is spooled and stored on its own, inside a savepoint, so
+    one that is too large or otherwise unusable only fails itself and
+    leaves the session usable for the rest. As with single uploads, an
+    entry whose name is already taken in the project still gets a file of
+    its own. Stored entries are written in batches of
+    BULK_UPLOAD_BATCH_SIZE: the File, Version and AuditLog rows
+    of a batch are flushed together, which the ORM does with one multi-row
+    INSERT per table, and committed together, so a batch that fails to
+    commit does not undo earlier ones. The content files a failed batch
+    stored are removed by the blob store on rollback.
+    Each committed batch is handed to the validation pool right away and
+    validates while the next one is stored.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['bulk_uploader'] = self
+
+    def upload_archive(self, project, fh, commit_message, user_id, ip_address=None):
+        """
+        Create a file from every workbook in a zip archive
+
+        Folders inside the archive are flattened; only member file names
+        are kept.
+
+        Raises:
+            BulkUploadError: If the archive is unreadable or has more than
+                BULK_UPLOAD_MAX_FILES members
+        """
+        try:
+            archive = zipfile.ZipFile(fh)
+        except zipfile.BadZipFile:
+            raise BulkUploadError('Archive is not a valid zip file')
+
+        with archive:
+            members = [
+                info for info in archive.infolist()
+                if not info.is_dir()
+                and not info.filename.startswith('__MACOSX/')
+                and not posixpath.basename(info.filename).startswith('.')
+            ]
+            self._check_count(len(members))
+            entries = [
+                (posixpath.basename(info.filename), functools.partial(archive.open, info))
+                for info in members
+            ]
+            return self.upload(project, entries, commit_message, user_id, ip_address)
+
+    def upload(self, project, entries, commit_message, user_id, ip_address=None):
+        """
+        Create a file from every entry
+
+        Args:
+            project: Project the files are added to
+            entries: (filename, open) pairs where open() returns a readable
+                binary stream of the content
+            commit_message: Message of every first version
+            user_id: Uploading user
+            ip_address: Client address for the audit log
+
+        Returns:
+            List of per-entry results, in entry order, with 'filename',
+            'status' ('created', 'skipped' or 'failed') and either 'file_id'
+            and 'version_id' or 'error'
+        """
+        self._check_count(len(entries))
+        batch_size = self.app.config['BULK_UPLOAD_BATCH_SIZE']
+        max_size = self.app.config['MAX_FILE_SIZE']
+
+        results = []
+        batch = []
+        for name, open_entry in entries:
+            result = {'filename': name}
+            results.append(result)
+
+            filename = secure_filename(name)
+            if not self._allowed(filename):
+                result.update(status='skipped', error='Invalid file type')
+                continue
+
+            try:
+                with open_entry() as stream:
+                    spooled = blob_store.spool(stream, max_size=max_size)
+                # A failed statement is rolled back to here instead of
+                # aborting the transaction the following entries share
+                with db.session.begin_nested():
+                    blob = blob_store.store(spooled)
+            except BlobTooLargeError as e:
+                result.update(status='failed', error=str(e))
+                continue
+            except Exception as e:
+                self.app.logger.warning('Could not store %s from a bulk upload: %s', name, e)
+                result.update(status='failed', error=f'Could not store file: {e}')
+                continue
+
+            result['stored_as'] = filename
+            batch.append((result, blob))
+            if len(batch) >= batch_size:
+                self._write_batch(project, batch, commit_message, user_id, ip_address)
+                batch = []
+
+        if batch:
+            self._write_batch(project, batch, commit_message, user_id, ip_address)
+        return results
+
+    def _check_count(self, count):
+        limit = self.app.config['BULK_UPLOAD_MAX_FILES']
+        if count > limit:
+            raise BulkUploadError(f'A bulk upload may contain at most {limit} files')
+
+    def _allowed(self, filename):
+        return '.' in filename and filename.rsplit('.', 1)[1].lower() in self.app.config['ALLOWED_EXTENSIONS']
+
+    def _write_batch(self, project, batch, commit_message, user_id, ip_address):
+        """Insert and commit the rows of a batch of stored entries, then queue their validation"""
+        try:
+            files = []
+            versions = []
+            for result, blob in batch:
+                file_obj = File(
+                    project_id=project.id,
+                    filename=result['stored_as'],
+                    version_count=1,
+                    latest_version_number=1
+                )
+                files.append(file_obj)
+                versions.append(Version(
+                    file=file_obj,
+                    version_number=1,
+                    blob_id=blob.id,
+                    file_size=blob.size,
+                    commit_message=commit_message,
+                    uploaded_by=user_id
+                ))
+            db.session.add_all(files)
+            db.session.flush()
+            file_ids = [file_obj.id for file_obj in files]
+            version_ids = [version.id for version in versions]
+
+            audit_sink.log_many([
+                {
+                    'user_id': user_id,
+                    'action': 'file_uploaded',
+                    'file_id': file_id,
+                    'project_id': project.id,
+                    'details': {'filename': result['stored_as'], 'version': 1, 'bulk': True},
+                    'ip_address': ip_address
+                }
+                for file_id, (result, _) in zip(file_ids, batch)
+            ])
+            response_cache.invalidate('projects', f'project:{project.id}')
+            event_hub.publish('files_created', project_id=project.id, file_ids=file_ids)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self.app.logger.exception('Could not save a batch of %d bulk uploaded files', len(batch))
+            for result, _ in batch:
+                del result['stored_as']
+                result.update(status='failed', error=f'Could not save file: {e}')
+            return
+
+        for file_id, version_id, (result, _) in zip(file_ids, version_ids, batch):
+            result.update(status='created', file_id=file_id, version_id=version_id)
+        validation_queue.enqueue_many(version_ids)
+
+
+bulk_uploader = BulkUploader()
@@ -0,0 +1,407 @@
+from backend.app.services.blob_store import blob_store
+from array import array
+from datetime import date, datetime, time
+import hashlib
+import json
+import mmap
+import numpy as np
+import os
+import shutil
+import tempfile
+
+
+SNAPSHOT_FORMAT = 2
+
+# Cell type codes stored in each sheet's types array
+INT, FLOAT, BOOL, STRING, DATE, FORMULA, ERROR = range(7)
+
+NUMERIC_TYPES = (INT, FLOAT, BOOL)
+
+ARRAYS = {
+    'rows': np.int32,
+    'cols': np.int32,
+    'types': np.uint8,
+    'numbers': np.float64,
+    'strings': np.int32,
+    'string_offsets': np.int64
+}
+
+# array module type codes matching ARRAYS, used to buffer cells during extraction
+TYPECODES = {
+    'rows': 'i',
+    'cols': 'i',
+    'types': 'B',
+    'numbers': 'd',
+    'strings': 'i',
+    'string_offsets': 'q'
+}
+
+# Cells buffered per sheet before they are appended to the array files
+WRITE_BLOCK_CELLS = 65536
+
+
+def _classify(cell):
+    """Return (type code, number, text) for a non-empty read-only cell"""
+    value = cell.value
+    if cell.data_type == 'f':
+        # Array formulas come back as objects carrying their text
+        return FORMULA, np.nan, getattr(value, 'text', None) or str(value)
+    if cell.data_type == 'e':
+        return ERROR, np.nan, str(value)
+    if isinstance(value, bool):
+        return BOOL, float(value), None
+    if isinstance(value, int):
+        return INT, float(value), None
+    if isinstance(value, float):
+        return FLOAT, value, None
+    if isinstance(value, (datetime, date, time)):
+        return DATE, np.nan, value.isoformat()
+    return STRING, np.nan, str(value)
+
+
+class _SheetWriter:
+    """Appends one sheet's cells to its array files a block at a time"""
+
+    def __init__(self, path):
+        os.makedirs(path)
+        self._files = {name: open(os.path.join(path, f'{name}.bin'), 'wb') for name in ARRAYS}
+        self._text = open(os.path.join(path, 'text.bin'), 'wb')
+        self._digests = {name: hashlib.sha256() for name in list(ARRAYS) + ['text']}
+        self._buffers = {name: array(code) for name, code in TYPECODES.items()}
+        self._buffers['string_offsets'].append(0)
+        self.cells = 0
+        self.strings = 0
+        self._text_size = 0
+
+    def add(self, row_idx, col_idx, kind, number, text):
+        buffers = self._buffers
+        buffers['rows'].append(row_idx)
+        buffers['cols'].append(col_idx)
+        buffers['types'].append(kind)
+        buffers['numbers'].append(number)
+        if text is None:
+            buffers['strings'].append(-1)
+        else:
+            data = text.encode('utf-8')
+            self._text.write(data)
+            self._digests['text'].update(data)
+            self._text_size += len(data)
+            buffers['strings'].append(self.strings)
+            buffers['string_offsets'].append(self._text_size)
+            self.strings += 1
+
+        self.cells += 1
+        if len(buffers['rows']) >= WRITE_BLOCK_CELLS:
+            self._flush()
+
+    def close(self):
+        """
+        Write the remaining cells and close the files
+
+        Returns:
+            Hex digest of the sheet's arrays and string table
+        """
+        self._flush()
+        for fh in self._files.values():
+            fh.close()
+        self._text.close()
+        combined = hashlib.sha256()
+        for digest in self._digests.values():
+            combined.update(digest.digest())
+        return combined.hexdigest()
+
+    def _flush(self):
+        for name, values in self._buffers.items():
+            data = values.tobytes()
+            self._files[name].write(data)
+            self._digests[name].update(data)
+            self._buffers[name] = array(TYPECODES[name])
+
+
+def extract_snapshot(source, dest_dir):
+    """
+    Extract every sheet of a workbook into columnar arrays
+
+    Each sheet is stored as parallel arrays over its non-empty cells in
+    row-major order: row, column, type code, numeric value (NaN when not a
+    number) and an index into the sheet's string table (-1 when the cell has
+    no text). Strings, formulas, dates and error codes share one UTF-8
+    string table. Arrays are raw native-endian files that are
+    memory-mapped on load. Cells are appended to them every
+    WRITE_BLOCK_CELLS cells, so extraction does not hold a sheet in memory.
+
+    Args:
+        source: Path to the workbook, or a seekable binary file object
+        dest_dir: Empty directory to write the snapshot to
+    """
+    # Imported here because the validator imports this module
+    from backend.app.services.excel_validator import open_workbook
+
+    sheets = []
+    with open_workbook(source) as wb:
+        for index, sheet in enumerate(wb.worksheets):
+            sheet_dir = f'sheet{index}'
+            writer = _SheetWriter(os.path.join(dest_dir, sheet_dir))
+            row_count = 0
+            max_col = 0
+
+            # Dimensions stored in the file are not always reliable
+            sheet.reset_dimensions()
+            for row_idx, row in enumerate(sheet.iter_rows(min_row=1), start=1):
+                row_count = row_idx
+                for col_idx, cell in enumerate(row, start=1):
+                    if cell.value is None:
+                        continue
+                    writer.add(row_idx, col_idx, *_classify(cell))
+                    max_col = max(max_col, col_idx)
+
+            sheets.append({
+                'name': sheet.title,
+                'dir': sheet_dir,
+                'cells': writer.cells,
+                'strings': writer.strings,
+                'max_row': row_count,
+                'max_col': max_col,
+                'digest': writer.close()
+            })
+
+    with open(os.path.join(dest_dir, 'manifest.json'), 'w') as out:
+        json.dump({'format': SNAPSHOT_FORMAT, 'sheets': sheets}, out)
+
+
+class SheetSnapshot:
+    """Columnar cells of one sheet, memory-mapped on first access"""
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.name = meta['name']
+        self.cells = meta['cells']
+        self.strings_count = meta['strings']
+        self.max_row = meta['max_row']
+        self.max_col = meta['max_col']
+        self.digest = meta['digest']
+        self._arrays = {}
+        self._text = None
+
+    def __getattr__(self, name):
+        if name in ARRAYS:
+            if name not in self._arrays:
+                length = self.strings_count + 1 if name == 'string_offsets' else self.cells
+                if length:
+                    self._arrays[name] = np.memmap(
+                        os.path.join(self.path, f'{name}.bin'), dtype=ARRAYS[name], mode='r', shape=(length,)
+                    )
+                else:
+                    self._arrays[name] = np.zeros(0, dtype=ARRAYS[name])
+            return self._arrays[name]
+        raise AttributeError(name)
+
+    @property
+    def title(self):
+        return self.name
+
+    def text(self, string_index):
+        """Decode an entry of the string table, which is memory-mapped on first use"""
+        if self._text is None:
+            with open(os.path.join(self.path, 'text.bin'), 'rb') as fh:
+                size = os.fstat(fh.fileno()).st_size
+                self._text = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        start = int(self.string_offsets[string_index])
+        end = int(self.string_offsets[string_index + 1])
+        return self._text[start:end].decode('utf-8')
+
+    def values(self, start, end):
+        """
+        Python values of cells start to end
+
+        Numbers and booleans come back as int, float or bool; strings,
+        formulas, dates (ISO format) and error codes as text.
+        """
+        values = []
+        numbers = self.numbers[start:end].tolist()
+        strings = self.strings[start:end].tolist()
+        for kind, number, string_index in zip(self.types[start:end].tolist(), numbers, strings):
+            if kind == INT:
+                values.append(int(number))
+            elif kind == FLOAT:
+                values.append(number)
+            elif kind == BOOL:
+                values.append(bool(number))
+            else:
+                values.append(self.text(string_index))
+        return values
+
+    def row_bounds(self, first_row, last_row):
+        """Offsets into the cell arrays where each row from first_row to last_row starts, plus the end"""
+        return np.searchsorted(self.rows, np.arange(first_row, last_row + 2), side='left').tolist()
+
+    def iter_rows(self, min_row=1, max_row=None, max_col=None):
+        """
+        Yield rows as dense tuples of values, None where a cell is empty
+
+        Rows are trimmed after their last non-empty cell, or at max_col.
+        """
+        if max_row is None or max_row > self.max_row:
+            max_row = self.max_row
+        if min_row > max_row:
+            return
+
+        bounds = self.row_bounds(min_row, max_row)
+        for start, end in zip(bounds, bounds[1:]):
+            if start == end:
+                yield ()
+                continue
+            cols = self.cols[start:end].tolist()
+            if max_col is not None:
+                cols = [col for col in cols if col <= max_col]
+                end = start + len(cols)
+                if not cols:
+                    yield ()
+                    continue
+            row = [None] * cols[-1]
+            for col, value in zip(cols, self.values(start, end)):
+                row[col - 1] = value
+            yield tuple(row)
+
+    def headers(self):
+        """
+        Values of the first row, as the validator compares required columns
+
+        Returns:
+            frozenset of strings, or None if the sheet has no rows
+        """
+        if self.max_row == 0:
+            return None
+        start, end = self.row_bounds(1, 1)
+        headers = set()
+        for kind, value in zip(self.types[start:end].tolist(), self.values(start, end)):
+            if not value:
+                continue
+            if kind == DATE:
+                value = _parse_date(value)
+            headers.add(str(value))
+        return frozenset(headers)
+
+
+def _parse_date(text):
+    for parse in (datetime.fromisoformat, date.fromisoformat, time.fromisoformat):
+        try:
+            return parse(text)
+        except ValueError:
+            continue
+    return text
+
+
+class Snapshot:
+    """A workbook's columnar snapshot"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json')) as fh:
+            manifest = json.load(fh)
+        self.format = manifest.get('format')
+        self._sheets = []
+        if self.format != SNAPSHOT_FORMAT:
+            return
+        self._sheets = [SheetSnapshot(os.path.join(path, meta['dir']), meta) for meta in manifest['sheets']]
+
+    @property
+    def sheetnames(self):
+        return [sheet.name for sheet in self._sheets]
+
+    @property
+    def worksheets(self):
+        return list(self._sheets)
+
+    def __getitem__(self, name):
+        for sheet in self._sheets:
+            if sheet.name == name:
+                return sheet
+        raise KeyError(name)
+
+    def __contains__(self, name):
+        return name in self.sheetnames
+
+
+class SnapshotStore:
+    """Columnar snapshots stored next to the blobs they were extracted from"""
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['snapshot_store'] = self
+
+    @property
+    def enabled(self):
+        return self.app.config['SNAPSHOTS_ENABLED']
+
+    def get(self, blob):
+        """
+        Load a blob's snapshot
+
+        Returns:
+            Snapshot, or None if it has not been extracted or was extracted
+            in another SNAPSHOT_FORMAT
+        """
+        if not self.enabled:
+            return None
+        path = blob_store.snapshot_path(blob.sha256)
+        if not os.path.exists(os.path.join(path, 'manifest.json')):
+            return None
+        snapshot = Snapshot(path)
+        if snapshot.format != SNAPSHOT_FORMAT:
+            return None
+        return snapshot
+
+    def ensure(self, blob, force=False):
+        """
+        Return a blob's snapshot, extracting it first if needed
+
+        Extraction writes to a temporary directory that is renamed into
+        place, so readers never see a partial snapshot. A snapshot in an
+        older format is replaced.
+
+        Returns:
+            Snapshot, or None if snapshots are disabled
+        """
+        if not self.enabled:
+            return None
+        path = blob_store.snapshot_path(blob.sha256)
+
+        if not force:
+            snapshot = self.get(blob)
+            if snapshot is not None:
+                return snapshot
+
+        parent = os.path.dirname(path)
+        os.makedirs(parent, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(prefix='snapshot-', suffix='.part', dir=parent)
+        try:
+            extract_snapshot(blob_store.source(blob), temp_dir)
+            if force or self._is_stale(path):
+                shutil.rmtree(path, ignore_errors=True)
+            try:
+                os.rename(temp_dir, path)
+            except OSError:
+                # Extracted concurrently by another worker
+                shutil.rmtree(temp_dir, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+
+        return Snapshot(path)
+
+    def _is_stale(self, path):
+        """Check if a snapshot directory holds another SNAPSHOT_FORMAT"""
+        try:
+            with open(os.path.join(path, 'manifest.json')) as fh:
+                return json.load(fh).get('format') != SNAPSHOT_FORMAT
+        except FileNotFoundError:
+            return os.path.exists(path)
+
+
+snapshot_store = SnapshotStore()
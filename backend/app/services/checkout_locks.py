@@ -0,0 +1,145 @@
+from backend.app import db
+from backend.app.models.file import File
+from backend.app.services.audit_sink import audit_sink
+from backend.app.services.event_hub import event_hub
+from backend.app.services.maintenance import maintenance
+from backend.app.services.response_cache import response_cache, file_tags
+from datetime import datetime, timedelta
+
+
+class CheckoutLocks:
+    """
+    File checkouts as leases, taken and released with conditional UPDATEs
+
+    Taking a checkout is a compare-and-set on checked_out_by: the UPDATE
+    only matches files that are free or whose lease has run out, so of two
+    concurrent requests for a file exactly one changes its row, and the
+    RETURNING clause tells each caller which files it got without reading
+    them first. Leases last CHECKOUT_LEASE_TTL seconds and are extended by
+    renew(). Expired leases are released in bulk by sweep_expired(), which
+    runs as a maintenance task every CHECKOUT_SWEEP_INTERVAL seconds and
+    invalidates the cached responses of the files it checks in, so an idle
+    project does not keep showing a lapsed checkout. Until then an expired
+    lease counts as free: acquire() takes it over and renew() no longer
+    extends it.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['checkout_locks'] = self
+        maintenance.register('checkout-sweep', 'CHECKOUT_SWEEP_INTERVAL', self.sweep_expired)
+
+    def acquire(self, file_ids, user_id):
+        """
+        Check out every free file among file_ids to a user; the caller commits
+
+        Returns:
+            List of the files checked out, reloaded
+        """
+        now = datetime.utcnow()
+        return self._update(
+            db.and_(
+                File.id.in_(file_ids),
+                db.or_(File.checked_out_by.is_(None), File.lease_expires_at < now)
+            ),
+            checked_out_by=user_id,
+            checked_out_at=now,
+            lease_expires_at=self._lease_end(now)
+        )
+
+    def release(self, file_ids, user_id):
+        """
+        Check in the files among file_ids held by a user; the caller commits
+
+        Returns:
+            List of the files checked in, reloaded
+        """
+        return self._update(
+            db.and_(File.id.in_(file_ids), File.checked_out_by == user_id),
+            checked_out_by=None,
+            checked_out_at=None,
+            lease_expires_at=None
+        )
+
+    def renew(self, file_ids, user_id):
+        """
+        Restart the leases of the files among file_ids a user holds a live lease on; the caller commits
+
+        Uploads of new versions renew the file's lease as their holder
+        check, so a checkout that has expired cannot be uploaded to even
+        before it is swept.
+
+        Returns:
+            List of the files renewed, reloaded
+        """
+        now = datetime.utcnow()
+        return self._update(
+            db.and_(File.id.in_(file_ids), self.held_by(user_id, now)),
+            lease_expires_at=self._lease_end(now)
+        )
+
+    def held_by(self, user_id, now):
+        """SQL condition matching files a user holds a lease on that has not expired"""
+        return db.and_(
+            File.checked_out_by == user_id,
+            db.or_(File.lease_expires_at.is_(None), File.lease_expires_at >= now)
+        )
+
+    def sweep_expired(self):
+        """
+        Check in every file whose lease has run out, and commit
+
+        Returns:
+            Number of files checked in
+        """
+        now = datetime.utcnow()
+        holders = dict(
+            db.session.query(File.id, File.checked_out_by)
+            .filter(File.lease_expires_at < now, File.checked_out_by.isnot(None))
+        )
+        if not holders:
+            return 0
+
+        # Still conditional: a lease renewed or retaken since is left alone
+        files = self._update(
+            db.and_(File.id.in_(list(holders)), File.lease_expires_at < now),
+            checked_out_by=None,
+            checked_out_at=None,
+            lease_expires_at=None
+        )
+        audit_sink.log_many([
+            {
+                'user_id': holders[file_obj.id],
+                'action': 'checkout_expired',
+                'file_id': file_obj.id,
+                'project_id': file_obj.project_id
+            }
+            for file_obj in files
+        ])
+        for file_obj in files:
+            response_cache.invalidate(*file_tags(file_obj))
+            event_hub.publish_file('file_checked_in', file_obj, reason='lease_expired')
+        db.session.commit()
+        return len(files)
+
+    def _lease_end(self, now):
+        return now + timedelta(seconds=self.app.config['CHECKOUT_LEASE_TTL'])
+
+    def _update(self, condition, **values):
+        """Apply values to the files matching condition in one statement, returning their new rows"""
+        files = db.session.scalars(
+            db.update(File)
+            .where(condition)
+            .values(**values)
+            .returning(File)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        ).all()
+        return sorted(files, key=lambda file_obj: file_obj.id)
+
+
+checkout_locks = CheckoutLocks()
@@ -0,0 +1,68 @@
+from backend.app import db
+from backend.app.models.version_diff import VersionDiff
+from backend.app.services import workbook_diff
+from backend.app.services.blob_store import blob_store
+from backend.app.services.cell_snapshot import snapshot_store
+from backend.app.services.workbook_diff import WorkbookDiff
+from sqlalchemy.exc import IntegrityError
+import hashlib
+import inspect
+
+
+_differ_version = None
+
+
+def differ_version():
+    """Hash of the diff implementation; cached diffs from other versions are ignored"""
+    global _differ_version
+    if _differ_version is None:
+        with open(inspect.getsourcefile(workbook_diff), 'rb') as fh:
+            _differ_version = hashlib.sha256(fh.read()).hexdigest()
+    return _differ_version
+
+
+def diff_versions(old_version, new_version):
+    """
+    Diff two versions, reusing a cached result when there is one
+
+    Versions never change once written, so a diff is computed once per pair
+    of contents. The caller commits.
+
+    Returns:
+        (result, cached) tuple
+    """
+    old_hash = old_version.content_hash
+    new_hash = new_version.content_hash
+
+    entry = VersionDiff.query.filter_by(
+        old_hash=old_hash,
+        new_hash=new_hash,
+        differ_version=differ_version()
+    ).first()
+    if entry is not None:
+        return entry.result, True
+
+    # Diff the cell snapshots when both versions have one
+    old_source = snapshot_store.get(old_version.blob)
+    new_source = snapshot_store.get(new_version.blob)
+    if old_source is None or new_source is None:
+        old_source = blob_store.source(old_version.blob)
+        new_source = blob_store.source(new_version.blob)
+
+    result = WorkbookDiff().diff(old_source, new_source)
+
+    # Entries written by an older implementation can never be hit again
+    db.session.execute(db.delete(VersionDiff).where(VersionDiff.differ_version != differ_version()))
+    try:
+        with db.session.begin_nested():
+            db.session.add(VersionDiff(
+                old_hash=old_hash,
+                new_hash=new_hash,
+                differ_version=differ_version(),
+                result=result
+            ))
+    except IntegrityError:
+        # Computed concurrently by another request
+        pass
+
+    return result, False
\ No newline at end of file
@@ -0,0 +1,237 @@
+from backend.app import db
+from backend.app.models.file import File
+from sqlalchemy import event
+import itertools
+import json
+import os
+import queue
+import select
+import threading
+import time
+
+
+# PostgreSQL rejects NOTIFY payloads of this many bytes or more
+NOTIFY_PAYLOAD_LIMIT = 8000
+
+
+class Subscriber:
+    """One event stream client, fed through a bounded queue"""
+
+    def __init__(self, project_id=None, file_id=None, queue_size=100):
+        self.project_id = project_id
+        self.file_id = file_id
+        self.queue = queue.Queue(maxsize=queue_size)
+        # Set when the client fell behind and events were dropped
+        self.overflowed = False
+
+    def wants(self, event_data):
+        if self.file_id is not None:
+            return event_data.get('file_id') == self.file_id
+        if self.project_id is not None:
+            return event_data.get('project_id') == self.project_id
+        return True
+
+
+class EventHub:
+    """
+    Fan-out of file and project change events to event stream clients
+
+    Events are published inside the writer's transaction and only delivered
+    once it commits. On PostgreSQL they are sent with NOTIFY, which is
+    transactional, and every worker process receives them through one
+    LISTEN connection that feeds its local subscribers. On other databases
+    delivery is limited to the publishing process.
+
+    Events about a file carry only its ids and a few scalars. The file's
+    current state is loaded by the process serving the streams when it
+    delivers the event, once per event, so payloads stay far below the
+    NOTIFY size limit; an event that would still exceed it is replaced by
+    a 'resync' event for its file or project.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._listener = None
+        self._listener_pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['event_hub'] = self
+        if not event.contains(db.session, 'after_commit', _deliver_staged):
+            event.listen(db.session, 'after_commit', _deliver_staged)
+            event.listen(db.session, 'after_soft_rollback', _discard_staged)
+
+    @property
+    def channel(self):
+        return self.app.config['EVENT_CHANNEL']
+
+    @property
+    def uses_notify(self):
+        return db.engine.dialect.name == 'postgresql'
+
+    def publish(self, event_type, **data):
+        """Publish an event once the current transaction commits"""
+        event_data = dict(data, type=event_type)
+        payload = json.dumps(event_data, default=str)
+        if len(payload.encode('utf-8')) >= NOTIFY_PAYLOAD_LIMIT:
+            event_data = {key: data[key] for key in ('project_id', 'file_id') if key in data}
+            event_data['type'] = 'resync'
+            payload = json.dumps(event_data)
+        if self.uses_notify:
+            db.session.execute(
+                db.text('SELECT pg_notify(:channel, :payload)'),
+                {'channel': self.channel, 'payload': payload}
+            )
+        else:
+            db.session.info.setdefault('staged_events', []).append(event_data)
+
+    def publish_file(self, event_type, file_obj, **data):
+        """Publish an event about a file; its current state is added on delivery"""
+        self.publish(event_type, project_id=file_obj.project_id, file_id=file_obj.id, **data)
+
+    def subscribe(self, project_id=None, file_id=None):
+        """
+        Register a stream client
+
+        Returns:
+            Subscriber, or None if this process already serves
+            EVENT_STREAM_MAX_CLIENTS streams
+        """
+        if self.uses_notify:
+            self._ensure_listener()
+
+        subscriber = Subscriber(project_id, file_id, self.app.config['EVENT_QUEUE_SIZE'])
+        with self._lock:
+            if len(self._subscribers) >= self.app.config['EVENT_STREAM_MAX_CLIENTS']:
+                return None
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def dispatch(self, event_data):
+        """Hand an event to every local subscriber interested in it"""
+        event_data = dict(event_data, id=next(self._ids))
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            if not subscriber.wants(event_data):
+                continue
+            try:
+                subscriber.queue.put_nowait(event_data)
+            except queue.Full:
+                subscriber.overflowed = True
+
+    def stream(self, subscriber):
+        """
+        Yield a subscriber's events as server-sent event text
+
+        A comment is sent every EVENT_STREAM_HEARTBEAT seconds so that dead
+        connections are noticed, and the stream ends after
+        EVENT_STREAM_MAX_AGE seconds; EventSource reconnects on its own.
+        A client that falls behind gets a 'resync' event and is
+        disconnected, and should reload its data.
+        """
+        heartbeat = self.app.config['EVENT_STREAM_HEARTBEAT']
+        deadline = time.monotonic() + self.app.config['EVENT_STREAM_MAX_AGE']
+        try:
+            yield f"retry: {self.app.config['EVENT_STREAM_RETRY_MS']}\n\n"
+            while time.monotonic() < deadline:
+                if subscriber.overflowed:
+                    yield 'event: resync\ndata: {}\n\n'
+                    return
+                try:
+                    event_data = subscriber.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                event_data = self._with_file_state(event_data)
+                yield f"id: {event_data['id']}\nevent: {event_data['type']}\ndata: {json.dumps(event_data, default=str)}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def _with_file_state(self, event_data):
+        """
+        Add the current state of an event's file under 'file'
+
+        dispatch() hands the same event dict to every subscriber, so the
+        file is loaded once per event. An event about a file that no longer
+        exists becomes a 'resync' event.
+        """
+        if 'file_id' not in event_data or event_data['type'] == 'resync':
+            return event_data
+        if 'file' not in event_data:
+            with self.app.app_context():
+                try:
+                    file_obj = db.session.get(File, event_data['file_id'])
+                    event_data['file'] = file_obj.to_dict() if file_obj is not None else None
+                finally:
+                    db.session.remove()
+        if event_data['file'] is None:
+            return {'id': event_data['id'], 'type': 'resync', 'project_id': event_data.get('project_id')}
+        return event_data
+
+    def client_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def _ensure_listener(self):
+        # One listener per process; a forked worker starts its own
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive() and self._listener_pid == os.getpid():
+                return
+            self._listener = threading.Thread(target=self._listen, name='event-listener', daemon=True)
+            self._listener_pid = os.getpid()
+            self._listener.start()
+
+    def _listen(self):
+        """Receive NOTIFY events on a dedicated connection, reconnecting on failure"""
+        while True:
+            connection = None
+            try:
+                with self.app.app_context():
+                    connection = db.engine.raw_connection()
+                # Kept out of the pool for as long as it listens
+                connection.detach()
+                raw = connection.dbapi_connection
+                raw.autocommit = True
+                with raw.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+
+                while True:
+                    if select.select([raw], [], [], 30) == ([], [], []):
+                        continue
+                    raw.poll()
+                    while raw.notifies:
+                        notify = raw.notifies.pop(0)
+                        try:
+                            self.dispatch(json.loads(notify.payload))
+                        except ValueError:
+                            continue
+            except Exception:
+                self.app.logger.exception('Event listener failed; reconnecting')
+                if connection is not None:
+                    connection.close()
+                time.sleep(5)
+
+
+def _deliver_staged(session):
+    """Dispatch events staged in a committed session (databases without NOTIFY)"""
+    staged = session.info.pop('staged_events', None)
+    for event_data in staged or ():
+        event_hub.dispatch(event_data)
+
+
+def _discard_staged(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop('staged_events', None)
+
+
+event_hub = EventHub()
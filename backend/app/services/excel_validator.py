@@ -1,136 +1,421 @@
 import openpyxl
+from openpyxl.utils.cell import get_column_letter
+from backend.app.services.cell_snapshot import Snapshot, INT, FLOAT, BOOL, FORMULA, NUMERIC_TYPES
+from backend.app.services.formula_graph import FormulaGraph, parse_references
+from backend.app.services.validation_plan import ValidationPlan, compile_rules
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from datetime import datetime
+import multiprocessing
+import numpy as np
+import threading
+
+
+_process_pool = None
+_process_pool_size = 0
+_process_pool_lock = threading.Lock()
+
+# Failures of the machine rather than the workbook. validate() lets these
+# propagate instead of reporting them, so that they are retried and never
+# recorded as a file's result.
+ENVIRONMENT_ERRORS = (BrokenProcessPool, OSError, MemoryError)
+
+
+def _get_process_pool(size):
+    """Return the shared sheet worker pool, creating it on first use"""
+    global _process_pool, _process_pool_size
+    with _process_pool_lock:
+        if _process_pool is None or _process_pool_size != size:
+            if _process_pool is not None:
+                _process_pool.shutdown(wait=False)
+            # spawn rather than fork: the parent runs database and validation threads
+            _process_pool = ProcessPoolExecutor(
+                max_workers=size,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _process_pool_size = size
+        return _process_pool
+
+
+def _discard_process_pool(pool):
+    """Drop a pool whose worker died, so that the next scan starts a new one"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False)
+
+
+@contextmanager
+def open_workbook(source):
+    """
+    Open a workbook for streaming reads
+
+    Args:
+        source: Path to the file, or a seekable binary file object
+
+    openpyxl is always given a file object because stored content is named
+    by hash and has no extension for it to check.
+    """
+    if hasattr(source, 'read'):
+        source.seek(0)
+        fh = source
+    else:
+        fh = open(source, 'rb')
+
+    try:
+        wb = openpyxl.load_workbook(fh, read_only=True, data_only=False)
+        try:
+            yield wb
+        finally:
+            wb.close()
+    finally:
+        fh.close()
+
+
+def _scan_sheet_in_worker(source, sheet_name, plan):
+    """Open a workbook in a pool worker and scan only one of its sheets"""
+    with open_workbook(source) as wb:
+        return ExcelValidator()._scan_sheet(wb[sheet_name], plan)
+
+
+def _number_value(kind, number):
+    """Python value of a numeric cell from its type code"""
+    if kind == BOOL:
+        return bool(number)
+    if kind == INT:
+        return int(number)
+    return float(number)
+
+
+class _RangeErrors:
+    """Range rule violations of one sheet, accumulated over blocks of numeric cells"""
+
+    def __init__(self, sheet_name, range_rules, max_errors):
+        self.sheet_name = sheet_name
+        self.range_rules = range_rules
+        self.max_errors = max_errors
+        self.errors = {r.spec: [] for r in range_rules}
+        self.below = dict.fromkeys(self.errors, 0)
+        self.above = dict.fromkeys(self.errors, 0)
+
+    def add(self, rows, cols, kinds, numbers):
+        """Check a block of numeric cells, given as parallel arrays in row-major order"""
+        for r in self.range_rules:
+            covered = np.ones(len(rows), dtype=bool)
+            if r.min_row is not None:
+                covered &= rows >= r.min_row
+            if r.max_row is not None:
+                covered &= rows <= r.max_row
+            if r.min_col is not None:
+                covered &= cols >= r.min_col
+            if r.max_col is not None:
+                covered &= cols <= r.max_col
+
+            below = covered & (numbers < r.min) if r.min is not None else np.zeros(len(rows), dtype=bool)
+            above = covered & (numbers > r.max) if r.max is not None else np.zeros(len(rows), dtype=bool)
+            self.below[r.spec] += int(below.sum())
+            self.above[r.spec] += int(above.sum())
+
+            errors = self.errors[r.spec]
+            for i in np.flatnonzero(below | above)[:self.max_errors - len(errors)].tolist():
+                value = _number_value(kinds[i], numbers[i])
+                coordinate = f"{get_column_letter(int(cols[i]))}{int(rows[i])}"
+                if below[i]:
+                    errors.append(f"Value {value} in {self.sheet_name}!{coordinate} is below minimum {r.min}")
+                else:
+                    errors.append(f"Value {value} in {self.sheet_name}!{coordinate} is above maximum {r.max}")
+
+    def result(self):
+        """Dict mapping each rule's spec to its errors, with the overflow summarized"""
+        range_errors = {}
+        for r in self.range_rules:
+            errors = range_errors[r.spec] = list(self.errors[r.spec])
+            total = self.below[r.spec] + self.above[r.spec]
+            if total > self.max_errors:
+                counts = []
+                if self.below[r.spec]:
+                    counts.append(f"{self.below[r.spec]} below minimum {r.min}")
+                if self.above[r.spec]:
+                    counts.append(f"{self.above[r.spec]} above maximum {r.max}")
+                errors.append(
+                    f"{total - self.max_errors} more values out of range in {r.spec} "
+                    f"({total} in total: {', '.join(counts)})"
+                )
+        return range_errors
 
 
 class ExcelValidator:
     """Service for validating Excel files"""
     
-    def validate(self, file_path, rules):
+    # Cells listed per circular reference error before the rest are summarized
+    MAX_CYCLE_CELLS = 10
+    # Out-of-range values listed per range rule before the rest are summarized
+    MAX_RANGE_ERRORS = 100
+    # Numeric cells buffered and range-checked together
+    RANGE_BLOCK_SIZE = 65536
+
+    def __init__(self, pool_size=0):
+        """
+        Args:
+            pool_size: Number of worker processes used to scan sheets in
+                parallel. 0 or 1 scans sheets serially in this process.
+        """
+        self.pool_size = pool_size
+        # Formula dependency graph of the last validated workbook
+        self.formula_graph = None
+
+    def validate(self, source, rules):
         """
         Validate an Excel file against a set of rules
         
+        The workbook is opened in read-only mode and every sheet is streamed
+        row by row, so each cell is visited exactly once and all rule checks
+        run on that single pass. Peak memory is bounded by row width rather
+        than workbook size. With a pool size above 1, multi-sheet workbooks
+        are sharded across worker processes one sheet at a time.
+
+        A columnar Snapshot of the workbook can be validated instead of the
+        file itself; it gives the same result without parsing any XML.
+
         Args:
-            file_path: Path to the Excel file
-            rules: Dictionary of validation rules
+            source: Path to the Excel file, a seekable binary file object,
+                or a Snapshot
+            rules: Dictionary of validation rules, whose unusable entries are
+                skipped, or a compiled ValidationPlan
             
         Returns:
             Dictionary with 'passed' (bool) and 'errors' (list)
+
+        Raises:
+            One of ENVIRONMENT_ERRORS if the workbook could not be read to
+            the end for reasons other than its content
         """
-        errors = []
+        if isinstance(rules, ValidationPlan):
+            plan = rules
+        else:
+            plan = compile_rules(rules, strict=False)
         
         try:
-            wb = openpyxl.load_workbook(file_path, data_only=False)
+            if isinstance(source, Snapshot):
+                sheetnames = source.sheetnames
+                results = {sheet.title: self._scan_snapshot_sheet(sheet, plan) for sheet in source.worksheets}
+            else:
+                with open_workbook(source) as wb:
+                    sheetnames = wb.sheetnames
+                    sheets = wb.worksheets
+
+                    if self.pool_size > 1 and len(sheets) > 1:
+                        results = self._scan_sheets_parallel(source, [sheet.title for sheet in sheets], plan)
+                    else:
+                        results = {sheet.title: self._scan_sheet(sheet, plan) for sheet in sheets}
+        except ENVIRONMENT_ERRORS:
+            raise
         except Exception as e:
             return {
                 'passed': False,
                 'errors': [f"Failed to open Excel file: {str(e)}"]
             }
         
-        if 'required_sheets' in rules:
-            errors.extend(self._validate_required_sheets(wb, rules['required_sheets']))
+        errors = []
         
-        if 'required_columns' in rules:
-            errors.extend(self._validate_required_columns(wb, rules['required_columns']))
+        errors.extend(self._validate_required_sheets(sheetnames, plan.required_sheets))
         
-        if 'formula_sheets' in rules:
-            errors.extend(self._validate_formulas(wb, rules['formula_sheets']))
+        errors.extend(self._validate_required_columns(results, plan.required_columns))
         
-        if 'data_validations' in rules:
-            errors.extend(self._validate_data_ranges(wb, rules['data_validations']))
+        for sheet_name in plan.formula_sheets:
+            if sheet_name in results:
+                errors.extend(results[sheet_name]['formula_errors'])
         
-        errors.extend(self._check_circular_references(wb))
+        for range_rule in plan.range_rules:
+            if range_rule.sheet in results:
+                errors.extend(results[range_rule.sheet]['range_errors'][range_rule.spec])
         
-        wb.close()
+        self.formula_graph = FormulaGraph()
+        for sheet_name, result in results.items():
+            for row, col, refs in result['formulas']:
+                self.formula_graph.add_references(sheet_name, row, col, refs)
+        errors.extend(self._check_circular_references(self.formula_graph))
         
         return {
             'passed': len(errors) == 0,
             'errors': errors
         }
     
-    def _validate_required_sheets(self, workbook, required_sheets):
+    def _scan_sheets_parallel(self, source, sheet_names, plan):
+        """Scan each sheet in a pool worker, keeping results in workbook order"""
+        pool = _get_process_pool(self.pool_size)
+        futures = [
+            (sheet_name, pool.submit(_scan_sheet_in_worker, source, sheet_name, plan))
+            for sheet_name in sheet_names
+        ]
+        try:
+            return {sheet_name: future.result() for sheet_name, future in futures}
+        except BrokenProcessPool:
+            _discard_process_pool(pool)
+            raise
+
+    def _scan_sheet(self, sheet, plan):
+        """Stream a sheet once, running every per-cell check on the way"""
+        sheet_name = sheet.title
+        check_formulas = plan.checks_formulas(sheet_name)
+        error_pattern = plan.error_pattern
+        range_rules = plan.ranges_for(sheet_name)
+
+        headers = None
+        formula_errors = []
+        formulas = []
+        range_errors = _RangeErrors(sheet_name, range_rules, self.MAX_RANGE_ERRORS)
+        # Numeric cells covered by a range rule, checked a block at a time
+        rows, cols, kinds, numbers = array('i'), array('i'), array('B'), array('d')
+
+        # Dimensions stored in the file are not always reliable
+        sheet.reset_dimensions()
+
+        for row_idx, row in enumerate(sheet.iter_rows(min_row=1), start=1):
+            if headers is None:
+                headers = frozenset(str(cell.value) for cell in row if cell.value)
+
+            row_rules = [r for r in range_rules if r.covers_row(row_idx)]
+
+            for col_idx, cell in enumerate(row, start=1):
+                value = cell.value
+                if value is None:
+                    continue
+
+                if cell.data_type == 'f':
+                    # Array formulas come back as objects carrying their text
+                    formula = getattr(value, 'text', None) or str(value)
+
+                    if check_formulas and error_pattern.search(formula):
+                        coordinate = f"{get_column_letter(col_idx)}{row_idx}"
+                        formula_errors.append(f"Broken formula in {sheet_name}!{coordinate}: {formula}")
+
+                    formulas.append((row_idx, col_idx, parse_references(formula, sheet_name)))
+                    continue
+
+                if (
+                    row_rules and isinstance(value, (int, float))
+                    and any(r.covers_column(col_idx) for r in row_rules)
+                ):
+                    rows.append(row_idx)
+                    cols.append(col_idx)
+                    kinds.append(BOOL if isinstance(value, bool) else INT if isinstance(value, int) else FLOAT)
+                    numbers.append(value)
+
+            if len(rows) >= self.RANGE_BLOCK_SIZE:
+                self._add_range_block(range_errors, rows, cols, kinds, numbers)
+                rows, cols, kinds, numbers = array('i'), array('i'), array('B'), array('d')
+
+        self._add_range_block(range_errors, rows, cols, kinds, numbers)
+        return {
+            'headers': headers,
+            'formula_errors': formula_errors,
+            'formulas': formulas,
+            'range_errors': range_errors.result()
+        }
+
+    def _add_range_block(self, range_errors, rows, cols, kinds, numbers):
+        range_errors.add(
+            np.frombuffer(rows, dtype=np.int32),
+            np.frombuffer(cols, dtype=np.int32),
+            np.frombuffer(kinds, dtype=np.uint8),
+            np.frombuffer(numbers, dtype=np.float64)
+        )
+
+    def _scan_snapshot_sheet(self, sheet, plan):
+        """Run the same checks as _scan_sheet over a sheet snapshot's arrays"""
+        sheet_name = sheet.title
+        check_formulas = plan.checks_formulas(sheet_name)
+        error_pattern = plan.error_pattern
+
+        formula_errors = []
+        formulas = []
+        rows = sheet.rows
+        cols = sheet.cols
+        types = sheet.types
+
+        for i in np.flatnonzero(types == FORMULA).tolist():
+            row_idx = int(rows[i])
+            col_idx = int(cols[i])
+            formula = sheet.text(int(sheet.strings[i]))
+
+            if check_formulas and error_pattern.search(formula):
+                coordinate = f"{get_column_letter(col_idx)}{row_idx}"
+                formula_errors.append(f"Broken formula in {sheet_name}!{coordinate}: {formula}")
+
+            formulas.append((row_idx, col_idx, parse_references(formula, sheet_name)))
+
+        numeric = np.flatnonzero(np.isin(types, NUMERIC_TYPES))
+        range_errors = self._check_ranges(
+            sheet_name, plan.ranges_for(sheet_name),
+            rows[numeric], cols[numeric], types[numeric], sheet.numbers[numeric]
+        )
+
+        return {
+            'headers': sheet.headers(),
+            'formula_errors': formula_errors,
+            'formulas': formulas,
+            'range_errors': range_errors
+        }
+
+    def _check_ranges(self, sheet_name, range_rules, rows, cols, kinds, numbers):
+        """
+        Evaluate range rules over a sheet's numeric cells in bulk
+
+        Args:
+            rows, cols, kinds, numbers: Parallel arrays of the numeric cells
+                in row-major order, with cell_snapshot type codes
+
+        Returns:
+            Dict mapping each rule's spec to its errors. At most
+            MAX_RANGE_ERRORS values are listed per rule, followed by one
+            line summarizing the rest.
+        """
+        range_errors = _RangeErrors(sheet_name, range_rules, self.MAX_RANGE_ERRORS)
+        for start in range(0, len(rows), self.RANGE_BLOCK_SIZE):
+            end = start + self.RANGE_BLOCK_SIZE
+            range_errors.add(rows[start:end], cols[start:end], kinds[start:end], numbers[start:end])
+        return range_errors.result()
+
+    def _check_circular_references(self, graph):
+        """Report every group of formulas that depend on each other"""
+        errors = []
+        for cycle in graph.find_cycles():
+            cells = [graph.coordinate(node) for node in cycle[:self.MAX_CYCLE_CELLS]]
+            if len(cycle) == 1:
+                errors.append(f"Circular reference in {cells[0]}")
+                continue
+
+            listed = ', '.join(cells)
+            if len(cycle) > self.MAX_CYCLE_CELLS:
+                listed += f" (and {len(cycle) - self.MAX_CYCLE_CELLS} more cells)"
+            errors.append(f"Circular reference between {listed}")
+        return errors
+
+    def _validate_required_sheets(self, sheetnames, required_sheets):
         """Check that all required sheets exist"""
         errors = []
         for sheet_name in required_sheets:
-            if sheet_name not in workbook.sheetnames:
+            if sheet_name not in sheetnames:
                 errors.append(f"Missing required sheet: {sheet_name}")
         return errors
     
-    def _validate_required_columns(self, workbook, required_columns):
+    def _validate_required_columns(self, results, required_columns):
         """Check that required columns exist in specified sheets"""
         errors = []
-        for sheet_name, columns in required_columns.items():
-            if sheet_name not in workbook.sheetnames:
+        for sheet_name, columns in required_columns:
+            if sheet_name not in results:
                 continue
             
-            sheet = workbook[sheet_name]
-            if sheet.max_row < 1:
+            headers = results[sheet_name]['headers']
+            if headers is None:
                 errors.append(f"Sheet '{sheet_name}' is empty")
                 continue
             
-            headers = [str(cell.value) for cell in sheet[1] if cell.value]
-            
             for required_col in columns:
                 if required_col not in headers:
                     errors.append(f"Missing required column '{required_col}' in sheet '{sheet_name}'")
         return errors
-    
-    def _validate_formulas(self, workbook, formula_sheets):
-        """Check for broken formulas"""
-        errors = []
-        for sheet_name in formula_sheets:
-            if sheet_name not in workbook.sheetnames:
-                continue
-            
-            sheet = workbook[sheet_name]
-            for row in sheet.iter_rows():
-                for cell in row:
-                    if cell.data_type == 'f' and cell.value:
-                        formula = str(cell.value)
-                        if any(err in formula for err in ['#REF!', '#NAME?', '#VALUE!', '#DIV/0!', '#N/A']):
-                            errors.append(f"Broken formula in {sheet_name}!{cell.coordinate}: {formula}")
-        return errors
-    
-    def _validate_data_ranges(self, workbook, data_validations):
-        """Validate that data falls within specified ranges"""
-        errors = []
-        for range_spec, validation_rule in data_validations.items():
-            try:
-                sheet_name, cell_range = range_spec.split('!')
-                if sheet_name not in workbook.sheetnames:
-                    continue
-                
-                sheet = workbook[sheet_name]
-                validation_type = validation_rule.get('type')
-                
-                if validation_type == 'range':
-                    min_val = validation_rule.get('min')
-                    max_val = validation_rule.get('max')
-                    
-                    if ':' in cell_range and len(cell_range) == 3:
-                        col = cell_range[0]
-                        cells = sheet[col]
-                    else:
-                        cells = sheet[cell_range]
-                    
-                    for cell in cells:
-                        if cell.value is not None and isinstance(cell.value, (int, float)):
-                            if min_val is not None and cell.value < min_val:
-                                errors.append(f"Value {cell.value} in {sheet_name}!{cell.coordinate} is below minimum {min_val}")
-                            if max_val is not None and cell.value > max_val:
-                                errors.append(f"Value {cell.value} in {sheet_name}!{cell.coordinate} is above maximum {max_val}")
-            except Exception as e:
-                errors.append(f"Error validating range {range_spec}: {str(e)}")
-        return errors
-    
-    def _check_circular_references(self, workbook):
-        """Basic check for circular references"""
-        errors = []
-        for sheet in workbook.worksheets:
-            for row in sheet.iter_rows():
-                for cell in row:
-                    if cell.data_type == 'f' and cell.value:
-                        formula = str(cell.value).upper()
-                        cell_ref = cell.coordinate
-                        if cell_ref in formula:
-                            errors.append(f"Possible circular reference in {sheet.title}!{cell_ref}")
-        return errors
\ No newline at end of file
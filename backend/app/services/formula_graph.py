@@ -0,0 +1,288 @@
+from openpyxl.utils.cell import column_index_from_string, get_column_letter
+import bisect
+import re
+
+
+STRING_LITERAL = re.compile(r'"(?:[^"]|"")*"')
+
+REFERENCE = re.compile(r"""
+    (?<![A-Za-z0-9_.$'"\]])
+    (?:(?P<sheet>'(?:[^']|'')+'|(?:\[[^\]]+\])?[A-Za-z_][A-Za-z0-9_.]*)!)?
+    (?:
+        \$?(?P<c1>[A-Za-z]{1,3})\$?(?P<r1>[0-9]+)
+        (?::\$?(?P<c2>[A-Za-z]{1,3})\$?(?P<r2>[0-9]+))?
+      | \$?(?P<cc1>[A-Za-z]{1,3}):\$?(?P<cc2>[A-Za-z]{1,3})
+      | \$?(?P<rr1>[0-9]+):\$?(?P<rr2>[0-9]+)
+    )
+    (?![A-Za-z0-9_(!])
+""", re.VERBOSE)
+
+MAX_ROW = 1048576
+MAX_COLUMN = 16384
+
+
+def _column(letters):
+    index = column_index_from_string(letters.upper())
+    if index > MAX_COLUMN:
+        raise ValueError(letters)
+    return index
+
+
+def parse_references(formula, sheet):
+    """
+    Extract the cell ranges a formula refers to
+
+    Args:
+        formula: Formula text, with or without the leading '='
+        sheet: Name of the sheet the formula lives on
+
+    Returns:
+        List of (sheet, min_row, max_row, min_col, max_col) intervals, where
+        None means the range is unbounded on that side (e.g. 'A:A').
+        References into other workbooks ('[1]Data!A1', '[Book.xlsx]Data!A1')
+        cannot be part of a cycle in this one and are left out.
+    """
+    refs = []
+    for match in REFERENCE.finditer(STRING_LITERAL.sub('""', formula)):
+        ref_sheet = match.group('sheet')
+        if ref_sheet is None:
+            ref_sheet = sheet
+        elif ref_sheet.startswith("'"):
+            ref_sheet = ref_sheet[1:-1].replace("''", "'")
+
+        # Sheet names cannot contain brackets; one names an external workbook
+        if ']' in ref_sheet:
+            continue
+
+        try:
+            if match.group('c1'):
+                min_col = max_col = _column(match.group('c1'))
+                min_row = max_row = int(match.group('r1'))
+                if match.group('c2'):
+                    min_col, max_col = sorted((min_col, _column(match.group('c2'))))
+                    min_row, max_row = sorted((min_row, int(match.group('r2'))))
+            elif match.group('cc1'):
+                min_col, max_col = sorted((_column(match.group('cc1')), _column(match.group('cc2'))))
+                min_row = max_row = None
+            else:
+                min_row, max_row = sorted((int(match.group('rr1')), int(match.group('rr2'))))
+                min_col = max_col = None
+        except ValueError:
+            # Something shaped like a reference that is out of the sheet's bounds
+            continue
+
+        if min_row is not None and not 0 < max_row <= MAX_ROW:
+            continue
+        refs.append((ref_sheet, min_row, max_row, min_col, max_col))
+    return refs
+
+
+class FormulaGraph:
+    """
+    Dependency graph between formula cells
+
+    Each formula is tokenized once and its precedents are kept as compact
+    range intervals rather than expanded cell lists. Cycle detection runs
+    Tarjan's SCC algorithm iteratively over the formula cells, reaching the
+    formula cells inside a referenced range through per-column segment
+    trees, so a range edge costs O(log n) instead of one edge per cell.
+    """
+
+    def __init__(self):
+        self._cells = []
+        self._refs = []
+        self._sheet_names = {}
+        self._sheet_order = {}
+        self._columns = None
+        self._sheet_columns = None
+
+    def __len__(self):
+        return len(self._cells)
+
+    def add_formula(self, sheet, row, col, formula):
+        """Parse a formula and add its cell to the graph"""
+        return self.add_references(sheet, row, col, parse_references(formula, sheet))
+
+    def add_references(self, sheet, row, col, refs):
+        """Add a formula cell whose references were already parsed"""
+        self._sheet_names.setdefault(sheet.lower(), sheet)
+        self._sheet_order.setdefault(sheet.lower(), len(self._sheet_order))
+        self._cells.append((sheet.lower(), row, col))
+        self._refs.append(tuple(
+            (ref_sheet.lower(), min_row, max_row, min_col, max_col)
+            for ref_sheet, min_row, max_row, min_col, max_col in refs
+        ))
+        self._columns = None
+        return len(self._cells) - 1
+
+    def cell(self, node):
+        """(sheet, row, col) of a formula node"""
+        sheet, row, col = self._cells[node]
+        return self._sheet_names[sheet], row, col
+
+    def coordinate(self, node):
+        """'Sheet!A1' label of a formula node"""
+        sheet, row, col = self.cell(node)
+        return f"{sheet}!{get_column_letter(col)}{row}"
+
+    def precedents(self, node):
+        """Ranges a formula node refers to, as (sheet, min_row, max_row, min_col, max_col)"""
+        return [
+            (self._sheet_names.get(sheet, sheet), min_row, max_row, min_col, max_col)
+            for sheet, min_row, max_row, min_col, max_col in self._refs[node]
+        ]
+
+    def formulas_in(self, sheet, min_row=None, max_row=None, min_col=None, max_col=None):
+        """Formula nodes inside a range"""
+        self._build_index()
+        nodes = []
+        for key in self._column_keys(sheet.lower(), min_col, max_col):
+            rows, column_nodes = self._columns[key]
+            lo, hi = self._row_span(rows, min_row, max_row)
+            nodes.extend(column_nodes[lo:hi])
+        return nodes
+
+    def find_cycles(self):
+        """
+        Find every set of formula cells that depend on each other
+
+        Returns:
+            List of cycles, each a list of formula nodes in sheet/row/column
+            order (sheets in the order they were added), sorted by their
+            first cell
+        """
+        self._build_index()
+
+        index = {}
+        lowlink = {}
+        on_stack = set()
+        stack = []
+        cycles = []
+        counter = 0
+
+        for root in range(len(self._cells)):
+            if root in index:
+                continue
+
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, self._successors(root))]
+
+            while work:
+                node, successors = work[-1]
+                advanced = False
+                for succ in successors:
+                    if succ not in index:
+                        index[succ] = lowlink[succ] = counter
+                        counter += 1
+                        stack.append(succ)
+                        on_stack.add(succ)
+                        work.append((succ, self._successors(succ)))
+                        advanced = True
+                        break
+                    if succ in on_stack:
+                        lowlink[node] = min(lowlink[node], index[succ])
+                if advanced:
+                    continue
+
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    cells = [m for m in component if isinstance(m, int)]
+                    if len(component) > 1 or (isinstance(node, int) and self._refers_to_itself(node)):
+                        cycles.append(sorted(cells, key=self._sort_key))
+
+        cycles.sort(key=lambda cycle: self._sort_key(cycle[0]))
+        return cycles
+
+    def _sort_key(self, node):
+        sheet, row, col = self._cells[node]
+        return self._sheet_order[sheet], row, col
+
+    def _refers_to_itself(self, node):
+        sheet, row, col = self._cells[node]
+        return any(
+            ref_sheet == sheet
+            and (min_row is None or min_row <= row <= max_row)
+            and (min_col is None or min_col <= col <= max_col)
+            for ref_sheet, min_row, max_row, min_col, max_col in self._refs[node]
+        )
+
+    def _build_index(self):
+        """Group formula rows by (sheet, column) for range lookups"""
+        if self._columns is not None:
+            return
+
+        grouped = {}
+        for node, (sheet, row, col) in enumerate(self._cells):
+            grouped.setdefault((sheet, col), []).append((row, node))
+
+        self._columns = {}
+        self._sheet_columns = {}
+        for (sheet, col), entries in grouped.items():
+            entries.sort()
+            self._columns[(sheet, col)] = ([row for row, _ in entries], [node for _, node in entries])
+            self._sheet_columns.setdefault(sheet, []).append(col)
+        for cols in self._sheet_columns.values():
+            cols.sort()
+
+    def _column_keys(self, sheet, min_col, max_col):
+        cols = self._sheet_columns.get(sheet, [])
+        lo = 0 if min_col is None else bisect.bisect_left(cols, min_col)
+        hi = len(cols) if max_col is None else bisect.bisect_right(cols, max_col)
+        return [(sheet, col) for col in cols[lo:hi]]
+
+    def _row_span(self, rows, min_row, max_row):
+        lo = 0 if min_row is None else bisect.bisect_left(rows, min_row)
+        hi = len(rows) if max_row is None else bisect.bisect_right(rows, max_row)
+        return lo, hi
+
+    def _successors(self, node):
+        """
+        Yield the graph successors of a node
+
+        Formula nodes are ints. Segment tree nodes are (column key, lo, hi)
+        tuples covering positions lo..hi-1 of that column's formula rows.
+        """
+        if isinstance(node, tuple):
+            key, lo, hi = node
+            mid = (lo + hi) // 2
+            yield from self._segment(key, lo, mid)
+            yield from self._segment(key, mid, hi)
+            return
+
+        for sheet, min_row, max_row, min_col, max_col in self._refs[node]:
+            for key in self._column_keys(sheet, min_col, max_col):
+                rows = self._columns[key][0]
+                lo, hi = self._row_span(rows, min_row, max_row)
+                if lo < hi:
+                    yield from self._cover(key, 0, len(rows), lo, hi)
+
+    def _segment(self, key, lo, hi):
+        if hi - lo == 1:
+            yield self._columns[key][1][lo]
+        elif hi > lo:
+            yield (key, lo, hi)
+
+    def _cover(self, key, node_lo, node_hi, lo, hi):
+        """Canonical segment tree nodes covering positions lo..hi-1"""
+        if lo <= node_lo and node_hi <= hi:
+            yield from self._segment(key, node_lo, node_hi)
+            return
+        mid = (node_lo + node_hi) // 2
+        if lo < mid:
+            yield from self._cover(key, node_lo, mid, lo, hi)
+        if mid < hi:
+            yield from self._cover(key, mid, node_hi, lo, hi)
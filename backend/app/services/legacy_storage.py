@@ -0,0 +1,107 @@
+from backend.app import db
+from backend.app.services.blob_store import blob_store, READ_SIZE
+from datetime import datetime
+import hashlib
+import os
+import shutil
+import tempfile
+
+
+def has_legacy_paths(connection):
+    """Check if the versions table still has the pre-blob file_path column"""
+    return 'file_path' in {column['name'] for column in db.inspect(connection).get_columns('versions')}
+
+
+def ingest_legacy_versions(connection):
+    """
+    Move the content of versions stored by path into the blob store
+
+    Versions written before content-addressed storage kept their workbook
+    at versions.file_path. Each such file is hashed and copied to its
+    whole-file blob location, a blobs row is found or created for the hash,
+    and the version is pointed at it with its reference counted. Works on a
+    plain connection, since the Version model no longer maps file_path; the
+    caller commits. Original files are left where they are.
+
+    Returns:
+        Tuple of (number of versions ingested, list of (version_id, path)
+        for versions whose file is missing)
+    """
+    if not has_legacy_paths(connection):
+        return 0, []
+
+    metadata = db.MetaData()
+    versions = db.Table('versions', metadata, autoload_with=connection)
+    blobs = db.Table('blobs', metadata, autoload_with=connection)
+
+    rows = connection.execute(
+        db.select(versions.c.id, versions.c.file_path)
+        .where(versions.c.blob_id.is_(None), versions.c.file_path.isnot(None))
+        .order_by(versions.c.id)
+    ).all()
+
+    ingested = 0
+    missing = []
+    for version_id, path in rows:
+        if not os.path.isfile(path):
+            missing.append((version_id, path))
+            continue
+
+        sha256, size = _hash_file(path)
+        blob_id = connection.scalar(db.select(blobs.c.id).where(blobs.c.sha256 == sha256))
+        if blob_id is None:
+            storage_path = _copy_to_blob(path, sha256)
+            blob_id = connection.execute(
+                blobs.insert().values(
+                    sha256=sha256,
+                    size=size,
+                    storage_path=storage_path,
+                    ref_count=0,
+                    created_at=datetime.utcnow()
+                )
+            ).inserted_primary_key[0]
+
+        connection.execute(versions.update().where(versions.c.id == version_id).values(blob_id=blob_id))
+        connection.execute(
+            blobs.update().where(blobs.c.id == blob_id).values(ref_count=blobs.c.ref_count + 1)
+        )
+        ingested += 1
+
+    return ingested, missing
+
+
+def drop_legacy_paths(op):
+    """
+    Drop versions.file_path once every version has a blob
+
+    Args:
+        op: Alembic operations object bound to the connection
+    """
+    with op.batch_alter_table('versions') as batch_op:
+        batch_op.drop_column('file_path')
+        batch_op.alter_column('blob_id', existing_type=db.Integer(), nullable=False)
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as fh:
+        while True:
+            chunk = fh.read(READ_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            digest.update(chunk)
+    return digest.hexdigest(), size
+
+
+def _copy_to_blob(path, sha256):
+    """Copy a legacy file to its whole-file blob location, if not already there"""
+    target = blob_store.blob_path(sha256)
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix='blob-', suffix='.part', dir=os.path.dirname(target))
+        os.close(fd)
+        shutil.copyfile(path, temp_path)
+        os.replace(temp_path, target)
+    return target
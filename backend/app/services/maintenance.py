@@ -0,0 +1,85 @@
+from backend.app import db
+import os
+import threading
+import time
+
+
+class Maintenance:
+    """
+    Periodic housekeeping run on a background thread in every process
+
+    Services register their tasks with the config key of the task's
+    interval in seconds. The thread is started by the first request a
+    process serves, so each forked gunicorn worker runs one and CLI
+    commands never do, and it runs every task that is due inside an app
+    context. Tasks must be safe to run from several processes at once.
+    MAINTENANCE_ENABLED turns the thread off, for tests or when cron runs
+    the matching CLI commands instead.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._tasks = {}
+        self._last_run = {}
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['maintenance'] = self
+        if app.config['MAINTENANCE_ENABLED']:
+            app.before_request(self._ensure_worker)
+
+    def register(self, name, interval_key, task):
+        """Run task every app.config[interval_key] seconds; registering a name again replaces it"""
+        self._tasks[name] = (interval_key, task)
+
+    def run_due(self):
+        """
+        Run every task whose interval has passed since it last ran
+
+        Returns:
+            Names of the tasks run
+        """
+        now = time.monotonic()
+        ran = []
+        for name, (interval_key, task) in list(self._tasks.items()):
+            last_run = self._last_run.get(name)
+            if last_run is not None and now - last_run < self.app.config[interval_key]:
+                continue
+            self._last_run[name] = now
+            try:
+                task()
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception('Maintenance task %s failed', name)
+            ran.append(name)
+        return ran
+
+    def _ensure_worker(self):
+        # Started again after a fork so that each gunicorn worker has its own
+        pid = os.getpid()
+        if self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._last_run = {}
+            self._thread = threading.Thread(target=self._run, name='maintenance', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    self.run_due()
+                finally:
+                    db.session.remove()
+            time.sleep(self.app.config['MAINTENANCE_TICK'])
+
+
+maintenance = Maintenance()
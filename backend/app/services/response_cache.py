@@ -0,0 +1,220 @@
+from flask import current_app, request
+from flask_login import current_user
+from backend.app import db
+from backend.app.models.cache_tag import CacheTag
+from backend.app.models.response_cache_entry import ResponseCacheEntry
+from sqlalchemy.exc import IntegrityError
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import functools
+import hashlib
+import json
+import threading
+import time
+
+
+# Seconds between purges of expired shared entries, per process
+SHARED_PURGE_INTERVAL = 60
+
+
+def file_tags(file_obj):
+    """Tags of everything a change to a file shows up in"""
+    return (f'file:{file_obj.id}', f'project:{file_obj.project_id}')
+
+
+class ResponseCache:
+    """
+    Read-through cache of JSON GET responses
+
+    Responses are tagged with the data they are built from ('projects',
+    'project:<id>', 'file:<id>'). Every tag has a generation counter in the
+    database that writes bump inside their own transaction, and a cached
+    response is keyed by its request path plus the generations of its tags,
+    so a committed write makes older entries unreachable in every worker
+    at once. Entries live in an in-process LRU and, with
+    RESPONSE_CACHE_SHARED, in a table shared by all workers. Responses
+    carry an ETag of their body, so browsers revalidate with If-None-Match.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_purge = 0
+        self._stats = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'not_modified': 0, 'invalidations': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['response_cache'] = self
+
+    @property
+    def enabled(self):
+        return self.app.config['RESPONSE_CACHE_ENABLED']
+
+    def cached(self, *tags, per_user=False):
+        """
+        Cache a JSON GET view
+
+        Args:
+            tags: Tag templates, formatted with the view arguments
+            per_user: Keep separate entries per user, for views whose
+                body depends on the current user
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(**kwargs):
+                if not self.enabled:
+                    return view(**kwargs)
+
+                # Generations are read before the data, so an entry is never
+                # older than the generations it is stored under
+                resolved = [tag.format(**kwargs) for tag in tags]
+                key_parts = [request.full_path, self._generations(resolved)]
+                if per_user:
+                    key_parts.append(current_user.id)
+                key = hashlib.sha256(json.dumps(key_parts).encode('utf-8')).hexdigest()
+
+                entry = self._get(key)
+                if entry is None:
+                    response = current_app.make_response(view(**kwargs))
+                    if response.status_code != 200:
+                        return response
+                    entry = self._put(key, response.get_data())
+
+                return self._respond(*entry)
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        """
+        Bump the generations of tags; the caller commits
+
+        Readers in other workers move on to the new generation as soon as
+        the caller's transaction commits.
+        """
+        if not self.enabled:
+            return
+
+        # Sorted so that concurrent writers lock tag rows in the same order
+        tags = sorted(set(tags))
+        for tag in tags:
+            updated = db.session.execute(
+                db.update(CacheTag).where(CacheTag.tag == tag).values(generation=CacheTag.generation + 1)
+            ).rowcount
+            if updated:
+                continue
+            try:
+                with db.session.begin_nested():
+                    db.session.add(CacheTag(tag=tag, generation=1))
+            except IntegrityError:
+                # Created concurrently by another writer
+                db.session.execute(
+                    db.update(CacheTag).where(CacheTag.tag == tag).values(generation=CacheTag.generation + 1)
+                )
+        self._count('invalidations', len(tags))
+
+    def clear(self):
+        """Drop this process's entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters for this process"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['hits'] + stats['shared_hits']) / lookups if lookups else None
+        stats['shared'] = self.app.config['RESPONSE_CACHE_SHARED']
+        return stats
+
+    def _generations(self, tags):
+        if not tags:
+            return []
+        current = dict(db.session.query(CacheTag.tag, CacheTag.generation).filter(CacheTag.tag.in_(tags)))
+        return [current.get(tag, 0) for tag in tags]
+
+    def _get(self, key):
+        """Look up (etag, body) in the local tier, then the shared tier"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                etag, body, expires = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return etag, body
+                del self._entries[key]
+
+        if self.app.config['RESPONSE_CACHE_SHARED']:
+            row = (
+                db.session.query(ResponseCacheEntry.etag, ResponseCacheEntry.body, ResponseCacheEntry.expires_at)
+                .filter(ResponseCacheEntry.key == key, ResponseCacheEntry.expires_at > datetime.utcnow())
+                .first()
+            )
+            if row is not None:
+                etag, body, expires_at = row
+                self._store_local(key, etag, body, (expires_at - datetime.utcnow()).total_seconds())
+                self._count('shared_hits')
+                return etag, body
+
+        self._count('misses')
+        return None
+
+    def _put(self, key, body):
+        etag = hashlib.sha256(body).hexdigest()
+        ttl = self.app.config['RESPONSE_CACHE_TTL']
+        self._store_local(key, etag, body, ttl)
+
+        if self.app.config['RESPONSE_CACHE_SHARED']:
+            now = datetime.utcnow()
+            try:
+                # Own transaction: GET handlers do not commit the request session
+                with db.engine.begin() as connection:
+                    connection.execute(db.insert(ResponseCacheEntry).values(
+                        key=key,
+                        etag=etag,
+                        body=body,
+                        created_at=now,
+                        expires_at=now + timedelta(seconds=ttl)
+                    ))
+                    self._maybe_purge(connection, now)
+            except IntegrityError:
+                # Stored concurrently by another worker
+                pass
+
+        return etag, body
+
+    def _store_local(self, key, etag, body, ttl):
+        with self._lock:
+            self._entries[key] = (etag, body, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.app.config['RESPONSE_CACHE_SIZE']:
+                self._entries.popitem(last=False)
+
+    def _maybe_purge(self, connection, now):
+        with self._lock:
+            if time.monotonic() - self._last_purge < SHARED_PURGE_INTERVAL:
+                return
+            self._last_purge = time.monotonic()
+        connection.execute(db.delete(ResponseCacheEntry).where(ResponseCacheEntry.expires_at <= now))
+
+    def _respond(self, etag, body):
+        response = current_app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            self._count('not_modified')
+        return response
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+
+response_cache = ResponseCache()
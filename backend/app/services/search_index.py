@@ -0,0 +1,183 @@
+from backend.app import db
+from backend.app.models.file import File
+from backend.app.models.version import Version
+from backend.app.models.search_term import SearchTerm
+from backend.app.services.cell_snapshot import snapshot_store, STRING
+from collections import Counter, defaultdict
+import math
+import numpy as np
+import re
+
+
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+MAX_TERM_LENGTH = 64
+
+# Query terms beyond this are ignored
+MAX_QUERY_TERMS = 8
+
+FIELD_WEIGHTS = {
+    'filename': 8.0,
+    'sheet': 4.0,
+    'header': 3.0,
+    'commit_message': 2.0,
+    'cell': 1.0
+}
+
+
+def tokenize(text):
+    """Split text into lowercase word terms; underscores and punctuation separate words"""
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_PATTERN.findall(str(text).lower())]
+
+
+class SearchIndex:
+    """
+    Inverted index over files for ranked full-text search
+
+    Each file is indexed as one document made of its filename, the commit
+    messages of all its versions, and the sheet names and header rows of
+    its current version (read from the cell snapshot). With
+    SEARCH_INDEX_CELLS enabled, string cell contents of the current version
+    are indexed as well. A file's postings are replaced whenever its
+    current version or version list changes.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['search_index'] = self
+
+    def index_file(self, file_obj):
+        """Replace a file's postings; the caller commits"""
+        db.session.execute(db.delete(SearchTerm).where(SearchTerm.file_id == file_obj.id))
+
+        postings = []
+        for field, counts in self._field_terms(file_obj).items():
+            for term, count in counts.items():
+                postings.append({
+                    'term': term,
+                    'file_id': file_obj.id,
+                    'project_id': file_obj.project_id,
+                    'field': field,
+                    'weight': FIELD_WEIGHTS[field] * (1 + math.log(count))
+                })
+        if postings:
+            db.session.execute(db.insert(SearchTerm), postings)
+        return len(postings)
+
+    def rebuild(self, batch_size=200):
+        """
+        Rebuild the whole index from scratch
+
+        Returns:
+            Number of files indexed
+        """
+        db.session.execute(db.delete(SearchTerm))
+        db.session.commit()
+
+        count = 0
+        last_id = 0
+        while True:
+            files = File.query.filter(File.id > last_id).order_by(File.id).limit(batch_size).all()
+            if not files:
+                break
+            for file_obj in files:
+                self.index_file(file_obj)
+            db.session.commit()
+            count += len(files)
+            last_id = files[-1].id
+        return count
+
+    def search(self, query, project_id=None, limit=20, offset=0):
+        """
+        Find files matching every term of a query, best match first
+
+        The last query term also matches as a prefix, so results update as
+        a query is typed.
+
+        Returns:
+            (results, has_more) where results is a list of
+            (file_id, score, matched fields) tuples
+        """
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        if not terms:
+            return [], False
+
+        conditions = [SearchTerm.term == term for term in terms[:-1]]
+        last = terms[-1].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        conditions.append(SearchTerm.term.like(f'{last}%', escape='\\'))
+
+        # One aggregate per term, joined so only files matching all of them remain
+        matches = []
+        for condition in conditions:
+            q = db.session.query(
+                SearchTerm.file_id.label('file_id'),
+                db.func.sum(SearchTerm.weight).label('score')
+            ).filter(condition)
+            if project_id is not None:
+                q = q.filter(SearchTerm.project_id == project_id)
+            matches.append(q.group_by(SearchTerm.file_id).subquery())
+
+        first = matches[0]
+        score = first.c.score
+        for match in matches[1:]:
+            score = score + match.c.score
+        q = db.session.query(first.c.file_id, score.label('score'))
+        for match in matches[1:]:
+            q = q.join(match, match.c.file_id == first.c.file_id)
+
+        rows = q.order_by(score.desc(), first.c.file_id.desc()).offset(offset).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        fields = defaultdict(set)
+        if rows:
+            for file_id, field in (
+                db.session.query(SearchTerm.file_id, SearchTerm.field)
+                .filter(SearchTerm.file_id.in_([file_id for file_id, _ in rows]), db.or_(*conditions))
+                .distinct()
+            ):
+                fields[file_id].add(field)
+
+        return [(file_id, score, sorted(fields[file_id])) for file_id, score in rows], has_more
+
+    def _field_terms(self, file_obj):
+        """Count the terms of each indexed field of a file"""
+        fields = {
+            'filename': Counter(tokenize(file_obj.filename)),
+            'commit_message': Counter()
+        }
+        for (message,) in db.session.query(Version.commit_message).filter_by(file_id=file_obj.id):
+            fields['commit_message'].update(tokenize(message))
+
+        version = file_obj.current_version
+        snapshot = None
+        if version is not None:
+            try:
+                snapshot = snapshot_store.ensure(version.blob)
+            except Exception as e:
+                self.app.logger.warning('Could not read file %s for indexing: %s', file_obj.id, e)
+        if snapshot is None:
+            return fields
+
+        fields['sheet'] = Counter()
+        fields['header'] = Counter()
+        for sheet in snapshot.worksheets:
+            fields['sheet'].update(tokenize(sheet.name))
+            for header in sheet.headers() or ():
+                fields['header'].update(tokenize(header))
+
+        if self.app.config['SEARCH_INDEX_CELLS']:
+            cells = Counter()
+            for sheet in snapshot.worksheets:
+                for i in np.flatnonzero(sheet.types == STRING).tolist():
+                    cells.update(tokenize(sheet.text(int(sheet.strings[i]))))
+            fields['cell'] = Counter(dict(cells.most_common(self.app.config['SEARCH_MAX_CELL_TERMS'])))
+
+        return fields
+
+
+search_index = SearchIndex()
@@ -0,0 +1,214 @@
+from backend.app import db
+from backend.app.models.upload_session import UploadSession
+from backend.app.services.blob_store import READ_SIZE, BlobTooLargeError, SpooledUpload
+from backend.app.services.maintenance import maintenance
+from datetime import datetime, timedelta
+import hashlib
+import os
+import secrets
+import threading
+import time
+
+
+# Stray spool files left by interrupted requests or processes
+TEMP_PREFIXES = ('blob-', 'upload-')
+
+
+class UploadOffsetError(Exception):
+    """Raised when a chunk does not start where the upload left off"""
+
+    def __init__(self, expected):
+        super().__init__(f"Upload is at offset {expected}")
+        self.expected = expected
+
+
+class UploadIncompleteError(Exception):
+    """Raised when completing an upload that is missing data or fails its checksum"""
+
+
+class UploadSessions:
+    """
+    Resumable chunked uploads into UPLOAD_PATH
+
+    Chunks are appended at the offset the client says it is sending, which
+    must match what has been received so far, so a client that lost its
+    connection asks for the offset and carries on from there. The SHA-256
+    is updated as chunks arrive; when consecutive chunks land on different
+    worker processes the file is hashed once more on completion instead.
+    Abandoned uploads are removed by sweep_expired(), which runs as a
+    maintenance task every UPLOAD_SWEEP_INTERVAL seconds.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._hashers = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['upload_sessions'] = self
+        maintenance.register('upload-sweep', 'UPLOAD_SWEEP_INTERVAL', self.sweep_expired)
+
+    def create(self, user_id, project_id, filename, commit_message, file_id=None, expected_size=None):
+        """Open an upload session; the caller commits it"""
+        token = secrets.token_hex(16)
+        temp_path = os.path.join(self.app.config['UPLOAD_PATH'], f'upload-{token}.part')
+        open(temp_path, 'wb').close()
+
+        session = UploadSession(
+            token=token,
+            user_id=user_id,
+            project_id=project_id,
+            file_id=file_id,
+            filename=filename,
+            commit_message=commit_message,
+            temp_path=temp_path,
+            expected_size=expected_size,
+            received=0
+        )
+        db.session.add(session)
+        with self._lock:
+            self._hashers[token] = (0, hashlib.sha256())
+        return session
+
+    def get(self, token, user_id):
+        """Look up one of a user's upload sessions"""
+        return UploadSession.query.filter_by(token=token, user_id=user_id).first()
+
+    def write_chunk(self, session, offset, stream):
+        """
+        Append a chunk to an upload
+
+        Whatever arrived before a dropped connection is kept, so the client
+        can resume from the returned offset. The caller commits.
+
+        Raises:
+            UploadOffsetError: If offset is not the current upload offset
+            BlobTooLargeError: If the chunk goes past the size limit
+        """
+        # Serialize concurrent writes to the same upload
+        db.session.refresh(session, with_for_update=True)
+        if offset != session.received:
+            raise UploadOffsetError(session.received)
+
+        max_size = self.app.config['MAX_FILE_SIZE']
+        if session.expected_size is not None:
+            max_size = min(max_size, session.expected_size)
+
+        hasher = self._take_hasher(session.token, offset)
+        if hasher is None and offset == 0:
+            hasher = hashlib.sha256()
+        written = 0
+        too_large = False
+
+        try:
+            with open(session.temp_path, 'r+b') as out:
+                out.seek(offset)
+                out.truncate()
+                while True:
+                    chunk = stream.read(READ_SIZE)
+                    if not chunk:
+                        break
+                    if offset + written + len(chunk) > max_size:
+                        too_large = True
+                        out.truncate(offset)
+                        raise BlobTooLargeError(f"File exceeds maximum size of {max_size} bytes")
+                    out.write(chunk)
+                    if hasher is not None:
+                        hasher.update(chunk)
+                    written += len(chunk)
+        finally:
+            if too_large:
+                written = 0
+                hasher = None
+            session.received = offset + written
+            session.updated_at = datetime.utcnow()
+            if hasher is not None:
+                with self._lock:
+                    self._hashers[session.token] = (session.received, hasher)
+
+        return session.received
+
+    def complete(self, session, sha256=None):
+        """
+        Finish an upload and hand its content over for storage
+
+        The session row is deleted; the caller commits that together with
+        the version created from the returned upload.
+
+        Args:
+            session: UploadSession to complete
+            sha256: Optional checksum the client expects
+
+        Raises:
+            UploadIncompleteError: If data is missing or the checksum differs
+        """
+        if session.expected_size is not None and session.received != session.expected_size:
+            raise UploadIncompleteError(
+                f"Upload has {session.received} of {session.expected_size} bytes")
+
+        hasher = self._take_hasher(session.token, session.received)
+        if hasher is None:
+            hasher = hashlib.sha256()
+            with open(session.temp_path, 'rb') as fh:
+                for chunk in iter(lambda: fh.read(READ_SIZE), b''):
+                    hasher.update(chunk)
+        digest = hasher.hexdigest()
+
+        if sha256 and sha256.lower() != digest:
+            raise UploadIncompleteError("Checksum does not match the uploaded data")
+
+        db.session.delete(session)
+        return SpooledUpload(session.temp_path, digest, session.received)
+
+    def abort(self, session):
+        """Drop an upload and its partial data; the caller commits"""
+        self._take_hasher(session.token, None)
+        if os.path.exists(session.temp_path):
+            os.remove(session.temp_path)
+        db.session.delete(session)
+
+    def sweep_expired(self):
+        """
+        Delete upload sessions idle for longer than UPLOAD_SESSION_TTL
+
+        Stray spool files in UPLOAD_PATH older than the TTL, left behind by
+        interrupted requests, are removed as well.
+
+        Returns:
+            Number of sessions removed
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.app.config['UPLOAD_SESSION_TTL'])
+
+        expired = UploadSession.query.filter(UploadSession.updated_at < cutoff).all()
+        for session in expired:
+            self.abort(session)
+        db.session.commit()
+
+        live = {path for (path,) in db.session.query(UploadSession.temp_path)}
+        upload_path = self.app.config['UPLOAD_PATH']
+        cutoff_mtime = time.time() - self.app.config['UPLOAD_SESSION_TTL']
+        for name in os.listdir(upload_path):
+            path = os.path.join(upload_path, name)
+            if not name.startswith(TEMP_PREFIXES) or not name.endswith('.part') or path in live:
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff_mtime:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+        return len(expired)
+
+    def _take_hasher(self, token, offset):
+        """Remove and return the in-process hasher for an upload if it is at offset"""
+        with self._lock:
+            entry = self._hashers.pop(token, None)
+        if entry is None or entry[0] != offset:
+            return None
+        return entry[1]
+
+
+upload_sessions = UploadSessions()
@@ -0,0 +1,161 @@
+from backend.app import db
+from backend.app.models.validation_cache import ValidationCacheEntry
+from backend.app.services import cell_snapshot, excel_validator, formula_graph, validation_plan
+from backend.app.services.maintenance import maintenance
+from backend.app.services.validation_plan import ValidationPlan, rules_hash
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+import hashlib
+import inspect
+import threading
+
+
+# Modules whose source determines validation results. Any edit to them
+# changes the validator version and so invalidates every cached result.
+VALIDATOR_MODULES = [cell_snapshot, excel_validator, formula_graph, validation_plan]
+
+
+def compute_validator_version():
+    """Hash the source of the validator modules"""
+    digest = hashlib.sha256()
+    for module in VALIDATOR_MODULES:
+        with open(inspect.getsourcefile(module), 'rb') as fh:
+            digest.update(fh.read())
+    return digest.hexdigest()
+
+
+def _rules_key(rules):
+    """Cache key for a rules dict or compiled plan"""
+    if isinstance(rules, ValidationPlan):
+        return rules.rules_hash
+    return rules_hash(rules)
+
+
+class ValidationCache:
+    """
+    Persistent cache of validation results keyed by content and rules
+
+    Entries are evicted by evict(), which runs as a maintenance task every
+    VALIDATION_CACHE_EVICT_INTERVAL seconds rather than on each store.
+    Entries of another validator version are never looked up but are left
+    to expire with the TTL, so that old and new workers running side by
+    side during a deploy do not delete each other's results.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._validator_version = None
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['validation_cache'] = self
+        maintenance.register('validation-cache-evict', 'VALIDATION_CACHE_EVICT_INTERVAL', self.evict)
+
+    @property
+    def enabled(self):
+        return self.app.config['VALIDATION_CACHE_ENABLED']
+
+    @property
+    def validator_version(self):
+        if self._validator_version is None:
+            self._validator_version = compute_validator_version()
+        return self._validator_version
+
+    def get(self, content_hash, rules):
+        """
+        Look up a cached validation result
+
+        Returns:
+            Dictionary with 'passed' and 'errors', or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        entry = ValidationCacheEntry.query.filter_by(
+            content_hash=content_hash,
+            rules_hash=_rules_key(rules),
+            validator_version=self.validator_version
+        ).first()
+
+        ttl = timedelta(seconds=self.app.config['VALIDATION_CACHE_TTL'])
+        if entry is None or entry.created_at < datetime.utcnow() - ttl:
+            self._count('misses')
+            return None
+
+        db.session.execute(
+            db.update(ValidationCacheEntry)
+            .where(ValidationCacheEntry.id == entry.id)
+            .values(last_used_at=datetime.utcnow(), hit_count=ValidationCacheEntry.hit_count + 1)
+        )
+        self._count('hits')
+        return entry.to_result()
+
+    def put(self, content_hash, rules, result):
+        """Store a validation result; the caller commits"""
+        if not self.enabled:
+            return
+
+        try:
+            with db.session.begin_nested():
+                db.session.add(ValidationCacheEntry(
+                    content_hash=content_hash,
+                    rules_hash=_rules_key(rules),
+                    validator_version=self.validator_version,
+                    passed=result['passed'],
+                    errors=result['errors']
+                ))
+            self._count('stores')
+        except IntegrityError:
+            # Already cached by a concurrent validation of the same content
+            pass
+
+    def evict(self):
+        """
+        Drop expired entries and the least recently used overflow, and commit
+
+        Returns:
+            Number of entries dropped
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.app.config['VALIDATION_CACHE_TTL'])
+        evicted = db.session.execute(
+            db.delete(ValidationCacheEntry).where(ValidationCacheEntry.created_at < cutoff)
+        ).rowcount
+
+        max_entries = self.app.config['VALIDATION_CACHE_MAX_ENTRIES']
+        overflow = ValidationCacheEntry.query.count() - max_entries
+        if overflow > 0:
+            oldest = (
+                db.session.query(ValidationCacheEntry.id)
+                .order_by(ValidationCacheEntry.last_used_at.asc())
+                .limit(overflow)
+                .subquery()
+            )
+            evicted += db.session.execute(
+                db.delete(ValidationCacheEntry).where(ValidationCacheEntry.id.in_(db.select(oldest.c.id)))
+            ).rowcount
+
+        db.session.commit()
+        if evicted:
+            self._count('evictions', evicted)
+        return evicted
+
+    def stats(self):
+        """Hit/miss counters for this process plus the persistent entry count"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else None
+        stats['entries'] = ValidationCacheEntry.query.count()
+        stats['validator_version'] = self.validator_version
+        return stats
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+
+validation_cache = ValidationCache()
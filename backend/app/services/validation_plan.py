@@ -0,0 +1,217 @@
+from flask import current_app
+from openpyxl.utils.cell import range_boundaries
+from dataclasses import dataclass
+import hashlib
+import json
+import re
+import threading
+
+
+FORMULA_ERROR_TOKENS = ('#REF!', '#NAME?', '#VALUE!', '#DIV/0!', '#N/A')
+
+RULE_KEYS = {'required_sheets', 'required_columns', 'formula_sheets', 'data_validations'}
+VALIDATION_TYPES = {'range'}
+
+
+class RuleError(ValueError):
+    """Raised when a project's validation rules are malformed"""
+
+
+def rules_hash(rules):
+    """Hash a rules dict in canonical form"""
+    canonical = json.dumps(rules or {}, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+@dataclass(frozen=True)
+class RangeRule:
+    """A numeric range check over a resolved block of cells"""
+    spec: str
+    sheet: str
+    min_col: int
+    min_row: int
+    max_col: int
+    max_row: int
+    min: float = None
+    max: float = None
+
+    def covers_row(self, row):
+        return (self.min_row is None or self.min_row <= row) and (self.max_row is None or row <= self.max_row)
+
+    def covers_column(self, col):
+        return (self.min_col is None or self.min_col <= col) and (self.max_col is None or col <= self.max_col)
+
+
+@dataclass(frozen=True)
+class ValidationPlan:
+    """Immutable, pre-resolved form of a project's validation rules"""
+    rules_hash: str
+    required_sheets: tuple = ()
+    required_columns: tuple = ()  # ((sheet, (column, ...)), ...)
+    formula_sheets: tuple = ()
+    range_rules: tuple = ()
+    skipped: tuple = ()  # errors of entries left out by a lenient compile
+    error_pattern: re.Pattern = re.compile('|'.join(re.escape(t) for t in FORMULA_ERROR_TOKENS))
+
+    def checks_formulas(self, sheet_name):
+        return sheet_name in self.formula_sheets
+
+    def ranges_for(self, sheet_name):
+        return tuple(r for r in self.range_rules if r.sheet == sheet_name)
+
+
+def _string_list(value, key):
+    if not isinstance(value, list) or not all(isinstance(v, str) and v for v in value):
+        raise RuleError(f"'{key}' must be a list of non-empty strings")
+    return tuple(value)
+
+
+def _number(value, key):
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise RuleError(f"'{key}' must be a number")
+    return value
+
+
+def _compile_range(range_spec, validation_rule):
+    if not isinstance(validation_rule, dict):
+        raise RuleError(f"Validation for '{range_spec}' must be an object")
+
+    validation_type = validation_rule.get('type')
+    if validation_type not in VALIDATION_TYPES:
+        raise RuleError(f"Unsupported validation type '{validation_type}' for '{range_spec}'")
+
+    if '!' not in range_spec:
+        raise RuleError(f"Range '{range_spec}' must be of the form 'Sheet!A1:B9'")
+    sheet_name, cell_range = range_spec.rsplit('!', 1)
+    sheet_name = sheet_name.strip("'")
+    if not sheet_name:
+        raise RuleError(f"Range '{range_spec}' is missing a sheet name")
+
+    try:
+        min_col, min_row, max_col, max_row = range_boundaries(cell_range.upper())
+    except ValueError:
+        raise RuleError(f"Invalid cell range '{cell_range}' in '{range_spec}'")
+
+    min_val = _number(validation_rule.get('min'), f'{range_spec}.min')
+    max_val = _number(validation_rule.get('max'), f'{range_spec}.max')
+    if min_val is not None and max_val is not None and min_val > max_val:
+        raise RuleError(f"Minimum is greater than maximum for '{range_spec}'")
+
+    return RangeRule(
+        spec=range_spec,
+        sheet=sheet_name,
+        min_col=min_col,
+        min_row=min_row,
+        max_col=max_col,
+        max_row=max_row,
+        min=min_val,
+        max=max_val
+    )
+
+
+def compile_rules(rules, strict=True):
+    """
+    Compile a validation rules dict into a ValidationPlan
+
+    Args:
+        rules: Validation rules dict
+        strict: Raise on the first malformed entry. Rules are checked
+            strictly when a project is saved; rules stored before that check
+            existed are compiled with strict=False, which leaves out the
+            entries it cannot use and lists their errors in plan.skipped.
+
+    Raises:
+        RuleError: If strict and the rules are malformed
+    """
+    skipped = []
+
+    def skip(error):
+        if strict:
+            raise error
+        skipped.append(str(error))
+
+    def compile_entry(compile_part, *args):
+        try:
+            return compile_part(*args)
+        except RuleError as e:
+            skip(e)
+            return None
+
+    rules = rules or {}
+    if not isinstance(rules, dict):
+        skip(RuleError("Validation rules must be an object"))
+        rules = {}
+
+    unknown = set(rules) - RULE_KEYS
+    if unknown:
+        skip(RuleError(f"Unknown validation rule(s): {', '.join(sorted(unknown))}"))
+
+    required_sheets = compile_entry(_string_list, rules.get('required_sheets', []), 'required_sheets') or ()
+    formula_sheets = compile_entry(_string_list, rules.get('formula_sheets', []), 'formula_sheets') or ()
+
+    required_columns = rules.get('required_columns', {})
+    if not isinstance(required_columns, dict):
+        skip(RuleError("'required_columns' must map sheet names to column lists"))
+        required_columns = {}
+    compiled_columns = []
+    for sheet_name, columns in required_columns.items():
+        columns = compile_entry(_string_list, columns, f'required_columns.{sheet_name}')
+        if columns is not None:
+            compiled_columns.append((sheet_name, columns))
+
+    data_validations = rules.get('data_validations', {})
+    if not isinstance(data_validations, dict):
+        skip(RuleError("'data_validations' must map ranges to validations"))
+        data_validations = {}
+    range_rules = []
+    for range_spec, validation_rule in data_validations.items():
+        range_rule = compile_entry(_compile_range, range_spec, validation_rule)
+        if range_rule is not None:
+            range_rules.append(range_rule)
+
+    return ValidationPlan(
+        rules_hash=rules_hash(rules),
+        required_sheets=required_sheets,
+        required_columns=tuple(compiled_columns),
+        formula_sheets=formula_sheets,
+        range_rules=tuple(range_rules),
+        skipped=tuple(skipped)
+    )
+
+
+_plans = {}
+_plans_lock = threading.Lock()
+
+
+def get_project_plan(project):
+    """
+    Return the compiled plan for a project, compiling it on first use
+
+    Cached plans are also checked against the hash of the current rules,
+    so a plan compiled before an update made by another worker process is
+    never used. Rules are compiled leniently: entries saved before rules
+    were checked on save are skipped with a warning rather than failing
+    every upload.
+    """
+    current_hash = rules_hash(project.validation_rules)
+    with _plans_lock:
+        plan = _plans.get(project.id)
+    if plan is not None and plan.rules_hash == current_hash:
+        return plan
+
+    plan = compile_rules(project.validation_rules, strict=False)
+    if plan.skipped:
+        current_app.logger.warning(
+            'Skipping unusable validation rules of project %s: %s', project.id, '; '.join(plan.skipped)
+        )
+    with _plans_lock:
+        _plans[project.id] = plan
+    return plan
+
+
+def invalidate_project_plan(project_id):
+    """Drop a project's cached plan after its rules change"""
+    with _plans_lock:
+        _plans.pop(project_id, None)
@@ -0,0 +1,279 @@
+from flask import current_app
+from backend.app import db
+from backend.app.models.file import File
+from backend.app.models.version import Version
+from backend.app.services.audit_sink import audit_sink
+from backend.app.services.blob_store import blob_store
+from backend.app.services.event_hub import event_hub
+from backend.app.services.cell_snapshot import snapshot_store
+from backend.app.services.excel_validator import ExcelValidator
+from backend.app.services.response_cache import response_cache, file_tags
+from backend.app.services.search_index import search_index
+from backend.app.services.validation_cache import validation_cache
+from backend.app.services.validation_plan import get_project_plan
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import os
+import threading
+import time
+
+
+def apply_validation_result(version, result):
+    """
+    Record a validation result and promote the version if it passed
+
+    Promotion is one conditional UPDATE of the file, so concurrent jobs and
+    uploads cannot undo each other: the version only replaces a current
+    version with a lower number, and the file is only checked in if it is
+    still checked out by the version's uploader.
+
+    Returns:
+        True if the version became the file's current version
+    """
+    version.validation_status = 'passed' if result['passed'] else 'failed'
+    version.validation_errors = result['errors']
+    version.validated_at = datetime.utcnow()
+
+    if not result['passed']:
+        return False
+
+    current_number = (
+        db.select(Version.version_number)
+        .where(Version.id == File.current_version_id)
+        .scalar_subquery()
+    )
+    held_by_uploader = File.checked_out_by == version.uploaded_by
+
+    promoted = db.session.execute(
+        db.update(File)
+        .where(
+            File.id == version.file_id,
+            db.or_(File.current_version_id.is_(None), current_number < version.version_number)
+        )
+        .values(
+            current_version_id=version.id,
+            checked_out_by=db.case((held_by_uploader, db.null()), else_=File.checked_out_by),
+            checked_out_at=db.case((held_by_uploader, db.null()), else_=File.checked_out_at),
+            lease_expires_at=db.case((held_by_uploader, db.null()), else_=File.lease_expires_at)
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.expire(
+        version.file,
+        ['current_version_id', 'checked_out_by', 'checked_out_at', 'lease_expires_at', 'updated_at']
+    )
+    return bool(promoted)
+
+
+def run_validation_job(version_id, max_attempts=1):
+    """
+    Validate a pending version
+
+    The version is claimed with a conditional UPDATE so that a job picked up
+    twice (e.g. after a requeue) is only processed once, and the claim time
+    is recorded so that requeue_pending() can tell a lost job from a slow one.
+
+    Returns:
+        True if the job finished, False if it failed and may be retried
+    """
+    claimed = db.session.execute(
+        db.update(Version)
+        .where(Version.id == version_id, Version.validation_status == 'pending')
+        .values(
+            validation_status='running',
+            validation_attempts=Version.validation_attempts + 1,
+            validation_started_at=datetime.utcnow()
+        )
+    ).rowcount
+    db.session.commit()
+
+    if not claimed:
+        return True
+
+    version = db.session.get(Version, version_id)
+
+    # Extract the cell snapshot once per content, right after upload;
+    # validation falls back to the workbook if that fails
+    try:
+        snapshot = snapshot_store.ensure(version.blob)
+    except Exception as e:
+        current_app.logger.warning('Could not extract a snapshot of version %s: %s', version_id, e)
+        snapshot = None
+
+    try:
+        plan = get_project_plan(version.file.project)
+        result = validation_cache.get(version.content_hash, plan)
+
+        if result is None:
+            validator = ExcelValidator(pool_size=current_app.config['VALIDATION_PROCESS_POOL_SIZE'])
+            # Raises, and is retried below, if the scan could not complete;
+            # only results of a full scan are cached
+            result = validator.validate(snapshot or blob_store.source(version.blob), plan)
+            validation_cache.put(version.content_hash, plan, result)
+
+        apply_validation_result(version, result)
+        search_index.index_file(version.file)
+        response_cache.invalidate(*file_tags(version.file))
+        event_hub.publish_file(
+            'validation_finished', version.file,
+            version_number=version.version_number,
+            validation_status=version.validation_status
+        )
+
+        audit_sink.log(
+            user_id=version.uploaded_by,
+            action='file_validated',
+            file_id=version.file_id,
+            project_id=version.file.project_id,
+            details={'version': version.version_number, 'status': version.validation_status}
+        )
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        version = db.session.get(Version, version_id)
+
+        if version.validation_attempts >= max_attempts:
+            version.validation_status = 'failed'
+            version.validation_errors = [f"Validation could not be completed: {str(e)}"]
+            version.validated_at = datetime.utcnow()
+            response_cache.invalidate(*file_tags(version.file))
+            event_hub.publish_file(
+                'validation_finished', version.file,
+                version_number=version.version_number,
+                validation_status=version.validation_status
+            )
+            db.session.commit()
+            return True
+
+        version.validation_status = 'pending'
+        db.session.commit()
+        return False
+
+
+class ValidationQueue:
+    """
+    Runs version validation on a bounded local worker pool
+
+    The pool is in-process, so jobs queued when a process stops are lost;
+    the version rows are the durable record. With VALIDATION_REQUEUE_ON_START
+    every process requeues unfinished versions when it serves its first
+    request.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._requeued_pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['validation_queue'] = self
+        if app.config['VALIDATION_REQUEUE_ON_START']:
+            app.before_request(self._requeue_on_start)
+
+    @property
+    def executor(self):
+        # Created lazily so that each forked gunicorn worker gets its own pool
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.app.config['VALIDATION_WORKERS'],
+                    thread_name_prefix='validation'
+                )
+            return self._executor
+
+    def enqueue(self, version_id):
+        """Schedule validation of a version that has been committed as pending"""
+        if not self.app.config['VALIDATION_ASYNC']:
+            self._run(version_id)
+            return
+        self.executor.submit(self._run, version_id)
+
+    def enqueue_many(self, version_ids):
+        """
+        Schedule validation of several committed versions
+
+        Without VALIDATION_ASYNC they are validated before this returns, on
+        a pool of VALIDATION_WORKERS threads.
+        """
+        if self.app.config['VALIDATION_ASYNC']:
+            for version_id in version_ids:
+                self.executor.submit(self._run, version_id)
+            return
+        with ThreadPoolExecutor(
+            max_workers=self.app.config['VALIDATION_WORKERS'],
+            thread_name_prefix='validation'
+        ) as executor:
+            list(executor.map(self._run, version_ids))
+
+    def requeue_pending(self):
+        """
+        Re-enqueue versions whose validation never finished
+
+        Pending versions are queued again, as are versions left running for
+        longer than VALIDATION_JOB_TIMEOUT by a process that stopped
+        mid-job. Versions already queued here or in another process are
+        still only validated once, since each job claims its version.
+
+        Returns:
+            Number of versions queued
+        """
+        stale = datetime.utcnow() - timedelta(seconds=self.app.config['VALIDATION_JOB_TIMEOUT'])
+        with self.app.app_context():
+            db.session.execute(
+                db.update(Version)
+                .where(
+                    Version.validation_status == 'running',
+                    db.or_(Version.validation_started_at.is_(None), Version.validation_started_at < stale)
+                )
+                .values(validation_status='pending')
+            )
+            db.session.commit()
+            version_ids = [v for (v,) in db.session.query(Version.id).filter_by(validation_status='pending')]
+            db.session.remove()
+
+        for version_id in version_ids:
+            self.enqueue(version_id)
+        return len(version_ids)
+
+    def _requeue_on_start(self):
+        # Runs on the first request of each process rather than at import,
+        # so forked gunicorn workers each do it and CLI commands never do
+        pid = os.getpid()
+        if self._requeued_pid == pid:
+            return
+        with self._lock:
+            if self._requeued_pid == pid:
+                return
+            self._requeued_pid = pid
+        threading.Thread(target=self._requeue_in_background, name='validation-requeue', daemon=True).start()
+
+    def _requeue_in_background(self):
+        try:
+            count = self.requeue_pending()
+            if count:
+                self.app.logger.info('Requeued %d unfinished validation(s)', count)
+        except Exception:
+            self.app.logger.exception('Failed to requeue unfinished validations')
+
+    def _run(self, version_id):
+        max_attempts = self.app.config['VALIDATION_MAX_ATTEMPTS']
+        retry_delay = self.app.config['VALIDATION_RETRY_DELAY']
+
+        with self.app.app_context():
+            try:
+                for attempt in range(1, max_attempts + 1):
+                    if run_validation_job(version_id, max_attempts=max_attempts):
+                        return
+                    time.sleep(retry_delay * attempt)
+            except Exception:
+                self.app.logger.exception('Validation job for version %s failed', version_id)
+            finally:
+                db.session.remove()
+
+
+validation_queue = ValidationQueue()
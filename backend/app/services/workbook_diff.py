@@ -0,0 +1,227 @@
+from openpyxl.utils.cell import get_column_letter
+from backend.app.services.cell_snapshot import SheetSnapshot, Snapshot
+from backend.app.services.excel_validator import open_workbook
+from contextlib import nullcontext
+from datetime import date, datetime, time
+from itertools import zip_longest
+import posixpath
+import xml.etree.ElementTree as ElementTree
+import zipfile
+
+
+# Cell changes listed per sheet; further changes are only counted
+MAX_CHANGES_PER_SHEET = 1000
+
+SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+RELS_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+REL_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+
+# Parts a sheet's cell values depend on besides the sheet itself
+SHARED_PARTS = ('xl/sharedStrings.xml',)
+
+
+def sheet_parts(fh):
+    """
+    Map sheet names to the CRC and size of their zip parts
+
+    Returns:
+        (sheets, shared) where sheets maps sheet name to a (crc, size)
+        signature and shared is the signature of the shared parts, or None
+        if the file is not a readable xlsx package
+    """
+    try:
+        fh.seek(0)
+        with zipfile.ZipFile(fh) as archive:
+            infos = {info.filename: info for info in archive.infolist()}
+            workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+            rels = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError):
+        return None
+
+    targets = {}
+    for rel in rels.iter(f'{RELS_NS}Relationship'):
+        target = rel.get('Target', '')
+        if target.startswith('/'):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join('xl', target))
+        targets[rel.get('Id')] = target
+
+    def signature(name):
+        info = infos.get(name)
+        return (info.CRC, info.file_size) if info is not None else None
+
+    sheets = {}
+    for sheet in workbook.iter(f'{SHEET_NS}sheet'):
+        sheets[sheet.get('name')] = signature(targets.get(sheet.get(REL_ID)))
+
+    return sheets, tuple(signature(name) for name in SHARED_PARTS)
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    # Array formulas and other rich values
+    return getattr(value, 'text', None) or str(value)
+
+
+def _is_formula(value):
+    return isinstance(value, str) and value.startswith('=')
+
+
+def _empty_summary():
+    return {'added': 0, 'removed': 0, 'changed': 0, 'formula_changed': 0}
+
+
+class WorkbookDiff:
+    """
+    Cell-level diff between two workbooks
+
+    Both workbooks are streamed in read-only mode and compared row by row,
+    so memory is bounded by row width rather than sheet size. Sheets whose
+    XML part and shared strings are byte-identical in both files are not
+    read at all. Given two cell snapshots instead, rows are read from their
+    arrays and sheets with equal digests are skipped.
+    """
+
+    def __init__(self, max_changes=MAX_CHANGES_PER_SHEET):
+        self.max_changes = max_changes
+
+    def diff(self, old_source, new_source):
+        """
+        Diff two workbooks
+
+        Args:
+            old_source: Path, seekable binary file object or Snapshot of the
+                old workbook
+            new_source: Path, seekable binary file object or Snapshot of the
+                new workbook
+
+        Returns:
+            Dictionary with per-sheet results under 'sheets' and totals
+            under 'summary'
+        """
+        old_parts = self._parts(old_source)
+        new_parts = self._parts(new_source)
+
+        with self._open(old_source) as old_wb, self._open(new_source) as new_wb:
+            old_names = old_wb.sheetnames
+            new_names = new_wb.sheetnames
+            names = new_names + [name for name in old_names if name not in new_names]
+
+            sheets = []
+            for name in names:
+                if name not in old_names:
+                    sheets.append(self._whole_sheet(name, 'added', new_wb[name]))
+                elif name not in new_names:
+                    sheets.append(self._whole_sheet(name, 'removed', old_wb[name]))
+                elif self._identical(name, old_parts, new_parts):
+                    sheets.append({
+                        'name': name,
+                        'status': 'unchanged',
+                        'skipped': True,
+                        'summary': _empty_summary(),
+                        'changes': [],
+                        'truncated': False
+                    })
+                else:
+                    sheets.append(self._diff_sheet(name, old_wb[name], new_wb[name]))
+
+        summary = _empty_summary()
+        for sheet in sheets:
+            for key in summary:
+                summary[key] += sheet['summary'][key]
+
+        return {
+            'sheets': sheets,
+            'summary': summary,
+            'sheets_added': [s['name'] for s in sheets if s['status'] == 'added'],
+            'sheets_removed': [s['name'] for s in sheets if s['status'] == 'removed']
+        }
+
+    def _open(self, source):
+        if isinstance(source, Snapshot):
+            return nullcontext(source)
+        return open_workbook(source)
+
+    def _rows(self, sheet):
+        """Stream a sheet's rows as tuples of values"""
+        if isinstance(sheet, SheetSnapshot):
+            return sheet.iter_rows()
+        sheet.reset_dimensions()
+        return sheet.iter_rows(values_only=True)
+
+    def _parts(self, source):
+        if isinstance(source, Snapshot):
+            return {sheet.name: sheet.digest for sheet in source.worksheets}, ()
+        if hasattr(source, 'read'):
+            return sheet_parts(source)
+        with open(source, 'rb') as fh:
+            return sheet_parts(fh)
+
+    def _identical(self, name, old_parts, new_parts):
+        if old_parts is None or new_parts is None:
+            return False
+        old_sheets, old_shared = old_parts
+        new_sheets, new_shared = new_parts
+        old_sig = old_sheets.get(name)
+        return old_sig is not None and old_sig == new_sheets.get(name) and old_shared == new_shared
+
+    def _diff_sheet(self, name, old_sheet, new_sheet):
+        summary = _empty_summary()
+        changes = []
+        old_rows = self._rows(old_sheet)
+        new_rows = self._rows(new_sheet)
+
+        for row_idx, (old_row, new_row) in enumerate(zip_longest(old_rows, new_rows, fillvalue=()), start=1):
+            if old_row == new_row:
+                continue
+            for col_idx, (old, new) in enumerate(zip_longest(old_row, new_row), start=1):
+                if old == new:
+                    continue
+                if old is None:
+                    change = 'added'
+                elif new is None:
+                    change = 'removed'
+                elif _is_formula(old) or _is_formula(new):
+                    change = 'formula_changed'
+                else:
+                    change = 'changed'
+
+                summary[change] += 1
+                if len(changes) < self.max_changes:
+                    changes.append({
+                        'cell': f"{get_column_letter(col_idx)}{row_idx}",
+                        'type': change,
+                        'old': _json_value(old),
+                        'new': _json_value(new)
+                    })
+
+        total = sum(summary.values())
+        return {
+            'name': name,
+            'status': 'modified' if total else 'unchanged',
+            'skipped': False,
+            'summary': summary,
+            'changes': changes,
+            'truncated': total > len(changes)
+        }
+
+    def _whole_sheet(self, name, status, sheet):
+        """Count the non-empty cells of a sheet that was added or removed"""
+        if isinstance(sheet, SheetSnapshot):
+            count = sheet.cells
+        else:
+            count = sum(1 for row in self._rows(sheet) for value in row if value is not None)
+        summary = _empty_summary()
+        summary[status] = count
+        return {
+            'name': name,
+            'status': status,
+            'skipped': False,
+            'summary': summary,
+            'changes': [],
+            'truncated': count > 0
+        }
@@ -0,0 +1,151 @@
+from sqlalchemy import and_, or_
+from datetime import datetime
+import base64
+import json
+
+
+class CursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(*values):
+    """
+    Encode the sort key of the last row on a page as an opaque cursor
+
+    Datetimes are stored as ISO strings; callers decode them again.
+    """
+    payload = json.dumps(
+        [v.isoformat() if hasattr(v, 'isoformat') else v for v in values],
+        separators=(',', ':')
+    )
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, length):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: Cursor string from a previous page
+        length: Number of values the cursor must hold
+
+    Raises:
+        CursorError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise CursorError('Invalid cursor')
+
+    if not isinstance(values, list) or len(values) != length:
+        raise CursorError('Invalid cursor')
+    return values
+
+
+def parse_sort(value, allowed, default):
+    """
+    Parse a ?sort= value such as 'name' or '-updated_at'
+
+    Args:
+        value: Query parameter value, or None for the default
+        allowed: Sortable field names
+        default: Sort used when value is empty
+
+    Returns:
+        (field name, descending) tuple
+
+    Raises:
+        ValueError: If the field cannot be sorted on
+    """
+    value = value or default
+    descending = value.startswith('-')
+    field = value.lstrip('-')
+    if field not in allowed:
+        raise ValueError(f"Cannot sort by '{field}'; use one of {', '.join(sorted(allowed))}")
+    return field, descending
+
+
+def parse_fields(value, allowed):
+    """
+    Parse a comma-separated ?fields= list
+
+    Returns:
+        Set of field names, or None when every field is wanted
+
+    Raises:
+        ValueError: If a field is unknown
+    """
+    if not value:
+        return None
+    fields = {field.strip() for field in value.split(',') if field.strip()}
+    unknown = fields - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def _cursor_value(column, value):
+    """
+    Convert a decoded cursor value to the Python type of the column it sorts on
+
+    Raises:
+        CursorError: If the value does not fit the column, so that no
+            lists, objects or mistyped values reach the query
+    """
+    python_type = column.type.python_type
+    if python_type is datetime:
+        if not isinstance(value, str):
+            raise CursorError('Invalid cursor')
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            raise CursorError('Invalid cursor')
+    # bool is an int subclass, but never a valid value for a numeric column
+    if isinstance(value, bool) or not isinstance(value, python_type):
+        raise CursorError('Invalid cursor')
+    return value
+
+
+def keyset_page(query, sort_column, id_column, descending, cursor, limit):
+    """
+    Fetch one page of a query ordered by (sort_column, id_column)
+
+    The id breaks ties, so pages never overlap or skip rows however many
+    rows share a sort value.
+
+    Args:
+        query: Query selecting the rows to page through
+        sort_column: Column to sort on
+        id_column: Unique column used as the tie-breaker
+        descending: Sort direction of both columns
+        cursor: next_cursor of the previous page, or None for the first
+        limit: Maximum rows per page
+
+    Returns:
+        (rows, next_cursor) where next_cursor is None on the last page
+
+    Raises:
+        CursorError: If the cursor is malformed
+    """
+    if cursor:
+        value, row_id = decode_cursor(cursor, 2)
+        value = _cursor_value(sort_column, value)
+        row_id = _cursor_value(id_column, row_id)
+        if descending:
+            query = query.filter(or_(sort_column < value, and_(sort_column == value, id_column < row_id)))
+        else:
+            query = query.filter(or_(sort_column > value, and_(sort_column == value, id_column > row_id)))
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
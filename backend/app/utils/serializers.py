@@ -0,0 +1,131 @@
+from backend.app import db
+from backend.app.models.file import File
+from backend.app.models.version import Version
+from backend.app.models.user import User
+from sqlalchemy.orm import joinedload
+
+
+# Upper bound on the number of ids bound into a single IN clause
+IN_BATCH_SIZE = 500
+
+
+def _batched(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), IN_BATCH_SIZE):
+        yield ids[start:start + IN_BATCH_SIZE]
+
+
+def _load_versions(version_ids):
+    """Load versions by id along with their blobs"""
+    versions = {}
+    for batch in _batched(version_ids):
+        for version in Version.query.options(joinedload(Version.blob)).filter(Version.id.in_(batch)):
+            versions[version.id] = version
+    return versions
+
+
+def _load_usernames(user_ids):
+    usernames = {}
+    for batch in _batched(user_ids):
+        usernames.update(db.session.query(User.id, User.username).filter(User.id.in_(batch)))
+    return usernames
+
+
+# Fields of File.to_dict and Project.to_dict, for ?fields= selection
+FILE_FIELDS = (
+    'id', 'project_id', 'filename', 'status', 'is_checked_out', 'checked_out_by',
+    'checked_out_by_id', 'checked_out_at', 'lease_expires_at', 'current_version_id', 'current_version',
+    'version_count', 'latest_version_number', 'created_at', 'updated_at', 'current_version_data'
+)
+PROJECT_FIELDS = ('id', 'name', 'description', 'created_at', 'updated_at', 'created_by', 'file_count')
+
+
+def _wants(fields, *names):
+    return fields is None or any(name in fields for name in names)
+
+
+def _select(data, fields):
+    if fields is None:
+        return data
+    return {key: value for key, value in data.items() if key in fields}
+
+
+def serialize_files(files, fields=None):
+    """
+    Serialize files without per-file queries
+
+    Current versions (with their blobs) and checked-out usernames are each
+    fetched with one query per IN_BATCH_SIZE files, rather than several
+    lazy loads per file, and only if a selected field needs them.
+
+    Args:
+        files: Files to serialize
+        fields: Set of FILE_FIELDS to include, or None for all of them
+
+    Returns:
+        List of file dicts in the order of the given files
+    """
+    files = list(files)
+    if not files:
+        return []
+
+    versions = {}
+    if _wants(fields, 'status', 'current_version_data'):
+        versions = _load_versions({f.current_version_id for f in files if f.current_version_id})
+    usernames = {}
+    if _wants(fields, 'checked_out_by'):
+        usernames = _load_usernames({f.checked_out_by for f in files if f.checked_out_by})
+
+    return [
+        _select(f.to_dict(
+            current_version=versions.get(f.current_version_id),
+            checked_out_username=usernames.get(f.checked_out_by)
+        ), fields)
+        for f in files
+    ]
+
+
+def serialize_projects(projects, include_files=False, fields=None):
+    """
+    Serialize projects without per-project queries
+
+    With include_files, the files of every project are loaded together
+    and serialized through serialize_files.
+
+    Args:
+        projects: Projects to serialize
+        include_files: Include each project's files
+        fields: Set of PROJECT_FIELDS to include, or None for all of them
+
+    Returns:
+        List of project dicts in the order of the given projects
+    """
+    projects = list(projects)
+    if not projects:
+        return []
+
+    if fields is not None and include_files:
+        fields = fields | {'files'}
+
+    project_ids = [p.id for p in projects]
+
+    files_by_project = {}
+    if include_files:
+        files = []
+        for batch in _batched(project_ids):
+            files.extend(File.query.filter(File.project_id.in_(batch)).order_by(File.id))
+        for file_dict in serialize_files(files):
+            files_by_project.setdefault(file_dict['project_id'], []).append(file_dict)
+
+    return [
+        _select(p.to_dict(
+            include_files=include_files,
+            files=files_by_project.get(p.id, []) if include_files else None
+        ), fields)
+        for p in projects
+    ]
+
+
+def serialize_project(project, include_files=False):
+    """Serialize a single project through serialize_projects"""
+    return serialize_projects([project], include_files=include_files)[0]
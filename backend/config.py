@@ -23,9 +23,87 @@ class Config:
     STORAGE_PATH = os.getenv('STORAGE_PATH', os.path.join(BASE_DIR, 'storage', 'files'))
     UPLOAD_PATH = os.getenv('UPLOAD_PATH', os.path.join(BASE_DIR, 'storage', 'uploads'))
     MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', 104857600))  # 100MB
+    # Split workbooks into deduplicated zip-member chunks instead of whole files
+    STORAGE_CHUNKING = os.getenv('STORAGE_CHUNKING', 'true').lower() == 'true'
+    # Unreferenced content written or reused more recently than this is kept by garbage collection
+    BLOB_GC_GRACE_PERIOD = int(os.getenv('BLOB_GC_GRACE_PERIOD', 3600))  # seconds
+    BLOB_GC_INTERVAL = int(os.getenv('BLOB_GC_INTERVAL', 3600))  # seconds between garbage collections
+    # Hand flat blob downloads to the front-end server: '', 'x-accel-redirect' (nginx) or 'x-sendfile'
+    DOWNLOAD_OFFLOAD = os.getenv('DOWNLOAD_OFFLOAD', '').lower()
+    # nginx internal location that maps to STORAGE_PATH, for x-accel-redirect
+    DOWNLOAD_ACCEL_PREFIX = os.getenv('DOWNLOAD_ACCEL_PREFIX', '/_storage/')
+    # Resumable uploads: sessions idle longer than this are swept with their partial data
+    UPLOAD_SESSION_TTL = int(os.getenv('UPLOAD_SESSION_TTL', 24 * 3600))  # seconds
+    UPLOAD_SWEEP_INTERVAL = int(os.getenv('UPLOAD_SWEEP_INTERVAL', 3600))  # seconds
+    # Bulk uploads: files per request, and files written per INSERT/commit batch
+    BULK_UPLOAD_MAX_FILES = int(os.getenv('BULK_UPLOAD_MAX_FILES', 500))
+    BULK_UPLOAD_BATCH_SIZE = int(os.getenv('BULK_UPLOAD_BATCH_SIZE', 100))
+    # Extract each stored workbook once into columnar cell arrays under STORAGE_PATH/snapshots
+    SNAPSHOTS_ENABLED = os.getenv('SNAPSHOTS_ENABLED', 'true').lower() == 'true'
+    
+    # Full-text search; string cell contents of current versions are indexed only if enabled
+    SEARCH_INDEX_CELLS = os.getenv('SEARCH_INDEX_CELLS', 'false').lower() == 'true'
+    SEARCH_MAX_CELL_TERMS = int(os.getenv('SEARCH_MAX_CELL_TERMS', 5000))  # distinct terms per file
+    
+    # Checkouts are leases; abandoned ones are released once they expire
+    CHECKOUT_LEASE_TTL = int(os.getenv('CHECKOUT_LEASE_TTL', 8 * 3600))  # seconds
+    CHECKOUT_SWEEP_INTERVAL = int(os.getenv('CHECKOUT_SWEEP_INTERVAL', 60))  # seconds
+    
+    # Periodic housekeeping (lease and upload sweeps, cache eviction, blob GC) on a background thread in each process
+    MAINTENANCE_ENABLED = os.getenv('MAINTENANCE_ENABLED', 'true').lower() == 'true'
+    MAINTENANCE_TICK = int(os.getenv('MAINTENANCE_TICK', 10))  # seconds between checks for due tasks
     
     # Excel Settings
     ALLOWED_EXTENSIONS = {'xlsx', 'xlsm', 'xls'}
+
+    # Background validation
+    VALIDATION_ASYNC = os.getenv('VALIDATION_ASYNC', 'true').lower() == 'true'
+    VALIDATION_WORKERS = int(os.getenv('VALIDATION_WORKERS', 2))
+    VALIDATION_MAX_ATTEMPTS = int(os.getenv('VALIDATION_MAX_ATTEMPTS', 3))
+    VALIDATION_RETRY_DELAY = float(os.getenv('VALIDATION_RETRY_DELAY', 2))  # seconds
+    # Unfinished validations are requeued by each process on its first request
+    VALIDATION_REQUEUE_ON_START = os.getenv('VALIDATION_REQUEUE_ON_START', 'true').lower() == 'true'
+    VALIDATION_JOB_TIMEOUT = int(os.getenv('VALIDATION_JOB_TIMEOUT', 1800))  # seconds before a running job counts as lost
+    # Worker processes for per-sheet validation; 0 validates sheets serially
+    VALIDATION_PROCESS_POOL_SIZE = int(os.getenv('VALIDATION_PROCESS_POOL_SIZE', 0))
+    
+    # Validation result cache
+    VALIDATION_CACHE_ENABLED = os.getenv('VALIDATION_CACHE_ENABLED', 'true').lower() == 'true'
+    VALIDATION_CACHE_TTL = int(os.getenv('VALIDATION_CACHE_TTL', 30 * 24 * 3600))  # seconds
+    VALIDATION_CACHE_MAX_ENTRIES = int(os.getenv('VALIDATION_CACHE_MAX_ENTRIES', 100000))
+    VALIDATION_CACHE_EVICT_INTERVAL = int(os.getenv('VALIDATION_CACHE_EVICT_INTERVAL', 3600))  # seconds
+    
+    # Response cache for project and file GET endpoints; the shared tier is a database table
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 1000))  # entries per process
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 300))  # seconds
+    RESPONSE_CACHE_SHARED = os.getenv('RESPONSE_CACHE_SHARED', 'false').lower() == 'true'
+    
+    # Server-sent event streams, served by the gevent process in events.py.
+    # Streams the web process serves itself each hold one of its threads,
+    # so it keeps EVENT_STREAM_MAX_CLIENTS well below its thread count
+    EVENT_CHANNEL = os.getenv('EVENT_CHANNEL', 'reposync_events')  # PostgreSQL NOTIFY channel
+    EVENT_STREAM_URL = os.getenv('EVENT_STREAM_URL', '/api/events')  # where pages open their streams
+    # Page origins allowed to open streams when EVENT_STREAM_URL is on another host;
+    # SESSION_COOKIE_DOMAIN must then cover both hosts
+    EVENT_STREAM_ORIGINS = [o for o in os.getenv('EVENT_STREAM_ORIGINS', '').split(',') if o]
+    SESSION_COOKIE_DOMAIN = os.getenv('SESSION_COOKIE_DOMAIN') or None
+    EVENT_STREAM_MAX_CLIENTS = int(os.getenv('EVENT_STREAM_MAX_CLIENTS', 8))  # per process
+    EVENT_STREAM_HEARTBEAT = int(os.getenv('EVENT_STREAM_HEARTBEAT', 15))  # seconds
+    EVENT_STREAM_MAX_AGE = int(os.getenv('EVENT_STREAM_MAX_AGE', 600))  # seconds before the client reconnects
+    EVENT_STREAM_RETRY_MS = int(os.getenv('EVENT_STREAM_RETRY_MS', 3000))
+    EVENT_QUEUE_SIZE = int(os.getenv('EVENT_QUEUE_SIZE', 100))  # events buffered per client
+    
+    # Audit logging; read events (downloads, logins) are buffered and bulk-inserted
+    AUDIT_BUFFERED = os.getenv('AUDIT_BUFFERED', 'true').lower() == 'true'
+    AUDIT_BUFFER_SIZE = int(os.getenv('AUDIT_BUFFER_SIZE', 10000))  # events held before writing inline
+    AUDIT_FLUSH_BATCH = int(os.getenv('AUDIT_FLUSH_BATCH', 500))
+    AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 2))  # seconds
+    
+    # Audit retention: months older than this are moved to gzip NDJSON archives
+    AUDIT_RETENTION_DAYS = int(os.getenv('AUDIT_RETENTION_DAYS', 365))
+    AUDIT_ARCHIVE_PATH = os.getenv('AUDIT_ARCHIVE_PATH', os.path.join(BASE_DIR, 'storage', 'audit_archive'))
+    AUDIT_PARTITION_MONTHS_AHEAD = int(os.getenv('AUDIT_PARTITION_MONTHS_AHEAD', 3))
     
     # Application
     APP_NAME = os.getenv('APP_NAME', 'RepoSync')
@@ -47,7 +125,11 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = 'postgresql://localhost/excel_gitlab_test'
+    SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URL', 'postgresql://localhost/excel_gitlab_test')
+    VALIDATION_ASYNC = False
+    VALIDATION_REQUEUE_ON_START = False
+    AUDIT_BUFFERED = False
+    MAINTENANCE_ENABLED = False
 
 
 # Configuration dictionary
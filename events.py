@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+"""
+Entry point for the event stream process
+
+Event streams stay open for minutes, so they are served by gevent workers,
+where each open stream is a greenlet, instead of by the web process, where
+each would hold a thread:
+
+    gunicorn events:app --worker-class gevent --worker-connections 2000
+
+Route /api/events to this process, or point EVENT_STREAM_URL at it. Events
+published by the web process reach it through PostgreSQL NOTIFY.
+"""
+from gevent import monkey
+monkey.patch_all()
+
+from psycogreen.gevent import patch_psycopg
+patch_psycopg()
+
+import os
+
+# Validation is CPU-bound and is left to the web process
+os.environ.setdefault('VALIDATION_REQUEUE_ON_START', 'false')
+os.environ.setdefault('EVENT_STREAM_MAX_CLIENTS', '2000')
+
+from run import app
+
+# Pages served from another origin open their streams with credentials
+if app.config['EVENT_STREAM_ORIGINS']:
+    from flask_cors import CORS
+    CORS(app, resources={r'/api/events': {'origins': app.config['EVENT_STREAM_ORIGINS']}}, supports_credentials=True)
@@ -0,0 +1,80 @@
+"""Store version content as content-addressed blobs
+
+Revision ID: 3c8e1f0a9b21
+Revises:
+Create Date: 2026-10-17 09:12:40.318442
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from backend.app.services.legacy_storage import ingest_legacy_versions, drop_legacy_paths
+import logging
+
+
+# revision identifiers, used by Alembic.
+revision = '3c8e1f0a9b21'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+def upgrade():
+    # run.py creates missing tables with db.create_all() before migrating,
+    # so each step only runs if the schema does not have it yet
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('blobs'):
+        op.create_table(
+            'blobs',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('sha256', sa.String(length=64), nullable=False),
+            sa.Column('size', sa.BigInteger(), nullable=False),
+            sa.Column('storage_path', sa.String(length=500), nullable=True),
+            sa.Column('manifest', sa.JSON(), nullable=True),
+            sa.Column('ref_count', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_blobs_sha256', 'blobs', ['sha256'], unique=True)
+
+    columns = {column['name'] for column in inspector.get_columns('versions')}
+    if 'blob_id' not in columns:
+        with op.batch_alter_table('versions') as batch_op:
+            batch_op.add_column(sa.Column('blob_id', sa.Integer(), nullable=True))
+            batch_op.create_index('ix_versions_blob_id', ['blob_id'])
+            batch_op.create_foreign_key('fk_versions_blob_id_blobs', 'blobs', ['blob_id'], ['id'])
+
+    if 'file_path' not in columns:
+        return
+
+    ingested, missing = ingest_legacy_versions(op.get_bind())
+    logger.info('Ingested %d version file(s) into the blob store', ingested)
+    if missing:
+        # Keep the paths so the files can be restored and ingested later
+        # with `flask ingest-legacy-files`
+        for version_id, path in missing:
+            logger.warning('Version %d: %s not found, left without a blob', version_id, path)
+        with op.batch_alter_table('versions') as batch_op:
+            batch_op.alter_column('file_path', existing_type=sa.String(length=500), nullable=True)
+    else:
+        drop_legacy_paths(op)
+
+
+def downgrade():
+    # Content of chunked blobs has no single file to point at and is left NULL
+    with op.batch_alter_table('versions') as batch_op:
+        batch_op.add_column(sa.Column('file_path', sa.String(length=500), nullable=True))
+
+    versions = sa.table('versions', sa.column('blob_id'), sa.column('file_path'))
+    blobs = sa.table('blobs', sa.column('id'), sa.column('storage_path'))
+    op.execute(
+        versions.update().values(
+            file_path=sa.select(blobs.c.storage_path).where(blobs.c.id == versions.c.blob_id).scalar_subquery()
+        )
+    )
+
+    with op.batch_alter_table('versions') as batch_op:
+        batch_op.drop_index('ix_versions_blob_id')
+        batch_op.drop_column('blob_id')
@@ -0,0 +1,31 @@
+"""Track validation attempts and claim time
+
+Revision ID: 7d2b9e4c1a05
+Revises: 3c8e1f0a9b21
+Create Date: 2026-10-17 10:02:17.604913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2b9e4c1a05'
+down_revision = '3c8e1f0a9b21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('versions')}
+    with op.batch_alter_table('versions') as batch_op:
+        if 'validation_attempts' not in columns:
+            batch_op.add_column(sa.Column('validation_attempts', sa.Integer(), nullable=False, server_default='0'))
+        if 'validation_started_at' not in columns:
+            batch_op.add_column(sa.Column('validation_started_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('versions') as batch_op:
+        batch_op.drop_column('validation_started_at')
+        batch_op.drop_column('validation_attempts')
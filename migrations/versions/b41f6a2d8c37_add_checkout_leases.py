@@ -0,0 +1,42 @@
+"""Add checkout lease expiry
+
+Revision ID: b41f6a2d8c37
+Revises: 7d2b9e4c1a05
+Create Date: 2026-10-17 10:21:48.090236
+
+"""
+from alembic import op
+from flask import current_app
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b41f6a2d8c37'
+down_revision = '7d2b9e4c1a05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'lease_expires_at' in {column['name'] for column in inspector.get_columns('files')}:
+        return
+
+    op.add_column('files', sa.Column('lease_expires_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_files_lease_expires_at', 'files', ['lease_expires_at'])
+
+    # Checkouts taken before leases existed get one full lease from now
+    lease_end = datetime.utcnow() + timedelta(seconds=current_app.config['CHECKOUT_LEASE_TTL'])
+    files = sa.table('files', sa.column('checked_out_by'), sa.column('lease_expires_at'))
+    op.execute(
+        files.update()
+        .where(files.c.checked_out_by.isnot(None))
+        .values(lease_expires_at=lease_end)
+    )
+
+
+def downgrade():
+    op.drop_index('ix_files_lease_expires_at', table_name='files')
+    with op.batch_alter_table('files') as batch_op:
+        batch_op.drop_column('lease_expires_at')
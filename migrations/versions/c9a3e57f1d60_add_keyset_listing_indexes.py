@@ -0,0 +1,37 @@
+"""Add keyset indexes for project and file listings
+
+Revision ID: c9a3e57f1d60
+Revises: b41f6a2d8c37
+Create Date: 2026-10-17 10:38:05.771520
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9a3e57f1d60'
+down_revision = 'b41f6a2d8c37'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_projects_updated_at_id', 'projects', ['updated_at', 'id']),
+    ('ix_projects_created_at_id', 'projects', ['created_at', 'id']),
+    ('ix_projects_name_id', 'projects', ['name', 'id']),
+    ('ix_files_project_id_id', 'files', ['project_id', 'id']),
+    ('ix_files_project_filename_id', 'files', ['project_id', 'filename', 'id']),
+    ('ix_files_project_updated_at_id', 'files', ['project_id', 'updated_at', 'id']),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        if name not in {index['name'] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
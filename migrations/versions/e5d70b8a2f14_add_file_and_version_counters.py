@@ -0,0 +1,104 @@
+"""Add file and version counters
+
+Revision ID: e5d70b8a2f14
+Revises: c9a3e57f1d60
+Create Date: 2026-10-17 10:54:31.226089
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import logging
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5d70b8a2f14'
+down_revision = 'c9a3e57f1d60'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+files = sa.table(
+    'files',
+    sa.column('id'), sa.column('project_id'), sa.column('updated_at'),
+    sa.column('version_count'), sa.column('latest_version_number')
+)
+versions = sa.table('versions', sa.column('id'), sa.column('file_id'), sa.column('version_number'))
+projects = sa.table('projects', sa.column('id'), sa.column('updated_at'), sa.column('file_count'))
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    file_columns = {column['name'] for column in inspector.get_columns('files')}
+    if 'version_count' not in file_columns:
+        op.add_column('files', sa.Column('version_count', sa.Integer(), nullable=False, server_default='0'))
+    if 'latest_version_number' not in file_columns:
+        op.add_column('files', sa.Column('latest_version_number', sa.Integer(), nullable=False, server_default='0'))
+
+    if 'file_count' not in {column['name'] for column in inspector.get_columns('projects')}:
+        op.add_column('projects', sa.Column('file_count', sa.Integer(), nullable=False, server_default='0'))
+    if 'ix_projects_file_count_id' not in {index['name'] for index in inspector.get_indexes('projects')}:
+        op.create_index('ix_projects_file_count_id', 'projects', ['file_count', 'id'])
+
+    if 'uq_versions_file_version' not in {
+        constraint['name'] for constraint in inspector.get_unique_constraints('versions')
+    }:
+        _renumber_duplicate_versions(bind)
+        with op.batch_alter_table('versions') as batch_op:
+            batch_op.create_unique_constraint('uq_versions_file_version', ['file_id', 'version_number'])
+
+    # Same as `flask recount-files`; updated_at is kept as it is
+    op.execute(files.update().values(
+        version_count=sa.select(sa.func.count(versions.c.id))
+        .where(versions.c.file_id == files.c.id)
+        .scalar_subquery(),
+        latest_version_number=sa.select(sa.func.coalesce(sa.func.max(versions.c.version_number), 0))
+        .where(versions.c.file_id == files.c.id)
+        .scalar_subquery(),
+        updated_at=files.c.updated_at
+    ))
+    op.execute(projects.update().values(
+        file_count=sa.select(sa.func.count(files.c.id))
+        .where(files.c.project_id == projects.c.id)
+        .scalar_subquery(),
+        updated_at=projects.c.updated_at
+    ))
+
+
+def downgrade():
+    with op.batch_alter_table('versions') as batch_op:
+        batch_op.drop_constraint('uq_versions_file_version', type_='unique')
+    op.drop_index('ix_projects_file_count_id', table_name='projects')
+    with op.batch_alter_table('projects') as batch_op:
+        batch_op.drop_column('file_count')
+    with op.batch_alter_table('files') as batch_op:
+        batch_op.drop_column('latest_version_number')
+        batch_op.drop_column('version_count')
+
+
+def _renumber_duplicate_versions(bind):
+    """
+    Give versions that share a number with an earlier version of the same
+    file the next free numbers, so the unique constraint can be created
+
+    Concurrent uploads could allocate the same number before it existed.
+    """
+    duplicates = bind.execute(
+        sa.select(versions.c.file_id, versions.c.version_number)
+        .group_by(versions.c.file_id, versions.c.version_number)
+        .having(sa.func.count() > 1)
+    ).all()
+
+    for file_id, version_number in duplicates:
+        version_ids = bind.scalars(
+            sa.select(versions.c.id)
+            .where(versions.c.file_id == file_id, versions.c.version_number == version_number)
+            .order_by(versions.c.id)
+        ).all()
+        latest = bind.scalar(sa.select(sa.func.max(versions.c.version_number)).where(versions.c.file_id == file_id))
+        for version_id in version_ids[1:]:
+            latest += 1
+            bind.execute(versions.update().where(versions.c.id == version_id).values(version_number=latest))
+            logger.warning('Version %d of file %d renumbered to %d', version_number, file_id, latest)
@@ -0,0 +1,48 @@
+"""Add composite audit log indexes
+
+Revision ID: f3b8c1d27e46
+Revises: e5d70b8a2f14
+Create Date: 2026-10-17 11:12:48.604317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8c1d27e46'
+down_revision = 'e5d70b8a2f14'
+branch_labels = None
+depends_on = None
+
+# Same as `flask create-audit-indexes`
+INDEXES = [
+    ('ix_audit_logs_timestamp_id', ['timestamp', 'id']),
+    ('ix_audit_logs_user_timestamp', ['user_id', 'timestamp', 'id']),
+    ('ix_audit_logs_file_timestamp', ['file_id', 'timestamp', 'id']),
+    ('ix_audit_logs_project_timestamp', ['project_id', 'timestamp', 'id']),
+    ('ix_audit_logs_action_timestamp', ['action', 'timestamp', 'id']),
+]
+
+# Covered by ix_audit_logs_timestamp_id
+LEGACY_INDEXES = [('ix_audit_logs_timestamp', ['timestamp'])]
+
+
+def upgrade():
+    existing = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('audit_logs')}
+    for name, columns in INDEXES:
+        if name not in existing:
+            op.create_index(name, 'audit_logs', columns)
+    for name, _columns in LEGACY_INDEXES:
+        if name in existing:
+            op.drop_index(name, table_name='audit_logs')
+
+
+def downgrade():
+    existing = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('audit_logs')}
+    for name, columns in LEGACY_INDEXES:
+        if name not in existing:
+            op.create_index(name, 'audit_logs', columns)
+    for name, _columns in reversed(INDEXES):
+        if name in existing:
+            op.drop_index(name, table_name='audit_logs')
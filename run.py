@@ -3,8 +3,9 @@
 Main entry point for RepoSync application
 """
 import os
+import click
 from backend.app import create_app, db
-from backend.app.models import User, Project, File, Version, AuditLog
+from backend.app.models import User, Project, File, Version, AuditLog, Blob, Chunk, UploadSession
 
 app = create_app()
 
@@ -22,7 +23,10 @@ def make_shell_context():
         'Project': Project,
         'File': File,
         'Version': Version,
-        'AuditLog': AuditLog
+        'AuditLog': AuditLog,
+        'Blob': Blob,
+        'Chunk': Chunk,
+        'UploadSession': UploadSession
     }
 
 
@@ -33,6 +37,199 @@ def init_db():
     print("Database initialized!")
 
 
+@app.cli.command()
+def collect_blobs():
+    """Delete stored blobs that no version references"""
+    from backend.app.services.blob_store import blob_store
+    count = blob_store.collect_garbage()
+    print(f"Removed {count} unreferenced blob(s)")
+
+
+@app.cli.command()
+def ingest_legacy_files():
+    """Move version files stored by path into the blob store"""
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+    from backend.app.services.legacy_storage import has_legacy_paths, ingest_legacy_versions, drop_legacy_paths
+
+    with db.engine.begin() as connection:
+        if not has_legacy_paths(connection):
+            print("No legacy version files left to ingest")
+            return
+        ingested, missing = ingest_legacy_versions(connection)
+
+    for version_id, path in missing:
+        print(f"Version {version_id}: {path} not found")
+    print(f"Ingested {ingested} version file(s), {len(missing)} missing")
+
+    if not missing:
+        with db.engine.begin() as connection:
+            drop_legacy_paths(Operations(MigrationContext.configure(connection)))
+        print("Dropped versions.file_path")
+
+
+@app.cli.command()
+@click.option('--force', is_flag=True, help='Rebuild snapshots that already exist')
+def build_snapshots(force):
+    """Extract cell snapshots for stored versions that do not have one"""
+    from backend.app.services.cell_snapshot import snapshot_store
+    built = failed = 0
+    for blob in Blob.query.order_by(Blob.id).yield_per(100):
+        if not force and snapshot_store.get(blob) is not None:
+            continue
+        try:
+            snapshot_store.ensure(blob, force=force)
+            built += 1
+        except Exception as e:
+            failed += 1
+            print(f"{blob.sha256}: {e}")
+    print(f"Built {built} snapshot(s), {failed} failed")
+
+
+@app.cli.command()
+def rebuild_search_index():
+    """Rebuild the full-text search index from scratch"""
+    from backend.app.services.search_index import search_index
+    count = search_index.rebuild()
+    print(f"Indexed {count} file(s)")
+
+
+@app.cli.command()
+def sweep_uploads():
+    """Delete resumable uploads that have been idle past their TTL"""
+    from backend.app.services.upload_sessions import upload_sessions
+    count = upload_sessions.sweep_expired()
+    print(f"Removed {count} expired upload session(s)")
+
+
+@app.cli.command()
+def sweep_checkouts():
+    """Check in files whose checkout lease has expired"""
+    from backend.app.services.checkout_locks import checkout_locks
+    count = checkout_locks.sweep_expired()
+    print(f"Released {count} expired checkout(s)")
+
+
+@app.cli.command()
+def evict_validation_cache():
+    """Drop expired and least recently used validation cache entries"""
+    from backend.app.services.validation_cache import validation_cache
+    count = validation_cache.evict()
+    print(f"Evicted {count} cached validation result(s)")
+
+
+@app.cli.command()
+def recount_files():
+    """Recompute the stored file and version counters from the tables"""
+    version_count = db.select(db.func.count(Version.id)).where(Version.file_id == File.id)
+    latest_version = db.select(db.func.coalesce(db.func.max(Version.version_number), 0)).where(Version.file_id == File.id)
+    file_count = db.select(db.func.count(File.id)).where(File.project_id == Project.id)
+    
+    db.session.execute(db.update(File).values(
+        version_count=version_count.scalar_subquery(),
+        latest_version_number=latest_version.scalar_subquery(),
+        updated_at=File.updated_at
+    ))
+    db.session.execute(db.update(Project).values(
+        file_count=file_count.scalar_subquery(),
+        updated_at=Project.updated_at
+    ))
+    db.session.commit()
+    print("File and version counters recomputed")
+
+
+@app.cli.command()
+def requeue_validations():
+    """Re-enqueue versions whose validation never finished"""
+    from backend.app.services.validation_queue import validation_queue
+    count = validation_queue.requeue_pending()
+    print(f"Requeued {count} pending validation(s)")
+
+
+@app.cli.command()
+def create_audit_indexes():
+    """Create the composite audit log indexes on an existing database"""
+    from backend.app.services.audit_archive import audit_archive
+    audit_archive.ensure_indexes()
+    print("Audit log indexes created")
+
+
+@app.cli.command()
+@click.option('--months-ahead', default=None, type=int, help='Future months to create partitions for')
+def partition_audit_logs(months_ahead):
+    """Partition the audit log table by month and create upcoming partitions (PostgreSQL)"""
+    from backend.app.services.audit_archive import audit_archive
+    if audit_archive.partition_table(months_ahead):
+        print("Converted audit_logs to a monthly partitioned table")
+    partitions = audit_archive.ensure_partitions(months_ahead)
+    if partitions:
+        print(f"Partitions in place up to {partitions[-1]}")
+    else:
+        print("audit_logs is not partitioned (PostgreSQL only)")
+
+
+@app.cli.command()
+@click.option('--days', default=None, type=int, help='Retention period in days (default AUDIT_RETENTION_DAYS)')
+def archive_audit_logs(days):
+    """Move audit log months past the retention period to the archive"""
+    from backend.app.services.audit_archive import audit_archive
+    archived = audit_archive.archive(days)
+    for month, count, path in archived:
+        print(f"{month:%Y-%m}: archived {count} row(s) to {path}")
+    print(f"Archived {len(archived)} month(s)")
+
+
+@app.cli.command()
+@click.option('--sheets', default=40, help='Number of sheets in the synthetic workbook')
+@click.option('--rows', default=2000, help='Rows per sheet')
+@click.option('--workers', default=os.cpu_count() or 2, help='Process pool size for the parallel run')
+@click.argument('file_path', required=False)
+def bench_validation(sheets, rows, workers, file_path):
+    """Compare serial and parallel validation of a workbook"""
+    import tempfile
+    import time
+    import openpyxl
+    from backend.app.services.excel_validator import ExcelValidator
+    
+    if file_path:
+        wb = openpyxl.load_workbook(file_path, read_only=True)
+        sheet_names = wb.sheetnames
+        wb.close()
+    else:
+        file_path = os.path.join(tempfile.mkdtemp(), 'bench.xlsx')
+        wb = openpyxl.Workbook()
+        wb.remove(wb.active)
+        sheet_names = [f'Sheet{i}' for i in range(1, sheets + 1)]
+        for name in sheet_names:
+            ws = wb.create_sheet(name)
+            ws.append(['Name', 'Amount', 'Total'])
+            for r in range(2, rows + 2):
+                ws.append([f'Item {r}', r, f'=B{r}*2'])
+        wb.save(file_path)
+    
+    rules = {
+        'formula_sheets': sheet_names,
+        'data_validations': {f'{name}!B:B': {'type': 'range', 'min': 0} for name in sheet_names}
+    }
+    
+    def timed(validator):
+        start = time.perf_counter()
+        result = validator.validate(file_path, rules)
+        return time.perf_counter() - start, result
+    
+    # Warm the pool up so process start-up is not counted
+    ExcelValidator(pool_size=workers).validate(file_path, {})
+    
+    serial_time, serial_result = timed(ExcelValidator())
+    parallel_time, parallel_result = timed(ExcelValidator(pool_size=workers))
+    
+    print(f"Workbook: {file_path} ({len(sheet_names)} sheets)")
+    print(f"Serial:   {serial_time:.2f}s")
+    print(f"Parallel: {parallel_time:.2f}s ({workers} workers)")
+    print(f"Speedup:  {serial_time / parallel_time:.2f}x")
+    print(f"Results match: {serial_result == parallel_result}")
+
+
 @app.cli.command()
 def create_admin():
     """Create an admin user"""
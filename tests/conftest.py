@@ -0,0 +1,134 @@
+import io
+import os
+import tempfile
+
+# backend.config reads the environment when it is imported
+_test_root = tempfile.mkdtemp(prefix='reposync-tests-')
+os.environ.setdefault('TEST_DATABASE_URL', 'sqlite:///' + os.path.join(_test_root, 'test.db'))
+os.environ.setdefault('STORAGE_PATH', os.path.join(_test_root, 'files'))
+os.environ.setdefault('UPLOAD_PATH', os.path.join(_test_root, 'uploads'))
+
+import openpyxl
+import pytest
+from flask import g
+from backend.app import create_app, db
+from backend.app.models import Project
+from backend.app.services import validation_plan
+from backend.app.services.blob_store import blob_store
+from backend.app.services.maintenance import maintenance
+from backend.app.services.response_cache import response_cache
+from tests.helpers import RULES, create_user, login
+
+
+@pytest.fixture(scope='session')
+def _app():
+    app = create_app('testing')
+
+    @app.before_request
+    def forget_loaded_user():
+        # Requests share the app context pytest-flask pushes for each test,
+        # and with it the user Flask-Login loaded for the previous client
+        g.pop('_login_user', None)
+
+    return app
+
+
+@pytest.fixture
+def app(_app, tmp_path):
+    """The application on an empty database and storage directory"""
+    saved_config = dict(_app.config)
+    _app.config.update(
+        STORAGE_PATH=str(tmp_path / 'files'),
+        UPLOAD_PATH=str(tmp_path / 'uploads'),
+        AUDIT_ARCHIVE_PATH=str(tmp_path / 'audit_archive'),
+        BLOB_GC_GRACE_PERIOD=0
+    )
+    os.makedirs(_app.config['STORAGE_PATH'])
+    os.makedirs(_app.config['UPLOAD_PATH'])
+
+    with _app.app_context():
+        db.drop_all()
+        db.create_all()
+    response_cache.clear()
+    validation_plan._plans.clear()
+    maintenance._last_run.clear()
+
+    yield _app
+
+    # Garbage collection started by a request must not outlive its database
+    if blob_store._collector is not None:
+        blob_store._collector.join()
+    with _app.app_context():
+        db.session.remove()
+    _app.config.clear()
+    _app.config.update(saved_config)
+
+
+@pytest.fixture
+def user(app):
+    return create_user('alice')
+
+
+@pytest.fixture
+def auth_client(client, user):
+    """Test client logged in as user"""
+    return login(client, user)
+
+
+@pytest.fixture
+def other_client(app):
+    """Test client logged in as a second user"""
+    return login(app.test_client(), create_user('bob'))
+
+
+@pytest.fixture
+def project(user):
+    project = Project(name='Budget', created_by=user.id, validation_rules=RULES)
+    db.session.add(project)
+    db.session.commit()
+    return project
+
+
+@pytest.fixture
+def make_workbook(tmp_path):
+    """
+    Write a workbook with Name, Amount and Total columns
+
+    Returns a function taking the file name, the number of data rows, the
+    sheet names, and cell values to set afterwards as {'Sheet!A1': value}.
+    With bad=True the amounts are negative and Data!D2 refers to itself.
+    """
+    def make(name='book.xlsx', rows=20, sheets=('Data',), bad=False, cells=None):
+        wb = openpyxl.Workbook()
+        wb.remove(wb.active)
+        for sheet_name in sheets:
+            ws = wb.create_sheet(sheet_name)
+            ws.append(['Name', 'Amount', 'Total'])
+            for row in range(2, rows + 2):
+                ws.append([f'Item {row}', -5 if bad else row * 10, f'=B{row}*2'])
+        if bad:
+            wb[sheets[0]]['D2'] = '=D2+1'
+        for coordinate, value in (cells or {}).items():
+            sheet_name, cell = coordinate.split('!')
+            wb[sheet_name][cell] = value
+        path = tmp_path / name
+        wb.save(path)
+        return str(path)
+    return make
+
+
+@pytest.fixture
+def upload(auth_client, project):
+    """Upload a workbook through the API, as a new file or a version of file_id"""
+    def upload(path, file_id=None, message='Update', client=None, filename=None):
+        with open(path, 'rb') as fh:
+            content = io.BytesIO(fh.read())
+        data = {
+            'project_id': str(project.id),
+            'commit_message': message,
+            'file': (content, filename or os.path.basename(path))
+        }
+        if file_id is not None:
+            data['file_id'] = str(file_id)
+        return (client or auth_client).post('/api/files/upload', data=data, content_type='multipart/form-data')
+    return upload
@@ -0,0 +1,43 @@
+from backend.app import db
+from backend.app.models import User
+from contextlib import contextmanager
+from sqlalchemy import event
+
+
+PASSWORD = 'password'
+
+RULES = {
+    'required_sheets': ['Data'],
+    'required_columns': {'Data': ['Name', 'Amount']},
+    'formula_sheets': ['Data'],
+    'data_validations': {'Data!B:B': {'type': 'range', 'min': 0, 'max': 100000}}
+}
+
+
+def create_user(username, role='admin'):
+    user = User(username=username, email=f'{username}@example.com', role=role)
+    user.set_password(PASSWORD)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def login(client, user):
+    response = client.post('/api/auth/login', json={'username': user.username, 'password': PASSWORD})
+    assert response.status_code == 200, response.get_json()
+    return client
+
+
+@contextmanager
+def count_statements():
+    """Collect the SQL statements run on the engine inside the block"""
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
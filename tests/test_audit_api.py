@@ -0,0 +1,95 @@
+from backend.app import db
+from backend.app.api import audit
+from backend.app.models import AuditLog, File
+from datetime import datetime, timedelta
+import csv
+import gzip
+import io
+import json
+import pytest
+
+
+@pytest.fixture
+def audit_logs(user, project):
+    """125 logs of actions a, b and c, many of them sharing a timestamp"""
+    file_obj = File(project_id=project.id, filename='ledger.xlsx')
+    db.session.add(file_obj)
+    db.session.flush()
+    start = datetime(2024, 1, 1)
+    db.session.add_all(
+        AuditLog(
+            user_id=user.id,
+            action='abc'[i % 3],
+            file_id=file_obj.id if i % 2 else None,
+            timestamp=start if i < 50 else start + timedelta(hours=i)
+        )
+        for i in range(125)
+    )
+    db.session.commit()
+    return file_obj
+
+
+def fetch_all_pages(client, limit, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        query = dict(params, limit=limit, **({'cursor': cursor} if cursor else {}))
+        body = client.get('/api/audit', query_string=query).get_json()
+        ids.extend(log['id'] for log in body['logs'])
+        pages += 1
+        cursor = body['next_cursor']
+        if cursor is None:
+            return ids, pages
+
+
+def test_keyset_pages_cover_every_log_once(auth_client, audit_logs):
+    ids, pages = fetch_all_pages(auth_client, 17, action=['a', 'b', 'c'])
+
+    expected = [
+        log_id for (log_id,) in
+        db.session.query(AuditLog.id)
+        .filter(AuditLog.action.in_(['a', 'b', 'c']))
+        .order_by(AuditLog.timestamp.desc(), AuditLog.id.desc())
+    ]
+    assert ids == expected
+    assert pages == 8
+
+
+def test_logs_are_enriched_and_filtered(auth_client, audit_logs):
+    body = auth_client.get('/api/audit', query_string={'action': 'a,b', 'file_id': audit_logs.id}).get_json()
+
+    assert body['count'] == 42
+    assert {log['action'] for log in body['logs']} == {'a', 'b'}
+    assert {(log['username'], log['filename']) for log in body['logs']} == {('alice', 'ledger.xlsx')}
+
+
+def test_malformed_parameters_are_rejected(auth_client, audit_logs):
+    assert auth_client.get('/api/audit?cursor=not-a-cursor').status_code == 400
+    assert auth_client.get('/api/audit?user_id=x').status_code == 400
+
+
+def test_csv_export_streams_every_matching_row(auth_client, audit_logs, monkeypatch):
+    monkeypatch.setattr(audit, 'EXPORT_BATCH_SIZE', 10)
+
+    response = auth_client.get('/api/audit/export', query_string={'action': 'a'}, buffered=False)
+
+    assert response.mimetype == 'text/csv'
+    chunks = [chunk.decode() for chunk in response.response]
+    assert len(chunks) == 5
+    lines = list(csv.reader(io.StringIO(''.join(chunks))))
+    assert lines[0] == ['Timestamp', 'User', 'Action', 'File', 'Project', 'Details', 'IP Address']
+    assert len(lines) == 1 + 42
+    assert {(line[1], line[2]) for line in lines[1:]} == {('alice', 'a')}
+
+
+def test_ndjson_export_can_be_gzipped(auth_client, audit_logs):
+    response = auth_client.get('/api/audit/export', query_string={'format': 'ndjson', 'gzip': 1, 'action': 'b'})
+
+    assert response.mimetype == 'application/gzip'
+    assert response.headers['Content-Disposition'].endswith('.ndjson.gz')
+    records = [json.loads(line) for line in gzip.decompress(response.data).decode().splitlines()]
+    assert len(records) == 42
+    assert records[0]['timestamp'] > records[-1]['timestamp']
+
+
+def test_unknown_export_format_is_rejected(auth_client):
+    assert auth_client.get('/api/audit/export?format=xml').status_code == 400
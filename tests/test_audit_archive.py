@@ -0,0 +1,70 @@
+from backend.app import db
+from backend.app.models import AuditLog
+from backend.app.services.audit_archive import audit_archive
+from datetime import datetime
+import gzip
+import json
+import os
+import pytest
+
+
+@pytest.fixture
+def old_logs(user):
+    """Three logs in each of January to March 2023, and one recent log"""
+    db.session.add_all(
+        AuditLog(user_id=user.id, action='old', timestamp=datetime(2023, month, day))
+        for month in (1, 2, 3)
+        for day in (5, 10, 15)
+    )
+    db.session.add(AuditLog(user_id=user.id, action='recent', timestamp=datetime.utcnow()))
+    db.session.commit()
+
+
+def test_old_months_move_to_archive_files(app, old_logs):
+    archived = audit_archive.archive(365)
+
+    assert [(month, count, os.path.basename(path)) for month, count, path in archived] == [
+        (datetime(2023, 1, 1), 3, 'audit_logs_2023_01.ndjson.gz'),
+        (datetime(2023, 2, 1), 3, 'audit_logs_2023_02.ndjson.gz'),
+        (datetime(2023, 3, 1), 3, 'audit_logs_2023_03.ndjson.gz'),
+    ]
+    assert [log.action for log in AuditLog.query] == ['recent']
+    with gzip.open(archived[0][2], 'rt') as fh:
+        records = [json.loads(line) for line in fh]
+    assert [record['timestamp'] for record in records] == [
+        '2023-01-15T00:00:00', '2023-01-10T00:00:00', '2023-01-05T00:00:00'
+    ]
+    assert records[0]['username'] == 'alice'
+
+
+def test_rearchived_month_gets_a_new_part(app, old_logs, user):
+    audit_archive.archive(365)
+    db.session.add(AuditLog(user_id=user.id, action='old', timestamp=datetime(2023, 1, 20)))
+    db.session.commit()
+
+    (archived,) = audit_archive.archive(365)
+
+    assert os.path.basename(archived[2]) == 'audit_logs_2023_01.1.ndjson.gz'
+    assert len(audit_archive.archive_files()) == 4
+
+
+def test_export_can_include_archived_rows(auth_client, old_logs):
+    audit_archive.archive(365)
+
+    response = auth_client.get('/api/audit/export', query_string={
+        'format': 'ndjson', 'include_archived': 1, 'action': 'old',
+        'start_date': '2023-02-01', 'end_date': '2023-02-28'
+    })
+
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [record['timestamp'] for record in records] == [
+        '2023-02-15T00:00:00', '2023-02-10T00:00:00', '2023-02-05T00:00:00'
+    ]
+
+
+def test_composite_indexes_are_created(app):
+    audit_archive.ensure_indexes()
+
+    names = {index['name'] for index in db.inspect(db.engine).get_indexes('audit_logs')}
+    assert 'ix_audit_logs_timestamp_id' in names
+    assert 'ix_audit_logs_timestamp' not in names
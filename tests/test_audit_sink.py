@@ -0,0 +1,50 @@
+from backend.app import db
+from backend.app.models import AuditLog
+from backend.app.services.audit_sink import audit_sink
+import pytest
+import time
+
+
+@pytest.fixture
+def buffered(app):
+    app.config.update(AUDIT_BUFFERED=True, AUDIT_FLUSH_INTERVAL=0.2)
+    yield
+    audit_sink.shutdown()
+
+
+def download_logs():
+    db.session.expire_all()
+    return AuditLog.query.filter_by(action='file_downloaded').all()
+
+
+def test_reads_are_written_in_the_background(buffered, auth_client, upload, make_workbook):
+    file_id = upload(make_workbook()).get_json()['file']['id']
+
+    for _ in range(5):
+        assert auth_client.get(f'/api/files/{file_id}/download').status_code == 200
+    assert download_logs() == []
+
+    deadline = time.monotonic() + 5
+    while len(download_logs()) < 5 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert len(download_logs()) == 5
+
+
+def test_shutdown_writes_what_is_left(buffered, app, user):
+    app.config['AUDIT_FLUSH_INTERVAL'] = 60
+    audit_sink.log_buffered(user.id, 'file_downloaded')
+
+    audit_sink.shutdown()
+
+    assert len(download_logs()) == 1
+
+
+def test_transactional_events_roll_back_with_the_change(app, user):
+    audit_sink.log(user.id, 'file_uploaded')
+    audit_sink.log_many([{'user_id': user.id, 'action': 'file_uploaded'}] * 3)
+    db.session.rollback()
+    assert AuditLog.query.filter_by(action='file_uploaded').count() == 0
+
+    audit_sink.log_many([{'user_id': user.id, 'action': 'file_uploaded'}] * 3)
+    db.session.commit()
+    assert AuditLog.query.filter_by(action='file_uploaded').count() == 3
@@ -0,0 +1,175 @@
+from backend.app import db
+from backend.app.models import Blob, Chunk, File, Version
+from backend.app.services.blob_store import blob_store
+from backend.app.services.legacy_storage import has_legacy_paths, ingest_legacy_versions
+from backend.app.services.maintenance import maintenance
+from sqlalchemy import event
+import hashlib
+import os
+import pytest
+
+
+def test_identical_content_is_stored_once(upload, make_workbook):
+    path = make_workbook()
+
+    first = upload(path, filename='first.xlsx').get_json()
+    second = upload(path, filename='second.xlsx').get_json()
+
+    assert first['file']['id'] != second['file']['id']
+    blob = Blob.query.one()
+    assert blob.ref_count == 2
+    assert Version.query.filter_by(blob_id=blob.id).count() == 2
+
+
+def test_unchanged_upload_creates_no_version(upload, make_workbook, auth_client):
+    path = make_workbook()
+    file_id = upload(path).get_json()['file']['id']
+    auth_client.post(f'/api/files/{file_id}/checkout')
+
+    response = upload(path, file_id=file_id)
+
+    assert response.status_code == 200
+    assert response.get_json()['file']['version_count'] == 1
+    assert response.get_json()['file']['is_checked_out'] is False
+
+
+def test_download_returns_stored_content(upload, make_workbook, auth_client):
+    path = make_workbook()
+    file_id = upload(path).get_json()['file']['id']
+
+    response = auth_client.get(f'/api/files/{file_id}/download')
+
+    with open(path, 'rb') as fh:
+        assert response.data == fh.read()
+
+
+def test_version_listing_loads_blobs_together(app, upload, make_workbook, auth_client):
+    file_id = upload(make_workbook()).get_json()['file']['id']
+    for rows in (5, 6, 7):
+        auth_client.post(f'/api/files/{file_id}/checkout')
+        upload(make_workbook(f'v{rows}.xlsx', rows=rows), file_id=file_id)
+
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        versions = auth_client.get(f'/api/files/{file_id}/versions').get_json()['versions']
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert [v['version_number'] for v in versions] == [4, 3, 2, 1]
+    assert len({v['content_hash'] for v in versions}) == 4
+    assert len([s for s in statements if 'FROM blobs' in s]) == 1
+
+
+def test_legacy_version_files_are_ingested(app, tmp_path):
+    engine = db.create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    legacy_path = tmp_path / 'legacy.xlsx'
+    legacy_path.write_bytes(b'legacy workbook')
+    with engine.begin() as connection:
+        connection.execute(db.text(
+            'CREATE TABLE blobs (id INTEGER PRIMARY KEY, sha256 VARCHAR(64) UNIQUE, size BIGINT, '
+            'storage_path VARCHAR(500), manifest JSON, ref_count INTEGER, created_at DATETIME)'
+        ))
+        connection.execute(db.text(
+            'CREATE TABLE versions (id INTEGER PRIMARY KEY, file_path VARCHAR(500), blob_id INTEGER)'
+        ))
+        connection.execute(db.text(
+            'INSERT INTO versions (id, file_path) VALUES (1, :path), (2, :path), (3, :missing)'
+        ), {'path': str(legacy_path), 'missing': str(tmp_path / 'gone.xlsx')})
+
+    with engine.begin() as connection:
+        assert has_legacy_paths(connection)
+        ingested, missing = ingest_legacy_versions(connection)
+
+    sha256 = hashlib.sha256(b'legacy workbook').hexdigest()
+    assert ingested == 2
+    assert missing == [(3, str(tmp_path / 'gone.xlsx'))]
+    with engine.connect() as connection:
+        assert connection.execute(db.text('SELECT sha256, ref_count, storage_path FROM blobs')).all() == [
+            (sha256, 2, blob_store.blob_path(sha256))
+        ]
+        assert connection.execute(db.text('SELECT blob_id FROM versions ORDER BY id')).scalars().all() == [1, 1, None]
+    with open(blob_store.blob_path(sha256), 'rb') as fh:
+        assert fh.read() == b'legacy workbook'
+
+
+def stored_files(root):
+    return [name for _dirpath, _dirnames, names in os.walk(root) for name in names]
+
+
+def test_versions_share_unchanged_chunks(upload, make_workbook, auth_client):
+    file_id = upload(make_workbook(sheets=('Data', 'Notes'))).get_json()['file']['id']
+    auth_client.post(f'/api/files/{file_id}/checkout')
+    changed = make_workbook('changed.xlsx', sheets=('Data', 'Notes'), cells={'Notes!A2': 'Changed'})
+    upload(changed, file_id=file_id)
+
+    first, second = Blob.query.order_by(Blob.id).all()
+    shared = {sha256 for sha256, _size in first.manifest} & {sha256 for sha256, _size in second.manifest}
+    assert first.is_chunked and second.is_chunked
+    assert shared
+    assert {chunk.sha256 for chunk in Chunk.query.filter_by(ref_count=2)} == shared
+
+    response = auth_client.get(f'/api/files/{file_id}/download')
+    with open(changed, 'rb') as fh:
+        assert response.data == fh.read()
+
+
+def test_deleting_a_project_collects_its_content(app, upload, make_workbook, auth_client, project):
+    upload(make_workbook())
+    assert stored_files(blob_store.chunk_root)
+
+    assert auth_client.delete(f'/api/projects/{project.id}').status_code == 200
+    blob_store._collector.join()
+
+    assert Blob.query.count() == 0
+    assert Chunk.query.count() == 0
+    assert stored_files(blob_store.chunk_root) == []
+
+
+def test_maintenance_collects_content_of_deleted_files(upload, make_workbook):
+    upload(make_workbook())
+    db.session.delete(File.query.one())
+    db.session.commit()
+
+    assert {'blob-gc', 'upload-sweep'} <= set(maintenance.run_due())
+
+    assert Blob.query.count() == 0
+    assert Chunk.query.count() == 0
+    assert stored_files(blob_store.chunk_root) == []
+
+
+def test_recently_used_chunks_are_kept(app, upload, make_workbook):
+    upload(make_workbook())
+    db.session.delete(File.query.one())
+    db.session.commit()
+    app.config['BLOB_GC_GRACE_PERIOD'] = 3600
+
+    assert blob_store.collect_garbage() == 1
+    assert Chunk.query.filter(Chunk.ref_count > 0).count() == 0
+    assert Chunk.query.count() > 0
+    assert stored_files(blob_store.chunk_root)
+
+    app.config['BLOB_GC_GRACE_PERIOD'] = 0
+    blob_store.collect_garbage()
+    assert Chunk.query.count() == 0
+    assert stored_files(blob_store.chunk_root) == []
+
+
+@pytest.mark.options(STORAGE_CHUNKING=False)
+def test_recently_written_blob_file_is_kept(app, upload, make_workbook):
+    upload(make_workbook())
+    db.session.delete(File.query.one())
+    db.session.commit()
+    app.config['BLOB_GC_GRACE_PERIOD'] = 3600
+
+    assert blob_store.collect_garbage() == 0
+    assert stored_files(blob_store.blob_root)
+
+    app.config['BLOB_GC_GRACE_PERIOD'] = 0
+    assert blob_store.collect_garbage() == 1
+    assert Blob.query.count() == 0
+    assert stored_files(blob_store.blob_root) == []
@@ -0,0 +1,130 @@
+from backend.app import db
+from backend.app.models import AuditLog, Blob, File, Project
+from backend.app.services import bulk_upload
+from backend.app.services.audit_sink import audit_sink
+from backend.app.services.blob_store import blob_store
+import hashlib
+import io
+import os
+import pytest
+import zipfile
+
+
+def read(path):
+    with open(path, 'rb') as fh:
+        return fh.read()
+
+
+def bulk_upload_files(client, project, **parts):
+    data = {'project_id': str(project.id), 'commit_message': 'Import'}
+    data.update(parts)
+    return client.post('/api/files/bulk-upload', data=data, content_type='multipart/form-data')
+
+
+def test_each_file_gets_its_own_outcome(auth_client, project, upload, make_workbook):
+    upload(make_workbook('existing.xlsx'))
+    files = [
+        (io.BytesIO(read(make_workbook('a.xlsx'))), 'a.xlsx'),
+        (io.BytesIO(b'notes'), 'notes.txt'),
+        (io.BytesIO(read(make_workbook('b.xlsx', bad=True))), 'b.xlsx'),
+        (io.BytesIO(read(make_workbook('existing.xlsx'))), 'existing.xlsx'),
+    ]
+
+    response = bulk_upload_files(auth_client, project, files=files)
+
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['summary'] == {'created': 3, 'skipped': 1}
+    assert [(f['filename'], f['status']) for f in body['files']] == [
+        ('a.xlsx', 'created'), ('notes.txt', 'skipped'), ('b.xlsx', 'created'), ('existing.xlsx', 'created')
+    ]
+    assert [f.get('validation_status') for f in body['files']] == ['passed', None, 'failed', 'passed']
+    assert db.session.get(File, body['files'][0]['file_id']).current_version.version_number == 1
+    # Like single uploads, a taken name gets a second file
+    assert File.query.filter_by(filename='existing.xlsx').count() == 2
+    db.session.expire_all()
+    assert db.session.get(Project, project.id).file_count == 4
+    audit_sink.flush()
+    assert AuditLog.query.filter_by(action='file_uploaded').count() == 4
+
+
+def test_archive_members_are_flattened(auth_client, project, make_workbook):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.write(make_workbook('a.xlsx'), 'q1/a.xlsx')
+        zf.write(make_workbook('b.xlsx'), 'q2/b.xlsx')
+        zf.writestr('__MACOSX/q1/._a.xlsx', b'resource fork')
+        zf.writestr('q1/.DS_Store', b'finder')
+    archive.seek(0)
+
+    response = bulk_upload_files(auth_client, project, archive=(archive, 'import.zip'))
+
+    assert response.status_code == 201
+    assert [f['filename'] for f in response.get_json()['files']] == ['a.xlsx', 'b.xlsx']
+
+
+@pytest.mark.options(BULK_UPLOAD_MAX_FILES=1)
+def test_unusable_requests_are_rejected(auth_client, project, make_workbook):
+    response = bulk_upload_files(auth_client, project, archive=(io.BytesIO(b'not a zip'), 'import.zip'))
+    assert response.get_json()['error'] == 'Archive is not a valid zip file'
+
+    files = [(io.BytesIO(read(make_workbook(name))), name) for name in ('a.xlsx', 'b.xlsx')]
+    response = bulk_upload_files(auth_client, project, files=files)
+    assert (response.status_code, response.get_json()['error']) == (400, 'A bulk upload may contain at most 1 files')
+
+    response = bulk_upload_files(auth_client, project, files=[(io.BytesIO(b'notes'), 'notes.txt')])
+    assert (response.status_code, response.get_json()['error']) == (400, 'No files were created')
+
+
+@pytest.mark.options(BULK_UPLOAD_BATCH_SIZE=1, STORAGE_CHUNKING=False)
+def test_failed_batch_leaves_earlier_batches_and_no_content(auth_client, project, make_workbook, monkeypatch):
+    log_many = audit_sink.log_many
+    calls = []
+
+    def fail_second_batch(entries):
+        calls.append(entries)
+        if len(calls) == 2:
+            raise RuntimeError('database went away')
+        return log_many(entries)
+
+    monkeypatch.setattr(bulk_upload.audit_sink, 'log_many', fail_second_batch)
+    second = read(make_workbook('b.xlsx', rows=5))
+    files = [(io.BytesIO(read(make_workbook('a.xlsx'))), 'a.xlsx'), (io.BytesIO(second), 'b.xlsx')]
+
+    body = bulk_upload_files(auth_client, project, files=files).get_json()
+
+    assert [f['status'] for f in body['files']] == ['created', 'failed']
+    assert body['files'][1]['error'] == 'Could not save file: database went away'
+    assert [f.filename for f in File.query] == ['a.xlsx']
+    assert Blob.query.filter(Blob.ref_count > 0).count() == 1
+    assert not os.path.exists(blob_store.blob_path(hashlib.sha256(second).hexdigest()))
+
+
+@pytest.mark.options(MAX_FILE_SIZE=1000)
+def test_oversized_file_fails_alone(auth_client, project, make_workbook):
+    files = [(io.BytesIO(b'x' * 10), 'small.xlsx'), (io.BytesIO(read(make_workbook())), 'big.xlsx')]
+
+    body = bulk_upload_files(auth_client, project, files=files).get_json()
+
+    assert [f['status'] for f in body['files']] == ['created', 'failed']
+
+
+def test_failed_store_does_not_poison_later_entries(auth_client, project, make_workbook, monkeypatch):
+    store = blob_store.store
+    calls = []
+
+    def fail_first_flush(spooled):
+        calls.append(spooled)
+        if len(calls) == 1:
+            db.session.add(Blob(sha256=None, size=0))
+            db.session.flush()
+        return store(spooled)
+
+    monkeypatch.setattr(bulk_upload.blob_store, 'store', fail_first_flush)
+    files = [(io.BytesIO(read(make_workbook(name, rows=len(name)))), name) for name in ('a.xlsx', 'bb.xlsx')]
+
+    body = bulk_upload_files(auth_client, project, files=files).get_json()
+
+    assert [f['status'] for f in body['files']] == ['failed', 'created']
+    assert body['files'][0]['error'].startswith('Could not store file:')
+    assert [f.filename for f in File.query] == ['bb.xlsx']
@@ -0,0 +1,63 @@
+from backend.app import db
+from backend.app.models import File
+from backend.app.services import cell_snapshot
+from backend.app.services.cell_snapshot import SNAPSHOT_FORMAT, Snapshot, extract_snapshot, snapshot_store
+from backend.app.services.excel_validator import ExcelValidator
+from datetime import datetime
+from tests.helpers import RULES
+import json
+import os
+
+
+def test_snapshot_validates_like_the_workbook(make_workbook, tmp_path, monkeypatch):
+    monkeypatch.setattr(cell_snapshot, 'WRITE_BLOCK_CELLS', 7)
+    path = make_workbook(sheets=('Data', 'Calc'), cells={
+        'Data!B4': -3, 'Data!E2': '=#REF!', 'Data!F2': True, 'Calc!A3': 'x', 'Data!G9': datetime(2024, 5, 1)
+    })
+    rules = dict(RULES, formula_sheets=['Data', 'Calc'])
+    (tmp_path / 'snap').mkdir()
+    extract_snapshot(path, str(tmp_path / 'snap'))
+
+    snapshot = Snapshot(str(tmp_path / 'snap'))
+
+    assert snapshot.sheetnames == ['Data', 'Calc']
+    assert ExcelValidator().validate(snapshot, rules) == ExcelValidator().validate(path, rules)
+    rows = list(snapshot['Data'].iter_rows(min_row=1, max_row=4, max_col=6))
+    assert rows[0] == ('Name', 'Amount', 'Total')
+    assert rows[1] == ('Item 2', 20, '=B2*2', None, '=#REF!', True)
+    assert rows[3][1] == -3
+    assert list(snapshot['Data'].iter_rows(min_row=9, max_row=9))[0][6] == '2024-05-01T00:00:00'
+
+
+def test_preview_reads_a_block_of_cells(auth_client, upload, make_workbook):
+    file_id = upload(make_workbook(sheets=('Data', 'Calc'))).get_json()['file']['id']
+
+    body = auth_client.get(f'/api/files/{file_id}/preview?sheet=Data&start=2&rows=2&cols=4').get_json()
+
+    assert body['sheets'] == ['Data', 'Calc']
+    assert (body['max_row'], body['max_col']) == (21, 3)
+    assert body['rows'] == [['Item 2', 20, '=B2*2', None], ['Item 3', 30, '=B3*2', None]]
+    assert auth_client.get(f'/api/files/{file_id}/preview?sheet=Missing').status_code == 404
+
+
+def test_snapshot_in_another_format_is_replaced(auth_client, upload, make_workbook):
+    file_id = upload(make_workbook()).get_json()['file']['id']
+    blob = db.session.get(File, file_id).current_version.blob
+    snapshot = snapshot_store.ensure(blob)
+    manifest_path = os.path.join(snapshot.path, 'manifest.json')
+    with open(manifest_path) as fh:
+        manifest = json.load(fh)
+    with open(manifest_path, 'w') as fh:
+        json.dump(dict(manifest, format=SNAPSHOT_FORMAT - 1), fh)
+
+    assert snapshot_store.get(blob) is None
+    assert snapshot_store.ensure(blob).format == SNAPSHOT_FORMAT
+    assert snapshot_store.get(blob) is not None
+
+
+def test_snapshots_can_be_disabled(app, auth_client, upload, make_workbook):
+    file_id = upload(make_workbook()).get_json()['file']['id']
+    app.config['SNAPSHOTS_ENABLED'] = False
+
+    assert snapshot_store.get(db.session.get(File, file_id).current_version.blob) is None
+    assert auth_client.get(f'/api/files/{file_id}/preview').status_code == 404
@@ -0,0 +1,120 @@
+from backend.app import db
+from backend.app.models import AuditLog, File
+from backend.app.services.audit_sink import audit_sink
+from backend.app.services.checkout_locks import checkout_locks
+from backend.app.services.maintenance import maintenance
+from datetime import datetime, timedelta
+from tests.helpers import create_user
+import pytest
+
+
+@pytest.fixture
+def file_ids(upload, make_workbook):
+    return [upload(make_workbook(f'{name}.xlsx')).get_json()['file']['id'] for name in ('a', 'b', 'c')]
+
+
+def expire(file_id):
+    db.session.execute(
+        db.update(File).where(File.id == file_id).values(lease_expires_at=datetime.utcnow() - timedelta(minutes=1))
+    )
+    db.session.commit()
+
+
+def test_only_one_user_gets_a_checkout(auth_client, other_client, user, file_ids):
+    response = auth_client.post(f'/api/files/{file_ids[0]}/checkout')
+    assert response.status_code == 200
+    lease = response.get_json()['file']
+
+    response = other_client.post(f'/api/files/{file_ids[0]}/checkout')
+    assert (response.status_code, response.get_json()['error']) == (400, 'File is already checked out')
+    assert other_client.post(f'/api/files/{file_ids[0]}/checkin').status_code == 403
+
+    file_obj = db.session.get(File, file_ids[0])
+    assert (file_obj.checked_out_by, file_obj.is_checked_out) == (user.id, True)
+    assert lease['is_checked_out'] is True
+
+
+def test_expired_lease_is_taken_over(app, user, file_ids):
+    bob = create_user('bob')
+    assert [f.id for f in checkout_locks.acquire(file_ids[:1], user.id)] == file_ids[:1]
+    assert checkout_locks.acquire(file_ids[:1], bob.id) == []
+    db.session.commit()
+    expire(file_ids[0])
+
+    assert db.session.get(File, file_ids[0]).is_checked_out is False
+    (file_obj,) = checkout_locks.acquire(file_ids[:1], bob.id)
+    assert file_obj.checked_out_by == bob.id
+    assert file_obj.lease_expires_at > datetime.utcnow()
+
+
+def test_only_a_live_lease_can_be_renewed(auth_client, other_client, file_ids):
+    url = f'/api/files/{file_ids[0]}/checkout'
+    auth_client.post(url)
+    before = db.session.get(File, file_ids[0]).lease_expires_at
+
+    assert other_client.post(f'{url}/renew').status_code == 403
+    response = auth_client.post(f'{url}/renew')
+    assert response.status_code == 200
+    db.session.expire_all()
+    assert db.session.get(File, file_ids[0]).lease_expires_at > before
+
+    expire(file_ids[0])
+    assert auth_client.post(f'{url}/renew').status_code == 403
+
+
+def test_upload_needs_a_live_lease(auth_client, upload, make_workbook, file_ids):
+    changed = make_workbook('changed.xlsx', rows=5)
+    assert upload(changed, file_id=file_ids[0]).status_code == 403
+
+    auth_client.post(f'/api/files/{file_ids[0]}/checkout')
+    expire(file_ids[0])
+    assert upload(changed, file_id=file_ids[0]).status_code == 403
+
+    auth_client.post(f'/api/files/{file_ids[0]}/checkout')
+    assert upload(changed, file_id=file_ids[0]).status_code == 201
+
+
+def test_bulk_requests_report_failed_files(auth_client, other_client, file_ids):
+    other_client.post(f'/api/files/{file_ids[1]}/checkout')
+
+    body = auth_client.post('/api/files/checkout', json={'file_ids': file_ids + [999]}).get_json()
+    assert ([f['id'] for f in body['files']], body['failed']) == ([file_ids[0], file_ids[2]], [file_ids[1], 999])
+
+    body = auth_client.post('/api/files/checkout/renew', json={'file_ids': file_ids}).get_json()
+    assert body['failed'] == [file_ids[1]]
+
+    body = auth_client.post('/api/files/checkin', json={'file_ids': file_ids}).get_json()
+    assert ([f['id'] for f in body['files']], body['failed']) == ([file_ids[0], file_ids[2]], [file_ids[1]])
+    assert [f.checked_out_by is None for f in File.query.order_by(File.id)] == [True, False, True]
+
+    assert auth_client.post('/api/files/checkout', json={'file_ids': []}).status_code == 400
+    assert auth_client.post('/api/files/checkout', json={'file_ids': ['1']}).status_code == 400
+
+
+def test_sweep_checks_in_expired_leases(app, user, file_ids):
+    checkout_locks.acquire(file_ids, user.id)
+    db.session.commit()
+    expire(file_ids[0])
+    expire(file_ids[2])
+
+    assert checkout_locks.sweep_expired() == 2
+
+    db.session.expire_all()
+    assert [f.checked_out_by for f in File.query.order_by(File.id)] == [None, user.id, None]
+    audit_sink.flush()
+    assert sorted(log.file_id for log in AuditLog.query.filter_by(action='checkout_expired')) == [
+        file_ids[0], file_ids[2]
+    ]
+    assert checkout_locks.sweep_expired() == 0
+
+
+def test_maintenance_sweeps_idle_leases(auth_client, file_ids):
+    url = f'/api/files/{file_ids[0]}'
+    auth_client.post(f'{url}/checkout')
+    assert auth_client.get(url).get_json()['file']['is_checked_out'] is True
+    expire(file_ids[0])
+
+    assert 'checkout-sweep' in maintenance.run_due()
+
+    assert auth_client.get(url).get_json()['file']['is_checked_out'] is False
+    assert maintenance.run_due() == []
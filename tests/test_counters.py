@@ -0,0 +1,74 @@
+from backend.app import db
+from backend.app.models import File, Project, Version
+from sqlalchemy.exc import IntegrityError
+import pytest
+
+
+@pytest.fixture
+def file_obj(upload, make_workbook):
+    """A file with one uploaded version"""
+    return db.session.get(File, upload(make_workbook()).get_json()['file']['id'])
+
+
+def add_version(file_obj, user, number):
+    db.session.add(Version(
+        file_id=file_obj.id,
+        version_number=number,
+        blob_id=file_obj.current_version.blob_id,
+        commit_message='Update',
+        uploaded_by=user.id
+    ))
+
+
+def test_version_numbers_are_allocated_in_sequence(file_obj, user):
+    numbers = []
+    for _ in range(3):
+        number = file_obj.allocate_version_number()
+        add_version(file_obj, user, number)
+        numbers.append(number)
+    db.session.commit()
+
+    assert numbers == [2, 3, 4]
+    assert (file_obj.version_count, file_obj.latest_version_number) == (4, 4)
+    assert sorted(v.version_number for v in file_obj.versions) == [1, 2, 3, 4]
+
+
+def test_duplicate_version_number_is_rejected(file_obj, user):
+    add_version(file_obj, user, 1)
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+
+
+def test_uploads_count_versions(auth_client, upload, make_workbook):
+    file_id = upload(make_workbook()).get_json()['file']['id']
+    for rows in (5, 6):
+        auth_client.post(f'/api/files/{file_id}/checkout')
+        body = upload(make_workbook(f'v{rows}.xlsx', rows=rows), file_id=file_id).get_json()
+
+    assert db.session.get(Version, body['validation']['version_id']).version_number == 3
+    assert (body['file']['version_count'], body['file']['latest_version_number']) == (3, 3)
+
+
+def test_project_file_count_follows_inserts_and_deletes(auth_client, project):
+    db.session.add_all(File(project_id=project.id, filename=f'f{i}.xlsx') for i in range(4))
+    db.session.commit()
+    updated_at = project.updated_at
+    db.session.refresh(project)
+    assert project.file_count == 4
+    assert project.updated_at == updated_at
+
+    db.session.delete(File.query.filter_by(filename='f0.xlsx').one())
+    db.session.commit()
+    db.session.refresh(project)
+    assert project.file_count == 3
+
+    # Files removed with their project leave other projects' counts alone
+    other = Project(name='Other', created_by=project.created_by)
+    db.session.add(other)
+    db.session.flush()
+    db.session.add(File(project_id=other.id, filename='kept.xlsx'))
+    db.session.commit()
+    assert auth_client.delete(f'/api/projects/{project.id}').status_code == 200
+    db.session.expire_all()
+    assert db.session.get(Project, other.id).file_count == 1
@@ -0,0 +1,80 @@
+from backend.app.models import AuditLog
+from backend.app.services.audit_sink import audit_sink
+import hashlib
+import pytest
+
+
+@pytest.fixture
+def stored(upload, make_workbook):
+    """Upload a workbook and return its file id and bytes"""
+    path = make_workbook()
+    response = upload(path)
+    with open(path, 'rb') as fh:
+        return response.get_json()['file']['id'], fh.read()
+
+
+def test_download_revalidates_by_etag(auth_client, stored):
+    file_id, content = stored
+
+    response = auth_client.get(f'/api/files/{file_id}/download')
+    assert response.data == content
+    assert response.get_etag() == (hashlib.sha256(content).hexdigest(), False)
+    assert response.headers['Accept-Ranges'] == 'bytes'
+
+    response = auth_client.get(f'/api/files/{file_id}/download', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_byte_ranges_are_served(auth_client, stored):
+    file_id, content = stored
+    url = f'/api/files/{file_id}/download'
+
+    response = auth_client.get(url, headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 100-199/{len(content)}'
+    assert response.data == content[100:200]
+
+    response = auth_client.get(url, headers={'Range': 'bytes=-50'})
+    assert response.status_code == 206
+    assert response.data == content[-50:]
+
+    response = auth_client.get(url, headers={'Range': f'bytes={len(content)}-'})
+    assert response.status_code == 416
+
+
+def test_if_range_falls_back_to_full_content_when_stale(auth_client, stored):
+    file_id, content = stored
+    url = f'/api/files/{file_id}/download'
+    etag = auth_client.get(url).headers['ETag']
+
+    response = auth_client.get(url, headers={'Range': 'bytes=0-9', 'If-Range': etag})
+    assert response.status_code == 206
+    assert response.data == content[:10]
+
+    response = auth_client.get(url, headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+    assert response.status_code == 200
+    assert response.data == content
+
+
+def test_resumed_download_is_audited_once(app, auth_client, stored):
+    file_id, content = stored
+    url = f'/api/files/{file_id}/download'
+
+    auth_client.get(url, headers={'Range': 'bytes=0-99'})
+    auth_client.get(url, headers={'Range': 'bytes=100-'})
+    audit_sink.flush()
+
+    assert AuditLog.query.filter_by(action='file_downloaded').count() == 1
+
+
+@pytest.mark.options(DOWNLOAD_OFFLOAD='x-accel-redirect', STORAGE_CHUNKING=False)
+def test_whole_file_blobs_can_be_offloaded(auth_client, stored):
+    file_id, _ = stored
+
+    response = auth_client.get(f'/api/files/{file_id}/download')
+
+    assert response.status_code == 200
+    assert response.headers['X-Accel-Redirect'].startswith('/_storage/')
+    assert response.data == b''
+    assert 'ETag' in response.headers
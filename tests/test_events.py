@@ -0,0 +1,124 @@
+from backend.app import db
+from backend.app.models import File
+from backend.app.services.event_hub import Subscriber, event_hub
+import json
+import pytest
+
+
+def parse(chunk):
+    """Split one server-sent event into its fields"""
+    fields = dict(line.split(': ', 1) for line in chunk.decode().strip().splitlines())
+    return fields['event'], json.loads(fields['data'])
+
+
+@pytest.fixture
+def file_id(upload, make_workbook):
+    return upload(make_workbook()).get_json()['file']['id']
+
+
+@pytest.mark.options(EVENT_STREAM_HEARTBEAT=1)
+def test_stream_delivers_committed_checkouts(auth_client, other_client, user, file_id):
+    response = other_client.get(f'/api/events?file_id={file_id}', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    assert next(chunks) == b'retry: 3000\n\n'
+
+    auth_client.post(f'/api/files/{file_id}/checkout')
+    event_type, data = parse(next(chunks))
+
+    assert event_type == 'file_checked_out'
+    assert (data['file_id'], data['file']['checked_out_by_id']) == (file_id, user.id)
+    assert event_hub.client_count() == 1
+    response.close()
+    assert event_hub.client_count() == 0
+
+
+def test_events_wait_for_commit(project):
+    subscriber = event_hub.subscribe()
+    try:
+        project.description = 'Rolled back'
+        db.session.flush()
+        event_hub.publish('version_created', project_id=project.id, file_id=1)
+        db.session.rollback()
+        project.description = 'Committed'
+        db.session.flush()
+        event_hub.publish('version_created', project_id=project.id, file_id=2)
+        assert subscriber.queue.empty()
+
+        db.session.commit()
+        assert subscriber.queue.get_nowait()['file_id'] == 2
+        assert subscriber.queue.empty()
+    finally:
+        event_hub.unsubscribe(subscriber)
+
+
+def test_file_state_is_loaded_on_delivery(app, file_id):
+    subscriber = event_hub.subscribe()
+    file_obj = db.session.get(File, file_id)
+    file_obj.filename = 'renamed.xlsx'
+    db.session.flush()
+    event_hub.publish_file('version_created', file_obj, version_number=2, validation_status='pending')
+    db.session.commit()
+
+    published = subscriber.queue.queue[0]
+    assert set(published) == {'id', 'type', 'project_id', 'file_id', 'version_number', 'validation_status'}
+
+    chunks = event_hub.stream(subscriber)
+    next(chunks)
+    event_type, data = parse(next(chunks).encode())
+    chunks.close()
+
+    assert event_type == 'version_created'
+    assert (data['file']['filename'], data['version_number']) == ('renamed.xlsx', 2)
+
+
+def test_oversized_events_become_resync(project):
+    subscriber = event_hub.subscribe()
+    try:
+        project.description = 'Changed'
+        db.session.flush()
+        event_hub.publish('version_created', project_id=project.id, file_id=1, notes='x' * 9000)
+        db.session.commit()
+
+        event_data = subscriber.queue.get_nowait()
+        assert {key: event_data[key] for key in ('type', 'project_id', 'file_id')} == {
+            'type': 'resync', 'project_id': project.id, 'file_id': 1
+        }
+        assert 'notes' not in event_data
+    finally:
+        event_hub.unsubscribe(subscriber)
+
+
+def test_subscribers_filter_by_file_or_project():
+    event_data = {'project_id': 1, 'file_id': 2}
+
+    assert Subscriber().wants(event_data)
+    assert Subscriber(project_id=1).wants(event_data)
+    assert not Subscriber(project_id=3).wants(event_data)
+    assert not Subscriber(project_id=1, file_id=3).wants(event_data)
+
+
+@pytest.mark.options(EVENT_QUEUE_SIZE=1)
+def test_client_that_falls_behind_is_told_to_resync(app):
+    subscriber = event_hub.subscribe()
+    event_hub.dispatch({'type': 'version_created', 'file_id': 1})
+    event_hub.dispatch({'type': 'version_created', 'file_id': 1})
+
+    assert list(event_hub.stream(subscriber))[-1] == 'event: resync\ndata: {}\n\n'
+    assert event_hub.client_count() == 0
+
+
+@pytest.mark.options(EVENT_STREAM_MAX_CLIENTS=0)
+def test_streams_beyond_the_limit_are_refused(auth_client, file_id):
+    response = auth_client.get(f'/api/events?file_id={file_id}')
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '30'
+    assert auth_client.get('/api/events?file_id=999').status_code == 404
+
+
+def test_file_page_opens_a_stream(auth_client, file_id):
+    page = auth_client.get(f'/files/{file_id}').get_data(as_text=True)
+
+    assert 'const EVENT_STREAM_URL = "/api/events";' in page
+    assert 'file.checked_out_by_id === currentUserId' in page
@@ -0,0 +1,60 @@
+from backend.app.services.excel_validator import ExcelValidator
+from tests.helpers import RULES
+
+
+def test_valid_workbook_passes(make_workbook):
+    result = ExcelValidator().validate(make_workbook(), RULES)
+
+    assert result == {'passed': True, 'errors': []}
+
+
+def test_reports_every_rule_in_one_pass(make_workbook):
+    path = make_workbook(sheets=('Data', 'Notes'), cells={'Data!E3': '=#REF!+1', 'Data!B5': 'n/a'})
+    rules = dict(RULES, required_sheets=['Data', 'Summary'], required_columns={'Data': ['Name', 'Owner']})
+
+    errors = ExcelValidator().validate(path, rules)['errors']
+
+    assert errors == [
+        'Missing required sheet: Summary',
+        "Missing required column 'Owner' in sheet 'Data'",
+        'Broken formula in Data!E3: =#REF!+1',
+    ]
+
+
+def test_range_rule_reports_values_outside_bounds(make_workbook):
+    path = make_workbook(rows=3, cells={'Data!B3': -1, 'Data!B4': 200000})
+
+    errors = ExcelValidator().validate(path, RULES)['errors']
+
+    assert errors == [
+        'Value -1 in Data!B3 is below minimum 0',
+        'Value 200000 in Data!B4 is above maximum 100000',
+    ]
+
+
+def test_unreadable_file_fails(tmp_path):
+    path = tmp_path / 'broken.xlsx'
+    path.write_bytes(b'not a workbook')
+
+    result = ExcelValidator().validate(str(path), RULES)
+
+    assert result['passed'] is False
+    assert result['errors'][0].startswith('Failed to open Excel file')
+
+
+def test_parallel_scan_matches_serial(make_workbook):
+    path = make_workbook(
+        sheets=('Data', 'East', 'West'),
+        cells={'East!E2': '=#REF!', 'West!A3': '=West!A3', 'Data!B4': -3}
+    )
+    rules = dict(RULES, formula_sheets=['Data', 'East', 'West'])
+
+    serial = ExcelValidator().validate(path, rules)
+    parallel = ExcelValidator(pool_size=2).validate(path, rules)
+
+    assert parallel == serial
+    assert serial['errors'] == [
+        'Broken formula in East!E2: =#REF!',
+        'Value -3 in Data!B4 is below minimum 0',
+        'Circular reference in West!A3',
+    ]
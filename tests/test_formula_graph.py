@@ -0,0 +1,39 @@
+from backend.app.services.formula_graph import FormulaGraph, parse_references
+from openpyxl.utils.cell import coordinate_to_tuple
+import pytest
+
+
+@pytest.mark.parametrize('formula, refs', [
+    ('=A1+$B$2', [('Data', 1, 1, 1, 1), ('Data', 2, 2, 2, 2)]),
+    ('=SUM(B2:C4)', [('Data', 2, 4, 2, 3)]),
+    ('=SUM(A:A)+SUM(3:5)', [('Data', None, None, 1, 1), ('Data', 3, 5, None, None)]),
+    ("='My Sheet'!A1+Other!B2", [('My Sheet', 1, 1, 1, 1), ('Other', 2, 2, 2, 2)]),
+    ('=LOG10(2)+"A1"', []),
+    ('=[1]Data!A1+B2', [('Data', 2, 2, 2, 2)]),
+    ("='[Book 1.xlsx]My Data'!A1:B3+[Book.xlsx]Data!$C$1", []),
+])
+def test_parse_references(formula, refs):
+    assert parse_references(formula, 'Data') == refs
+
+
+def cycles(formulas):
+    graph = FormulaGraph()
+    for coordinate, formula in formulas.items():
+        sheet, cell = coordinate.split('!')
+        graph.add_formula(sheet, *coordinate_to_tuple(cell), formula)
+    return [[graph.coordinate(node) for node in cycle] for cycle in graph.find_cycles()]
+
+
+def test_finds_cycles_across_sheets_and_ranges():
+    found = cycles({
+        'Data!A1': '=Calc!B1+1',
+        'Calc!B1': '=SUM(Data!A1:A3)',
+        'Data!C1': '=C1',
+        'Data!D1': '=A1',
+    })
+
+    assert found == [['Data!A1', 'Calc!B1'], ['Data!C1']]
+
+
+def test_similar_coordinates_are_not_cycles():
+    assert cycles({'Data!A1': '=AA1+A10', 'Data!B2': '=[1]Data!B2'}) == []
@@ -0,0 +1,93 @@
+from backend.app import db
+from backend.app.models import File, Project
+from backend.app.utils.pagination import CursorError, decode_cursor, encode_cursor
+from datetime import datetime
+import pytest
+
+
+@pytest.fixture
+def projects(user):
+    """Twelve projects whose file counts and creation times repeat"""
+    projects = [
+        Project(name=f'Project {i:02d}', created_by=user.id, file_count=i % 3, created_at=datetime(2024, 1, 1 + i % 2))
+        for i in range(12)
+    ]
+    db.session.add_all(projects)
+    db.session.commit()
+    return projects
+
+
+def walk(client, url, key, **params):
+    """Follow next_cursor to the end, returning every row and the page count"""
+    rows, cursor, pages = [], None, 0
+    while True:
+        query = dict(params, **({'cursor': cursor} if cursor else {}))
+        body = client.get(url, query_string=query).get_json()
+        assert body['count'] == len(body[key])
+        rows.extend(body[key])
+        pages += 1
+        cursor = body['next_cursor']
+        if cursor is None:
+            return rows, pages
+
+
+@pytest.mark.parametrize('sort, key', [
+    ('file_count', lambda p: (p.file_count, p.id)),
+    ('-file_count', lambda p: (-p.file_count, -p.id)),
+    ('-created_at', lambda p: (-p.created_at.toordinal(), -p.id)),
+    ('name', lambda p: (p.name, p.id)),
+])
+def test_project_pages_cover_every_project_once(auth_client, projects, sort, key):
+    rows, pages = walk(auth_client, '/api/projects', 'projects', sort=sort, limit=5)
+
+    assert [row['id'] for row in rows] == [p.id for p in sorted(projects, key=key)]
+    assert pages == 3
+
+
+def test_fields_select_what_is_returned(auth_client, projects):
+    body = auth_client.get('/api/projects?fields=id,name&limit=2&sort=name').get_json()
+
+    assert body['projects'] == [{'id': projects[0].id, 'name': 'Project 00'}, {'id': projects[1].id, 'name': 'Project 01'}]
+
+
+def test_file_pages_break_ties_by_id(auth_client, project):
+    same_time = datetime(2024, 3, 1)
+    files = [File(project_id=project.id, filename=f'f{i}.xlsx', created_at=same_time) for i in range(7)]
+    db.session.add_all(files)
+    db.session.commit()
+
+    rows, pages = walk(
+        auth_client, f'/api/projects/{project.id}/files', 'files', sort='-created_at', limit=3, fields='id'
+    )
+
+    assert rows == [{'id': f.id} for f in reversed(files)]
+    assert pages == 3
+
+
+@pytest.mark.parametrize('query', ['sort=owner', 'sort=-', 'fields=id,secret', 'cursor=not-a-cursor', 'limit=2&cursor=WzFd'])
+def test_bad_parameters_are_rejected(auth_client, projects, query):
+    assert auth_client.get(f'/api/projects?{query}').status_code == 400
+
+
+@pytest.mark.parametrize('sort, value, row_id', [
+    ('name', ['Project 00'], 1),
+    ('name', {'$gt': ''}, 1),
+    ('name', 3, 1),
+    ('name', 'Project 00', '1'),
+    ('file_count', 'many', 1),
+    ('file_count', True, 1),
+    ('-created_at', 20240101, 1),
+    ('-created_at', 'yesterday', 1),
+])
+def test_mistyped_cursor_values_are_rejected(auth_client, projects, sort, value, row_id):
+    response = auth_client.get('/api/projects', query_string={'sort': sort, 'cursor': encode_cursor(value, row_id)})
+
+    assert (response.status_code, response.get_json()['error']) == (400, 'Invalid cursor')
+
+
+def test_cursors_round_trip():
+    cursor = encode_cursor(datetime(2024, 1, 2, 3, 4), 7)
+
+    assert decode_cursor(cursor, 2) == ['2024-01-02T03:04:00', 7]
+    with pytest.raises(CursorError):
+        decode_cursor(cursor, 3)
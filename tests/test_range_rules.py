@@ -0,0 +1,63 @@
+from backend.app.services.cell_snapshot import Snapshot, extract_snapshot
+from backend.app.services.excel_validator import ExcelValidator
+from tests.helpers import RULES
+import pytest
+
+
+RANGE_RULES = dict(RULES, data_validations={
+    'Data!B3:B6': {'type': 'range', 'min': 45},
+    'Data!4:5': {'type': 'range', 'max': 40},
+    'Data!C:D': {'type': 'range', 'min': 0, 'max': 1},
+})
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    """Extract a workbook's snapshot and load it"""
+    def snapshot(path):
+        (tmp_path / 'snap').mkdir()
+        extract_snapshot(path, str(tmp_path / 'snap'))
+        return Snapshot(str(tmp_path / 'snap'))
+    return snapshot
+
+
+def test_rules_only_cover_their_rows_and_columns(make_workbook):
+    path = make_workbook(rows=6, cells={'Data!C4': 7, 'Data!D9': 0.5, 'Data!E4': 99})
+
+    errors = ExcelValidator().validate(path, RANGE_RULES)['errors']
+
+    assert errors == [
+        'Value 30 in Data!B3 is below minimum 45',
+        'Value 40 in Data!B4 is below minimum 45',
+        'Value 99 in Data!E4 is above maximum 40',
+        'Value 50 in Data!B5 is above maximum 40',
+        'Value 7 in Data!C4 is above maximum 1',
+    ]
+
+
+def test_blocks_give_the_same_errors_as_one_pass(make_workbook, snapshot):
+    path = make_workbook(rows=40, cells={'Data!C4': 7, 'Data!D9': 0.5, 'Data!E4': 99})
+    blocked = ExcelValidator()
+    blocked.RANGE_BLOCK_SIZE = 3
+
+    expected = ExcelValidator().validate(path, RANGE_RULES)
+
+    assert blocked.validate(path, RANGE_RULES) == expected
+    assert blocked.validate(snapshot(path), RANGE_RULES) == expected
+
+
+def test_values_past_the_limit_are_summarized(make_workbook, snapshot):
+    path = make_workbook(bad=True, cells={'Data!B21': 200000})
+    validator = ExcelValidator()
+    validator.MAX_RANGE_ERRORS = 2
+    validator.RANGE_BLOCK_SIZE = 4
+
+    errors = validator.validate(path, RULES)['errors']
+
+    assert errors == [
+        'Value -5 in Data!B2 is below minimum 0',
+        'Value -5 in Data!B3 is below minimum 0',
+        '18 more values out of range in Data!B:B (20 in total: 19 below minimum 0, 1 above maximum 100000)',
+        'Circular reference in Data!D2',
+    ]
+    assert validator.validate(snapshot(path), RULES)['errors'] == errors
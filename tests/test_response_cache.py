@@ -0,0 +1,74 @@
+from backend.app.services.response_cache import response_cache
+from tests.helpers import create_user, login
+import pytest
+
+
+def stats(client):
+    return client.get('/api/files/response-cache/stats').get_json()['stats']
+
+
+def test_repeated_get_is_served_from_cache(auth_client, project):
+    url = f'/api/projects/{project.id}'
+    before = stats(auth_client)
+
+    first = auth_client.get(url)
+    second = auth_client.get(url)
+
+    after = stats(auth_client)
+    assert second.data == first.data
+    assert (after['misses'] - before['misses'], after['hits'] - before['hits']) == (1, 1)
+    assert first.headers['ETag'] == second.headers['ETag']
+    assert 'private' in first.headers['Cache-Control']
+
+    response = auth_client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 304
+    assert stats(auth_client)['not_modified'] == after['not_modified'] + 1
+
+
+def test_writes_invalidate_cached_responses(auth_client, project, upload, make_workbook):
+    url = f'/api/projects/{project.id}'
+    etag = auth_client.get(url).headers['ETag']
+    assert auth_client.get('/api/projects').get_json()['projects'][0]['name'] == 'Budget'
+
+    auth_client.put(url, json={'name': 'Forecast'})
+    assert auth_client.get(url).get_json()['project']['name'] == 'Forecast'
+    assert auth_client.get('/api/projects').get_json()['projects'][0]['name'] == 'Forecast'
+
+    upload(make_workbook())
+    response = auth_client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert [f['filename'] for f in response.get_json()['project']['files']] == ['book.xlsx']
+
+
+def test_per_user_views_are_not_shared(auth_client, other_client, upload, make_workbook):
+    file_id = upload(make_workbook()).get_json()['file']['id']
+    auth_client.post(f'/api/files/{file_id}/checkout')
+
+    mine = auth_client.get(f'/api/files/{file_id}').get_json()['file']
+    theirs = other_client.get(f'/api/files/{file_id}').get_json()['file']
+
+    assert (mine['is_checked_out_by_me'], theirs['is_checked_out_by_me']) == (True, False)
+
+    auth_client.post(f'/api/files/{file_id}/checkin')
+    assert other_client.get(f'/api/files/{file_id}').get_json()['file']['is_checked_out'] is False
+
+
+@pytest.mark.options(RESPONSE_CACHE_SHARED=True)
+def test_shared_tier_serves_other_workers(auth_client, project):
+    url = f'/api/projects/{project.id}'
+    first = auth_client.get(url)
+    # Another worker starts with an empty local tier
+    response_cache.clear()
+    before = stats(auth_client)
+
+    second = auth_client.get(url)
+
+    assert second.data == first.data
+    assert stats(auth_client)['shared_hits'] == before['shared_hits'] + 1
+
+
+def test_stats_are_admin_only(app, auth_client):
+    viewer = login(app.test_client(), create_user('carol', role='viewer'))
+
+    assert viewer.get('/api/files/response-cache/stats').status_code == 403
+    assert stats(auth_client)['shared'] is False
@@ -0,0 +1,61 @@
+from backend.app import db
+from backend.app.models import SearchTerm
+from backend.app.services.search_index import search_index, tokenize
+import pytest
+
+
+@pytest.fixture
+def indexed(upload, make_workbook):
+    """Two files, told apart by filename, sheets and commit message"""
+    return {
+        'budget': upload(
+            make_workbook('quarterly_budget.xlsx', sheets=('Data', 'Forecast')), message='Initial budget import'
+        ).get_json()['file']['id'],
+        'roster': upload(
+            make_workbook('staff_roster.xlsx'), message='Add forecast notes'
+        ).get_json()['file']['id'],
+    }
+
+
+def search(client, **params):
+    return client.get('/api/search', query_string=params).get_json()
+
+
+def test_tokenize_splits_words():
+    assert tokenize('Q3_Budget-final v2.xlsx') == ['q3', 'budget', 'final', 'v2', 'xlsx']
+
+
+def test_results_are_ranked_by_field(auth_client, indexed):
+    body = search(auth_client, q='forecast')
+
+    assert [result['file']['id'] for result in body['results']] == [indexed['budget'], indexed['roster']]
+    assert [result['matched_fields'] for result in body['results']] == [['sheet'], ['commit_message']]
+    assert body['results'][0]['project']['name'] == 'Budget'
+
+
+def test_every_term_must_match_and_the_last_as_a_prefix(auth_client, indexed):
+    assert [r['file']['id'] for r in search(auth_client, q='quarterly bud')['results']] == [indexed['budget']]
+    assert search(auth_client, q='quarterly roster')['results'] == []
+    assert [r['file']['id'] for r in search(auth_client, q='amou')['results']] == [indexed['budget'], indexed['roster']]
+
+
+def test_results_are_paged(auth_client, indexed):
+    first = search(auth_client, q='xlsx', per_page=1)
+    second = search(auth_client, q='xlsx', per_page=1, page=2)
+
+    assert first['has_more'] is True
+    assert second['has_more'] is False
+    assert {first['results'][0]['file']['id'], second['results'][0]['file']['id']} == set(indexed.values())
+
+
+def test_missing_query_is_rejected(auth_client):
+    assert auth_client.get('/api/search?q=%20').status_code == 400
+
+
+def test_rebuild_restores_the_index(auth_client, indexed):
+    db.session.execute(db.delete(SearchTerm))
+    db.session.commit()
+    assert search(auth_client, q='roster')['results'] == []
+
+    assert search_index.rebuild(batch_size=1) == 2
+    assert [r['file']['id'] for r in search(auth_client, q='roster')['results']] == [indexed['roster']]
@@ -0,0 +1,60 @@
+from backend.app import db
+from backend.app.models import File, Version
+from tests.helpers import count_statements
+import pytest
+
+
+def add_files(project, user, blob_id, count):
+    """Add files with a validated current version, every other one checked out"""
+    for i in range(count):
+        file_obj = File(project_id=project.id, filename=f'file{i}.xlsx', checked_out_by=user.id if i % 2 else None)
+        db.session.add(file_obj)
+        db.session.flush()
+        version = Version(
+            file_id=file_obj.id,
+            version_number=file_obj.allocate_version_number(),
+            blob_id=blob_id,
+            commit_message='Add',
+            uploaded_by=user.id,
+            validation_status='passed'
+        )
+        db.session.add(version)
+        db.session.flush()
+        file_obj.current_version_id = version.id
+    db.session.commit()
+
+
+@pytest.fixture
+def blob_id(upload, make_workbook):
+    """Blob of an uploaded workbook, for files added directly"""
+    version_id = upload(make_workbook()).get_json()['validation']['version_id']
+    return db.session.get(Version, version_id).blob_id
+
+
+@pytest.mark.options(RESPONSE_CACHE_ENABLED=False)
+@pytest.mark.parametrize('url', ['/api/projects', '/api/projects/{id}', '/api/projects/{id}/files'])
+def test_listing_queries_do_not_grow_with_files(auth_client, project, user, blob_id, url):
+    url = url.format(id=project.id)
+
+    add_files(project, user, blob_id, 2)
+    with count_statements() as few:
+        auth_client.get(url)
+    add_files(project, user, blob_id, 20)
+    with count_statements() as many:
+        response = auth_client.get(url)
+
+    assert response.status_code == 200
+    assert len(many) == len(few)
+
+
+def test_listed_files_carry_status_and_holder(auth_client, project, user, blob_id):
+    add_files(project, user, blob_id, 2)
+
+    files = auth_client.get(f'/api/projects/{project.id}').get_json()['project']['files']
+
+    assert [(f['filename'], f['status'], f['checked_out_by']) for f in files] == [
+        ('book.xlsx', 'available', None),
+        ('file0.xlsx', 'available', None),
+        ('file1.xlsx', 'checked_out', 'alice'),
+    ]
+    assert files[1]['current_version_data']['content_hash'] == files[0]['current_version_data']['content_hash']
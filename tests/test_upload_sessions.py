@@ -0,0 +1,81 @@
+from backend.app import db
+from backend.app.models import UploadSession
+from backend.app.services.upload_sessions import upload_sessions
+from datetime import datetime, timedelta
+import hashlib
+import os
+import pytest
+
+
+@pytest.fixture
+def content(make_workbook):
+    with open(make_workbook(), 'rb') as fh:
+        return fh.read()
+
+
+def start_upload(client, project, content, **fields):
+    response = client.post('/api/files/uploads', json=dict({
+        'project_id': project.id,
+        'filename': 'resumed.xlsx',
+        'commit_message': 'Resumable',
+        'size': len(content)
+    }, **fields))
+    assert response.status_code == 201
+    return response.get_json()['upload']['upload_id']
+
+
+def test_upload_resumes_from_the_stored_offset(auth_client, project, content):
+    upload_id = start_upload(auth_client, project, content)
+    half = len(content) // 2
+    url = f'/api/files/uploads/{upload_id}'
+
+    assert auth_client.put(f'{url}?offset=0', data=content[:1000]).status_code == 200
+    response = auth_client.put(f'{url}?offset=0', data=content[:10])
+    assert response.status_code == 409
+    assert response.get_json()['offset'] == 1000
+
+    # A chunk handled by another worker process has no running hash here
+    upload_sessions._hashers.clear()
+    auth_client.put(f'{url}?offset=1000', data=content[1000:half])
+    assert auth_client.get(url).get_json()['upload']['offset'] == half
+    assert auth_client.post(f'{url}/complete', json={}).status_code == 409
+
+    auth_client.put(f'{url}?offset={half}', data=content[half:])
+    response = auth_client.post(f'{url}/complete', json={'sha256': hashlib.sha256(content).hexdigest()})
+
+    assert response.status_code == 201
+    assert response.get_json()['file']['filename'] == 'resumed.xlsx'
+    assert response.get_json()['validation']['status'] == 'passed'
+    assert auth_client.get(url).status_code == 404
+    assert auth_client.get(f"/api/files/{response.get_json()['file']['id']}/download").data == content
+
+
+def test_checksum_mismatch_is_rejected(auth_client, project, content):
+    upload_id = start_upload(auth_client, project, content)
+    auth_client.put(f'/api/files/uploads/{upload_id}?offset=0', data=content)
+
+    response = auth_client.post(f'/api/files/uploads/{upload_id}/complete', json={'sha256': '0' * 64})
+
+    assert response.status_code == 409
+    assert response.get_json()['error'] == 'Checksum does not match the uploaded data'
+
+
+def test_chunks_past_the_declared_size_are_rejected(auth_client, project, content):
+    upload_id = start_upload(auth_client, project, content)
+    url = f'/api/files/uploads/{upload_id}'
+    auth_client.put(f'{url}?offset=0', data=content)
+
+    assert auth_client.put(f'{url}?offset={len(content)}', data=b'x').status_code == 413
+    assert auth_client.get(url).get_json()['upload']['offset'] == len(content)
+
+
+def test_idle_uploads_are_swept(app, auth_client, project, content):
+    upload_id = start_upload(auth_client, project, content)
+    auth_client.put(f'/api/files/uploads/{upload_id}?offset=0', data=content[:100])
+    session = UploadSession.query.filter_by(token=upload_id).one()
+    session.updated_at = datetime.utcnow() - timedelta(days=2)
+    db.session.commit()
+
+    assert upload_sessions.sweep_expired() == 1
+    assert UploadSession.query.count() == 0
+    assert os.listdir(app.config['UPLOAD_PATH']) == []
@@ -0,0 +1,84 @@
+from backend.app import db
+from backend.app.models import AuditLog, ValidationCacheEntry
+from backend.app.services import excel_validator
+from backend.app.services.maintenance import maintenance
+from backend.app.services.validation_cache import validation_cache
+from datetime import datetime, timedelta
+from tests.helpers import RULES
+import os
+import pytest
+
+
+def test_same_content_reuses_cached_result(upload, make_workbook):
+    path = make_workbook(bad=True)
+
+    first = upload(path, filename='first.xlsx').get_json()['validation']
+    second = upload(path, filename='second.xlsx').get_json()['validation']
+
+    assert second['status'] == first['status'] == 'failed'
+    assert second['errors'] == first['errors']
+    entry = ValidationCacheEntry.query.one()
+    assert entry.hit_count == 1
+    uploads = AuditLog.query.filter_by(action='file_uploaded').order_by(AuditLog.id).all()
+    assert [log.details['cached_validation'] for log in uploads] == [False, True]
+
+
+def test_result_is_keyed_by_rules(app):
+    result = {'passed': False, 'errors': ['Missing required sheet: Data']}
+    validation_cache.put('a' * 64, RULES, result)
+    db.session.commit()
+
+    assert validation_cache.get('a' * 64, RULES) == result
+    assert validation_cache.get('a' * 64, dict(RULES, required_sheets=[])) is None
+    assert validation_cache.get('b' * 64, RULES) is None
+
+
+def test_expired_entries_are_misses(app):
+    validation_cache.put('a' * 64, RULES, {'passed': True, 'errors': []})
+    db.session.commit()
+    ValidationCacheEntry.query.update({'created_at': datetime.utcnow() - timedelta(days=60)})
+    db.session.commit()
+
+    assert validation_cache.get('a' * 64, RULES) is None
+    assert validation_cache.evict() == 1
+
+
+def test_eviction_runs_as_maintenance_and_keeps_other_versions(app):
+    result = {'passed': True, 'errors': []}
+    db.session.add(ValidationCacheEntry(
+        content_hash='a' * 64, rules_hash='r', validator_version='older', passed=True, errors=[]
+    ))
+    db.session.add(ValidationCacheEntry(
+        content_hash='b' * 64, rules_hash='r', validator_version='older', passed=True, errors=[],
+        created_at=datetime.utcnow() - timedelta(days=60)
+    ))
+    db.session.commit()
+
+    # Storing does not evict anything
+    validation_cache.put('c' * 64, RULES, result)
+    db.session.commit()
+    assert ValidationCacheEntry.query.count() == 3
+
+    assert 'validation-cache-evict' in maintenance.run_due()
+    assert sorted(entry.content_hash[0] for entry in ValidationCacheEntry.query) == ['a', 'c']
+
+
+def crash(*args):
+    """Stand-in for the sheet scan that kills its pool worker"""
+    os._exit(1)
+
+
+@pytest.mark.options(VALIDATION_PROCESS_POOL_SIZE=2, VALIDATION_MAX_ATTEMPTS=1, SNAPSHOTS_ENABLED=False)
+def test_crashed_scan_is_not_cached(upload, make_workbook, monkeypatch):
+    path = make_workbook(sheets=('Data', 'Calc'))
+    monkeypatch.setattr(excel_validator, '_scan_sheet_in_worker', crash)
+
+    validation = upload(path, filename='first.xlsx').get_json()['validation']
+
+    assert validation['status'] == 'failed'
+    assert validation['errors'][0].startswith('Validation could not be completed')
+    assert ValidationCacheEntry.query.count() == 0
+
+    monkeypatch.undo()
+    assert upload(path, filename='second.xlsx').get_json()['validation']['status'] == 'passed'
+    assert ValidationCacheEntry.query.one().passed is True
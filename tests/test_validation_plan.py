@@ -0,0 +1,97 @@
+from backend.app import db
+from backend.app.services.validation_plan import RuleError, compile_rules, get_project_plan
+from tests.helpers import RULES
+import pytest
+import re
+
+
+def test_rules_compile_to_resolved_ranges():
+    plan = compile_rules(RULES)
+
+    assert plan.required_sheets == ('Data',)
+    assert plan.required_columns == (('Data', ('Name', 'Amount')),)
+    (rule,) = plan.ranges_for('Data')
+    assert (rule.min_col, rule.max_col, rule.min_row, rule.max_row) == (2, 2, None, None)
+    assert (rule.min, rule.max) == (0, 100000)
+
+
+@pytest.mark.parametrize('rules, message', [
+    ({'required_sheet': ['Data']}, 'Unknown validation rule(s): required_sheet'),
+    ({'required_sheets': 'Data'}, "'required_sheets' must be a list of non-empty strings"),
+    ({'data_validations': {'B:B': {'type': 'range'}}}, "Range 'B:B' must be of the form 'Sheet!A1:B9'"),
+    ({'data_validations': {'Data!B:B': {'type': 'range', 'min': 5, 'max': 1}}},
+     "Minimum is greater than maximum for 'Data!B:B'"),
+])
+def test_malformed_rules_are_rejected(rules, message):
+    with pytest.raises(RuleError, match=re.escape(message)):
+        compile_rules(rules)
+
+
+def test_project_api_rejects_malformed_rules(auth_client, project):
+    response = auth_client.post('/api/projects', json={'name': 'Bad', 'validation_rules': {'bogus': 1}})
+    assert response.status_code == 400
+
+    response = auth_client.put(f'/api/projects/{project.id}', json={'validation_rules': {'bogus': 1}})
+    assert response.status_code == 400
+
+
+def test_plan_is_compiled_once_per_rules(project):
+    plan = get_project_plan(project)
+    assert get_project_plan(project) is plan
+
+    project.validation_rules = dict(RULES, required_sheets=['Data', 'Summary'])
+    db.session.commit()
+
+    updated = get_project_plan(project)
+    assert updated is not plan
+    assert updated.required_sheets == ('Data', 'Summary')
+
+
+def test_rule_update_applies_to_next_upload(auth_client, project, upload, make_workbook):
+    path = make_workbook()
+    assert upload(path, filename='before.xlsx').get_json()['validation']['status'] == 'passed'
+
+    rules = dict(RULES, required_sheets=['Data', 'Summary'])
+    assert auth_client.put(f'/api/projects/{project.id}', json={'validation_rules': rules}).status_code == 200
+
+    validation = upload(path, filename='after.xlsx').get_json()['validation']
+    assert validation['status'] == 'failed'
+    assert validation['errors'] == ['Missing required sheet: Summary']
+
+
+def test_lenient_compile_skips_unusable_entries():
+    rules = dict(RULES, notes='legacy', data_validations={
+        'Data!B:B': {'type': 'range', 'min': 0},
+        'Data!C:C': {'type': 'list', 'values': ['a']},
+        'B:B': {'type': 'range'},
+    }, required_columns={'Data': ['Name'], 'Calc': 'Total'})
+
+    plan = compile_rules(rules, strict=False)
+
+    assert [rule.spec for rule in plan.range_rules] == ['Data!B:B']
+    assert plan.required_columns == (('Data', ('Name',)),)
+    assert plan.skipped == (
+        'Unknown validation rule(s): notes',
+        "'required_columns.Calc' must be a list of non-empty strings",
+        "Unsupported validation type 'list' for 'Data!C:C'",
+        "Range 'B:B' must be of the form 'Sheet!A1:B9'",
+    )
+
+
+def test_stored_legacy_rules_still_validate_uploads(project, upload, make_workbook, caplog):
+    # Saved through the API before rules were checked on save
+    project.validation_rules = dict(RULES, data_validations={
+        'Data!B:B': {'type': 'range', 'max': 100},
+        'Data!A:A': {'type': 'regex', 'pattern': '^Item'},
+    })
+    db.session.commit()
+
+    validation = upload(make_workbook(rows=12)).get_json()['validation']
+
+    assert validation['status'] == 'failed'
+    assert validation['errors'] == [
+        'Value 110 in Data!B11 is above maximum 100',
+        'Value 120 in Data!B12 is above maximum 100',
+        'Value 130 in Data!B13 is above maximum 100',
+    ]
+    assert "Unsupported validation type 'regex' for 'Data!A:A'" in caplog.text
@@ -0,0 +1,134 @@
+from backend.app import db
+from backend.app.models import File, Version
+from backend.app.services.checkout_locks import checkout_locks
+from backend.app.services.validation_queue import apply_validation_result, run_validation_job, validation_queue
+from datetime import datetime, timedelta
+from tests.helpers import create_user
+import pytest
+import time
+
+
+@pytest.fixture
+def stored_file(upload, make_workbook):
+    """A file whose first version passed validation"""
+    response = upload(make_workbook())
+    assert response.status_code == 201
+    return db.session.get(File, response.get_json()['file']['id'])
+
+
+def add_version(file_obj, user_id, status='pending'):
+    """Add another version of a file with the content of its current one"""
+    version = Version(
+        file_id=file_obj.id,
+        version_number=file_obj.allocate_version_number(),
+        blob_id=file_obj.current_version.blob_id,
+        commit_message='Another version',
+        uploaded_by=user_id,
+        validation_status=status
+    )
+    db.session.add(version)
+    db.session.commit()
+    return version
+
+
+def test_upload_validates_and_promotes_version(upload, make_workbook):
+    response = upload(make_workbook())
+
+    body = response.get_json()
+    assert response.status_code == 201
+    assert body['validation']['status'] == 'passed'
+    assert body['validation']['attempts'] == 1
+    assert body['file']['current_version_id'] == body['validation']['version_id']
+
+
+def test_failed_version_is_not_promoted(upload, make_workbook, stored_file, auth_client):
+    auth_client.post(f'/api/files/{stored_file.id}/checkout')
+
+    response = upload(make_workbook('bad.xlsx', bad=True), file_id=stored_file.id)
+
+    body = response.get_json()
+    assert body['validation']['status'] == 'failed'
+    assert 'Circular reference in Data!D2' in body['validation']['errors']
+    assert body['file']['current_version_id'] != body['validation']['version_id']
+
+
+@pytest.mark.options(VALIDATION_ASYNC=True)
+def test_async_upload_can_be_polled(upload, make_workbook, auth_client):
+    response = upload(make_workbook())
+    assert response.status_code == 202
+    body = response.get_json()
+    url = f"/api/files/{body['file']['id']}/versions/{body['validation']['version_id']}/validation"
+
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        validation = auth_client.get(url).get_json()['validation']
+        if validation['status'] == 'passed':
+            break
+        time.sleep(0.05)
+    assert validation['status'] == 'passed'
+
+
+def test_claimed_job_runs_once(stored_file, user):
+    version = add_version(stored_file, user.id)
+
+    assert run_validation_job(version.id) is True
+    assert run_validation_job(version.id) is True
+
+    db.session.refresh(version)
+    assert version.validation_status == 'passed'
+    assert version.validation_attempts == 1
+
+
+def test_running_job_is_not_claimed_again(stored_file, user):
+    version = add_version(stored_file, user.id, status='running')
+
+    assert run_validation_job(version.id) is True
+
+    db.session.refresh(version)
+    assert version.validation_status == 'running'
+    assert version.validation_attempts == 0
+
+
+def test_older_version_does_not_replace_newer(stored_file, user):
+    older = add_version(stored_file, user.id)
+    newer = add_version(stored_file, user.id)
+
+    assert apply_validation_result(newer, {'passed': True, 'errors': []}) is True
+    assert apply_validation_result(older, {'passed': True, 'errors': []}) is False
+    db.session.commit()
+
+    assert stored_file.current_version_id == newer.id
+    assert older.validation_status == 'passed'
+
+
+def test_promotion_only_checks_in_the_uploaders_checkout(stored_file, user):
+    other = add_version(stored_file, create_user('bob').id)
+    checkout_locks.acquire([stored_file.id], user.id)
+    db.session.commit()
+
+    apply_validation_result(other, {'passed': True, 'errors': []})
+    db.session.commit()
+    assert stored_file.current_version_id == other.id
+    assert stored_file.checked_out_by == user.id
+
+    own = add_version(stored_file, user.id)
+    apply_validation_result(own, {'passed': True, 'errors': []})
+    db.session.commit()
+    assert stored_file.current_version_id == own.id
+    assert stored_file.checked_out_by is None
+
+
+def test_requeue_runs_stale_and_pending_jobs_only(stored_file, user):
+    pending = add_version(stored_file, user.id)
+    stale = add_version(stored_file, user.id, status='running')
+    stale.validation_started_at = datetime.utcnow() - timedelta(hours=2)
+    fresh = add_version(stored_file, user.id, status='running')
+    fresh.validation_started_at = datetime.utcnow()
+    db.session.commit()
+
+    assert validation_queue.requeue_pending() == 2
+
+    statuses = dict(db.session.query(Version.id, Version.validation_status))
+    assert statuses[pending.id] == 'passed'
+    assert statuses[stale.id] == 'passed'
+    assert statuses[fresh.id] == 'running'
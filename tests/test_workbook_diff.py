@@ -0,0 +1,55 @@
+from backend.app.services.workbook_diff import WorkbookDiff
+import pytest
+
+
+@pytest.fixture
+def two_versions(auth_client, upload, make_workbook):
+    """A file whose second version edits, adds and rewrites cells on Data only"""
+    file_id = upload(make_workbook('v1.xlsx', sheets=('Data', 'Calc'))).get_json()['file']['id']
+    auth_client.post(f'/api/files/{file_id}/checkout')
+    upload(make_workbook('v2.xlsx', sheets=('Data', 'Calc'), cells={
+        'Data!B2': 999,
+        'Data!C3': '=B3*3',
+        'Data!A30': 'New',
+    }), file_id=file_id)
+    return file_id
+
+
+def test_versions_are_diffed_cell_by_cell(auth_client, two_versions):
+    body = auth_client.get(f'/api/files/{two_versions}/diff?from=1&to=2').get_json()
+
+    assert body['cached'] is False
+    assert (body['from_version']['version_number'], body['to_version']['version_number']) == (1, 2)
+    assert body['diff']['summary'] == {'added': 1, 'removed': 0, 'changed': 1, 'formula_changed': 1}
+    data, calc = body['diff']['sheets']
+    assert data['changes'] == [
+        {'cell': 'B2', 'type': 'changed', 'old': 20, 'new': 999},
+        {'cell': 'C3', 'type': 'formula_changed', 'old': '=B3*2', 'new': '=B3*3'},
+        {'cell': 'A30', 'type': 'added', 'old': None, 'new': 'New'},
+    ]
+    assert (calc['status'], calc['skipped']) == ('unchanged', True)
+
+
+def test_diff_defaults_to_latest_pair_and_is_cached(auth_client, two_versions):
+    first = auth_client.get(f'/api/files/{two_versions}/diff').get_json()
+    second = auth_client.get(f'/api/files/{two_versions}/diff').get_json()
+
+    assert (first['cached'], second['cached']) == (False, True)
+    assert second['diff'] == first['diff']
+
+
+def test_unknown_version_is_not_found(auth_client, two_versions):
+    assert auth_client.get(f'/api/files/{two_versions}/diff?from=1&to=5').status_code == 404
+
+
+def test_changes_beyond_the_limit_are_only_counted(make_workbook):
+    old = make_workbook('old.xlsx', sheets=('Data', 'Gone'))
+    new = make_workbook('new.xlsx', rows=25, sheets=('Data', 'Added'))
+
+    result = WorkbookDiff(max_changes=2).diff(old, new)
+
+    data, added, gone = result['sheets']
+    assert (data['summary']['added'], len(data['changes']), data['truncated']) == (15, 2, True)
+    assert (added['status'], added['summary']['added']) == ('added', 78)
+    assert (gone['status'], gone['summary']['removed']) == ('removed', 63)
+    assert (result['sheets_added'], result['sheets_removed']) == (['Added'], ['Gone'])